@@ -17,6 +17,9 @@ class Settings(BaseSettings):
     telegram_bot_username: str = "gilamchi_robot" # Default fallback
     WEB_APP_URL: str = "https://google.com" # Default fallback
     ADMIN_IDS: List[str] = ["6867575783", "947732542", "6965037980"]
+    ANALYTICS_DIR: str = "analytics" # Parquet snapshot for reports (utils/snapshot.py)
+    SCHEDULER_ENABLED: bool = True # background jobs (utils/scheduler.py)
+    REDIS_URL: str = "" # shared report cache between workers (utils/report_cache.py); in-process only if empty
 
     class Config:
         env_file = ".env"
@@ -9,8 +9,12 @@ logger = logging.getLogger(__name__)
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm.exc import StaleDataError
+from .utils.compression import CompressionMiddleware
+from .utils.idempotency import IdempotencyMiddleware
 from .config import get_settings
-from .routers import auth, branches, users, products, sales, debts, expenses, collections, staff, telegram, settings as settings_router
+from .routers import auth, branches, users, products, sales, debts, expenses, collections, staff, telegram, sync, events, reports, orders, metrics, reservations, settings as settings_router
 from .utils.bot_service import run_bot
 from .database import engine, Base
 
@@ -22,6 +26,9 @@ Base.metadata.create_all(bind=engine)
 
 from contextlib import asynccontextmanager
 from .utils.bot_service import run_bot, stop_bot
+from .utils.change_feed import feed as change_feed
+from .utils.reservations import sweeper as reservation_sweeper
+from .utils.scheduler import scheduler as report_scheduler
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -48,8 +55,17 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Startup error: Initialization failed: {e}")
 
+    await change_feed.start()
+    await reservation_sweeper.start()
+    reports.register_jobs(report_scheduler)
+    await report_scheduler.start()
+
     yield  # Application is running
 
+    await report_scheduler.stop()
+    await reservation_sweeper.stop()
+    await change_feed.stop()
+
     # Shutdown logic
     print("Shutdown: Cleaning up background tasks...")
     if bot_task:
@@ -75,12 +91,16 @@ async def log_requests(request, call_next):
     origin = request.headers.get("origin")
     auth = request.headers.get("authorization", "")
     token_snippet = auth[:15] if auth else "None"
-    logger.error(f"Incoming request: {request.method} {request.url} | Origin: {origin} | Auth: {token_snippet}...")
+    # Path only: query strings can carry tokens (?token=...)
+    logger.error(f"Incoming request: {request.method} {request.url.path} | Origin: {origin} | Auth: {token_snippet}...")
     response = await call_next(request)
     logger.error(f"Response status: {response.status_code}")
     return response
 
 
+# Replays retried writes that carry an Idempotency-Key (inside CORS, so replays get CORS headers too)
+app.add_middleware(IdempotencyMiddleware)
+
 origins = [origin.strip() for origin in settings.CORS_ORIGINS.split(",")]
 
 app.add_middleware(
@@ -89,8 +109,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Idempotent-Replayed", "Retry-After"],
 )
 
+# gzip/brotli for large list responses (skips small bodies and event streams)
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request, exc):
+    # An optimistic (version-checked) update lost to a concurrent write
+    logger.warning(f"Concurrent update conflict on {request.method} {request.url.path}: {exc}")
+    return JSONResponse(status_code=409, content={"detail": "This record was changed by another request, please reload and retry"})
+
 # Include Routers
 from fastapi.staticfiles import StaticFiles
 
@@ -104,12 +134,18 @@ app.include_router(branches.router, prefix="/api/branches", tags=["branches"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(products.router, prefix="/api/products", tags=["products"])
 app.include_router(sales.router, prefix="/api/sales", tags=["sales"])
+app.include_router(orders.router, prefix="/api/orders", tags=["orders"])
+app.include_router(reservations.router, prefix="/api/reservations", tags=["reservations"])
 app.include_router(debts.router, prefix="/api/debts", tags=["debts"])
 app.include_router(expenses.router, prefix="/api/expenses", tags=["expenses"])
 app.include_router(collections.router, prefix="/api/collections", tags=["collections"])
 app.include_router(staff.router, prefix="/api/staff", tags=["staff"])
 app.include_router(telegram.router, prefix="/api/telegram", tags=["telegram"])
 app.include_router(settings_router.router, prefix="/api/settings", tags=["settings"])
+app.include_router(sync.router, prefix="/api/sync", tags=["sync"])
+app.include_router(events.router, prefix="/api/events", tags=["events"])
+app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 
 @app.get("/")
 def read_root():
@@ -2,6 +2,7 @@ from .base import Base
 from .user import User, UserRole
 from .branch import Branch
 from .product import Product, ProductCategory, ProductType
+from .stock_item import ProductStockItem, StockItemKind
 from .sale import Sale, PaymentType
 from .debt import Debt, Payment, DebtStatus
 from .expense import Expense
@@ -11,3 +12,9 @@ from .settings import Settings
 from .staff import Staff
 from .product_sample import ProductSample
 from .invitation import InvitationLink
+from .change_event import ChangeEvent
+from .idempotency import IdempotencyKey
+from .reservation import StockReservation
+from .rollup import DailyRollup
+from .cash_closure import CashClosure
+from .report_snapshot import ReportSnapshot, SchedulerLease
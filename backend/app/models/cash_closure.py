@@ -0,0 +1,46 @@
+from sqlalchemy import Integer, DECIMAL, ForeignKey, Uuid, DateTime, Text, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import datetime
+import uuid
+from .base import UUIDMixin, TimestampMixin, Base
+
+class CashClosure(UUIDMixin, TimestampMixin, Base):
+    """
+    A closed kassa shift of a branch: the drawer totals for
+    [opened_at, closed_at), frozen when the shift was closed. All amounts
+    are USD.
+
+    The next shift opens at closed_at, with carried_over as its opening
+    balance. Reports on a closed shift read this row instead of recomputing it.
+    """
+    __tablename__ = "cash_closures"
+
+    branch_id: Mapped[uuid.UUID] = mapped_column(Uuid, ForeignKey("branches.id"))
+    opened_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    closed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    closed_by: Mapped[uuid.UUID] = mapped_column(Uuid, ForeignKey("users.id"))
+    exchange_rate: Mapped[float] = mapped_column(DECIMAL(18, 6))
+
+    opening_balance: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0)
+    cash_sales: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0)
+    card_sales: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0)
+    transfer_sales: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0)
+    debt_payments: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0)
+    cash_expenses: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0)
+    sale_count: Mapped[int] = mapped_column(Integer, default=0)
+    expected_cash: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0)
+
+    counted_cash: Mapped[float] = mapped_column(DECIMAL(18, 6)) # what was in the drawer
+    difference: Mapped[float] = mapped_column(DECIMAL(18, 6)) # counted - expected
+    carried_over: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0) # left in the drawer for the next shift
+    note: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    branch = relationship("Branch")
+    closer = relationship("User")
+
+    __table_args__ = (
+        # A shift can only be closed once
+        UniqueConstraint("branch_id", "opened_at", name="uq_cash_closures_branch_opened_at"),
+        # Latest closure of a branch (where the open shift starts)
+        Index("ix_cash_closures_branch_closed_at", "branch_id", "closed_at"),
+    )
@@ -0,0 +1,26 @@
+from sqlalchemy import String, BigInteger, Integer, Uuid, JSON, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime, timezone
+import uuid
+from .base import Base
+
+class ChangeEvent(Base):
+    """
+    Transactional outbox for the live change feed.
+
+    Rows are added in the same session as the write they describe, so an event
+    exists if and only if its change was committed. The integer id is the SSE
+    event id clients resume from, which is why this table does not use UUIDMixin.
+    """
+    __tablename__ = "change_events"
+
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    branch_id: Mapped[uuid.UUID | None] = mapped_column(Uuid, nullable=True) # None = every branch
+    event_type: Mapped[str] = mapped_column(String) # e.g. "sale.created"
+    payload: Mapped[dict] = mapped_column(JSON)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True)
+
+    __table_args__ = (
+        # Resume: events for a branch after a given id
+        Index("ix_change_events_branch_id_id", "branch_id", "id"),
+    )
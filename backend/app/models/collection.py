@@ -1,4 +1,4 @@
-from sqlalchemy import String, Uuid, ForeignKey, DECIMAL, UniqueConstraint
+from sqlalchemy import String, Uuid, ForeignKey, DECIMAL, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import UUIDMixin, TimestampMixin, SoftDeleteMixin, Base
 import uuid
@@ -19,6 +19,8 @@ class Collection(UUIDMixin, TimestampMixin, SoftDeleteMixin, Base):
 
     __table_args__ = (
         UniqueConstraint('name', 'branch_id', name='_collection_name_branch_uc'),
+        # Delta sync: rows changed since a watermark
+        Index("ix_collections_updated_at", "updated_at"),
     )
 
 class Size(UUIDMixin, TimestampMixin, SoftDeleteMixin, Base):
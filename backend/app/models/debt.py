@@ -1,4 +1,4 @@
-from sqlalchemy import String, Integer, Float, Enum as SQLEnum, ForeignKey, Uuid, DECIMAL, DateTime, Text, Date
+from sqlalchemy import String, Integer, Float, Enum as SQLEnum, ForeignKey, Uuid, DECIMAL, DateTime, Text, Date, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 import uuid
@@ -35,6 +35,15 @@ class Debt(UUIDMixin, TimestampMixin, SoftDeleteMixin, Base):
     seller = relationship("User")
     payments = relationship("Payment", back_populates="debt", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination: newest first within a branch
+        Index("ix_debts_branch_created_id", "branch_id", "created_at", "id"),
+        # Delta sync: rows changed since a watermark
+        Index("ix_debts_updated_at", "updated_at"),
+        # Debt aging: open debts of a branch by deadline
+        Index("ix_debts_branch_status_deadline", "branch_id", "status", "payment_deadline"),
+    )
+
 class Payment(UUIDMixin, TimestampMixin, SoftDeleteMixin, Base):
     __tablename__ = "payments"
 
@@ -49,3 +58,10 @@ class Payment(UUIDMixin, TimestampMixin, SoftDeleteMixin, Base):
     # Relationships
     debt = relationship("Debt", back_populates="payments")
     recorder = relationship("User")
+
+    __table_args__ = (
+        # Delta sync: debts whose payments changed since a watermark
+        Index("ix_payments_updated_at", "updated_at"),
+        # Cash closure: payments taken in a shift
+        Index("ix_payments_payment_date", "payment_date"),
+    )
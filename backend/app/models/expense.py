@@ -1,11 +1,11 @@
-from sqlalchemy import String, Float, ForeignKey, DECIMAL, Uuid
+from sqlalchemy import String, Float, ForeignKey, DECIMAL, Uuid, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime, timezone
-from .base import UUIDMixin, TimestampMixin
+from .base import UUIDMixin, TimestampMixin, SoftDeleteMixin
 from ..database import Base
 import uuid
 
-class Expense(UUIDMixin, TimestampMixin, Base):
+class Expense(UUIDMixin, TimestampMixin, SoftDeleteMixin, Base):
     __tablename__ = "expenses"
     
     amount: Mapped[float] = mapped_column(DECIMAL(18, 6), nullable=False)
@@ -20,3 +20,10 @@ class Expense(UUIDMixin, TimestampMixin, Base):
     # Relationships
     staff_member = relationship("User", foreign_keys=[staff_id])
     seller = relationship("User", foreign_keys=[seller_id])
+
+    __table_args__ = (
+        # Keyset pagination: newest first within a branch
+        Index("ix_expenses_branch_created_id", "branch_id", "created_at", "id"),
+        # Delta sync: rows changed since a watermark
+        Index("ix_expenses_updated_at", "updated_at"),
+    )
@@ -0,0 +1,22 @@
+from sqlalchemy import String, Integer, LargeBinary, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime, timezone
+from .base import Base
+
+class IdempotencyKey(Base):
+    """
+    A write request made with an Idempotency-Key header, and its response.
+
+    The row is claimed before the request runs (status_code None) and filled
+    in when it succeeds. A retry with the same key gets the stored response
+    back instead of running the write again. Rows expire after a day.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True) # sha256 of user, method, path and the client's key
+    request_hash: Mapped[str] = mapped_column(String(64)) # sha256 of the request body and query
+    status_code: Mapped[int | None] = mapped_column(Integer, nullable=True) # None while the first request is running
+    content_type: Mapped[str | None] = mapped_column(String, nullable=True)
+    response_body: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
@@ -1,8 +1,10 @@
-from sqlalchemy import String, Integer, BigInteger, Float, Enum as SQLEnum, ForeignKey, Uuid, JSON, DECIMAL, LargeBinary
+from sqlalchemy import String, Integer, BigInteger, Float, Enum as SQLEnum, ForeignKey, Uuid, DECIMAL, LargeBinary, Index, DDL, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import datetime, timezone
 import enum
 import uuid
 from .base import UUIDMixin, TimestampMixin, SoftDeleteMixin, Base
+from .stock_item import ProductStockItem, stock_items_from_sizes
 
 class ProductCategory(str, enum.Enum):
     GILAMLAR = "Gilamlar"
@@ -35,7 +37,6 @@ class Product(UUIDMixin, TimestampMixin, SoftDeleteMixin, Base):
     max_quantity: Mapped[int | None] = mapped_column(BigInteger, nullable=True) # For stock tracking visualization (progres bar)
     width: Mapped[float | None] = mapped_column(Float, nullable=True)
     
-    available_sizes: Mapped[list[str] | None] = mapped_column(JSON, nullable=True) # e.g. ["2x3", "3x4"]
     photo: Mapped[str | None] = mapped_column(String, nullable=True)
     
     # Legacy perceptual hash (dHash) - will be deprecated
@@ -47,7 +48,46 @@ class Product(UUIDMixin, TimestampMixin, SoftDeleteMixin, Base):
     
     branch_id: Mapped[uuid.UUID] = mapped_column(Uuid, ForeignKey("branches.id"))
 
+    # Bumped on every write. Stock decrements are conditional on it, and ORM
+    # updates of a product changed meanwhile raise StaleDataError (409).
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationships
     branch = relationship("Branch", back_populates="products")
+    # Per-size / per-roll stock (formerly the available_sizes JSON column)
+    stock_items = relationship(
+        ProductStockItem, order_by=ProductStockItem.position, cascade="all, delete-orphan",
+    )
     # sales = relationship("Sale", back_populates="product")
 
+    @property
+    def available_sizes(self):
+        """Stock items in the legacy JSON shape the API and frontend use."""
+        items = [item.as_size_entry() for item in self.stock_items]
+        return items or None
+
+    @available_sizes.setter
+    def available_sizes(self, sizes):
+        self.stock_items = stock_items_from_sizes(sizes, is_roll=self.type == ProductType.METER)
+        # Only child rows changed; bump the product so ETags and /api/sync see it
+        self.updated_at = datetime.now(timezone.utc)
+
+    __table_args__ = (
+        # Keyset pagination: newest first within a branch
+        Index("ix_products_branch_created_id", "branch_id", "created_at", "id"),
+        # Delta sync: rows changed since a watermark
+        Index("ix_products_updated_at", "updated_at"),
+        # Code lookup: exact/prefix within a branch, trigram for substring and typos (Postgres)
+        Index("ix_products_branch_code", "branch_id", "code"),
+        Index("ix_products_code_trgm", "code", postgresql_using="gin", postgresql_ops={"code": "gin_trgm_ops"}),
+        Index("ix_products_collection_trgm", "collection", postgresql_using="gin", postgresql_ops={"collection": "gin_trgm_ops"}),
+    )
+
+# Trigram indexes need the extension before the table's indexes are created
+event.listen(
+    Product.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
@@ -0,0 +1,30 @@
+from sqlalchemy import String, Integer, Text, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime, timezone
+from .base import Base
+
+class ReportSnapshot(Base):
+    """
+    A report precomputed by a scheduled job (see utils/scheduler.py), shared
+    by all workers. Endpoints serve it while the tables it was built from
+    are still at `version`, and build the report themselves otherwise.
+    """
+    __tablename__ = "report_snapshots"
+
+    key: Mapped[str] = mapped_column(String, primary_key=True) # report and parameters, e.g. "pnl|<branch>|<start>|None|USD"
+    version: Mapped[str] = mapped_column(String) # version of the source tables it was built from
+    payload: Mapped[str] = mapped_column(Text) # the response model as JSON
+    duration_ms: Mapped[int] = mapped_column(Integer, default=0) # time it took to build
+    built_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+class SchedulerLease(Base):
+    """
+    Leadership of the scheduler: only the worker holding the lease runs
+    jobs. The holder renews it well before expires_at; once it expires,
+    another worker takes it over.
+    """
+    __tablename__ = "scheduler_leases"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    holder: Mapped[str] = mapped_column(String) # host:pid:token of the worker
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
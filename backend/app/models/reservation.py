@@ -0,0 +1,34 @@
+from sqlalchemy import String, BigInteger, Float, DECIMAL, ForeignKey, Uuid, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+import uuid
+from .base import UUIDMixin, TimestampMixin, Base
+
+class StockReservation(UUIDMixin, TimestampMixin, Base):
+    """
+    Stock held for one line of a seller's basket until expires_at.
+
+    Available stock is on-hand minus the active (unexpired) reservations of
+    other baskets. Checkout converts a basket's reservations into sales and
+    deletes them; expired rows are deleted by the sweeper.
+    """
+    __tablename__ = "stock_reservations"
+
+    basket_id: Mapped[str] = mapped_column(String) # client-generated, one per basket
+    line_id: Mapped[str] = mapped_column(String) # the basket item's id
+    product_id: Mapped[uuid.UUID] = mapped_column(Uuid, ForeignKey("products.id"))
+    branch_id: Mapped[uuid.UUID] = mapped_column(Uuid, ForeignKey("branches.id"))
+    seller_id: Mapped[uuid.UUID] = mapped_column(Uuid, ForeignKey("users.id"))
+    quantity: Mapped[int | None] = mapped_column(BigInteger, nullable=True) # carpets (unit products)
+    size: Mapped[str | None] = mapped_column(String, nullable=True)
+    width: Mapped[float | None] = mapped_column(Float, nullable=True)
+    length: Mapped[float | None] = mapped_column(DECIMAL(10, 2), nullable=True) # metres (metraj products)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        UniqueConstraint("basket_id", "line_id", name="uq_stock_reservations_basket_line"),
+        # Sweeper: DELETE ... WHERE expires_at <= now is a range scan on this index
+        Index("ix_stock_reservations_expires_at", "expires_at"),
+        # Availability: active reservations of a product
+        Index("ix_stock_reservations_product_expires_at", "product_id", "expires_at"),
+    )
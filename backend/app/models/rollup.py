@@ -0,0 +1,37 @@
+from sqlalchemy import String, Integer, DECIMAL, ForeignKey, Uuid, Date, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import date as date_type
+import uuid
+from .base import UUIDMixin, TimestampMixin, Base
+
+class DailyRollup(UUIDMixin, TimestampMixin, Base):
+    """
+    Sums of sales, expenses and debt payments per branch, user, local day
+    (Settings.TIMEZONE), payment type and currency.
+
+    Maintained in the same transaction as each write (see utils/rollups.py),
+    so dashboards read one row per day instead of every sale.
+    """
+    __tablename__ = "daily_rollups"
+
+    day: Mapped[date_type] = mapped_column(Date)
+    branch_id: Mapped[uuid.UUID] = mapped_column(Uuid, ForeignKey("branches.id"))
+    seller_id: Mapped[uuid.UUID] = mapped_column(Uuid, ForeignKey("users.id")) # who sold, spent or took the payment
+    kind: Mapped[str] = mapped_column(String) # "sale", "expense" or "debt_payment"
+    payment_type: Mapped[str] = mapped_column(String, default="") # sales only; "" otherwise
+    currency: Mapped[str] = mapped_column(String, default="USD")
+
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    quantity: Mapped[float] = mapped_column(DECIMAL(14, 2), default=0) # carpets sold
+    metres: Mapped[float] = mapped_column(DECIMAL(14, 2), default=0) # metraj sold
+    amount: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0)
+    profit: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0)
+    admin_profit: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0)
+    seller_profit: Mapped[float] = mapped_column(DECIMAL(18, 6), default=0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "branch_id", "seller_id", "kind", "payment_type", "currency", name="uq_daily_rollups_key"),
+        # Dashboards: a branch (or all branches) over a range of days
+        Index("ix_daily_rollups_branch_day", "branch_id", "day"),
+        Index("ix_daily_rollups_day", "day"),
+    )
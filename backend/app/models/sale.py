@@ -1,4 +1,4 @@
-from sqlalchemy import String, Integer, Float, Enum as SQLEnum, ForeignKey, Uuid, DECIMAL, DateTime
+from sqlalchemy import String, Integer, Float, Enum as SQLEnum, ForeignKey, Uuid, DECIMAL, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 import uuid
@@ -40,3 +40,11 @@ class Sale(UUIDMixin, TimestampMixin, SoftDeleteMixin, Base):
     product = relationship("Product") # back_populates="sales" if defined there
     branch = relationship("Branch", back_populates="sales")
     seller = relationship("User") # back_populates="sales" if defined there
+
+    __table_args__ = (
+        # Keyset pagination: (date, id) for admins, branch-scoped for sellers
+        Index("ix_sales_date_id", "date", "id"),
+        Index("ix_sales_branch_date_id", "branch_id", "date", "id"),
+        # Delta sync: rows changed since a watermark
+        Index("ix_sales_updated_at", "updated_at"),
+    )
@@ -0,0 +1,100 @@
+from sqlalchemy import String, Integer, BigInteger, Float, DECIMAL, Enum as SQLEnum, ForeignKey, Uuid, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from decimal import Decimal
+import enum
+import re
+import uuid
+from .base import UUIDMixin, TimestampMixin, Base
+
+class StockItemKind(str, enum.Enum):
+    SIZE = "size" # fixed-size carpets of one size, counted by quantity
+    ROLL = "roll" # one metraj roll, cut by length
+
+# "2x3", "2×3", "2X3", "2,5x3"
+_SIZE_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*[xX×*]\s*(\d+(?:[.,]\d+)?)\s*$")
+
+def parse_size(label) -> tuple[float | None, float | None]:
+    """Width and length of a "WxL" label, or (None, None) if it isn't one."""
+    match = _SIZE_RE.match(str(label or ""))
+    if not match:
+        return None, None
+    return float(match.group(1).replace(",", ".")), float(match.group(2).replace(",", "."))
+
+def _num(value) -> str:
+    return f"{float(value):g}"
+
+class ProductStockItem(UUIDMixin, TimestampMixin, Base):
+    """
+    One line of a product's per-size or per-roll stock.
+
+    Replaces the products.available_sizes JSON list: a sale locks and updates
+    only the row it sells from, and sizes are queryable with an index
+    ("all 2x3 carpets in stock at branch X").
+    """
+    __tablename__ = "product_stock_items"
+
+    product_id: Mapped[uuid.UUID] = mapped_column(Uuid, ForeignKey("products.id"))
+    kind: Mapped[StockItemKind] = mapped_column(SQLEnum(StockItemKind))
+    size: Mapped[str] = mapped_column(String) # label as entered, e.g. "2x3"; unit sales match on it
+    width: Mapped[float | None] = mapped_column(Float, nullable=True)
+    length: Mapped[float | None] = mapped_column(DECIMAL(10, 2), nullable=True) # rolls: remaining length
+    initial_length: Mapped[float | None] = mapped_column(DECIMAL(10, 2), nullable=True)
+    quantity: Mapped[int | None] = mapped_column(BigInteger, nullable=True) # None = listed size, counted on the product only
+    position: Mapped[int] = mapped_column(Integer, default=0) # order the sizes were entered in
+    # Bumped on every write; stock updates are conditional on it (see utils/contention.py)
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+
+    __table_args__ = (
+        # A product's items, and its rolls of one width ordered by length
+        Index("ix_product_stock_items_product_width_length", "product_id", "width", "length"),
+        # Size lookups across products (joined to products for branch and deleted_at)
+        Index("ix_product_stock_items_width_length", "width", "length"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+    def as_size_entry(self):
+        return size_entry(self)
+
+def size_entry(item):
+    """The legacy available_sizes entry for a stock item (ORM object or column row)."""
+    if item.kind == StockItemKind.ROLL:
+        return {
+            "size": f"{_num(item.width)}x{_num(item.length)}",
+            "initial_length": float(item.initial_length) if item.initial_length is not None else None,
+            "quantity": 1,
+        }
+    if item.quantity is None:
+        return item.size
+    return {"size": item.size, "quantity": int(item.quantity)}
+
+def stock_items_from_sizes(sizes, is_roll: bool) -> list[ProductStockItem]:
+    """
+    Build stock items from a legacy available_sizes list: strings or
+    {size, quantity} dicts for carpets, {size: "WxL", initial_length} dicts
+    for metraj rolls (a roll entry with quantity n becomes n rolls).
+    """
+    items = []
+    for entry in sizes or []:
+        label = entry.get("size") if isinstance(entry, dict) else entry
+        if label is None:
+            continue
+        label = str(label)
+        width, length = parse_size(label)
+
+        if is_roll and isinstance(entry, dict) and width is not None:
+            initial = entry.get("initial_length")
+            for _ in range(max(int(entry.get("quantity") or 1), 1)):
+                items.append(ProductStockItem(
+                    kind=StockItemKind.ROLL, size=label, width=width,
+                    length=Decimal(str(length)),
+                    initial_length=Decimal(str(initial if initial is not None else length)),
+                    quantity=1, position=len(items),
+                ))
+        else:
+            quantity = int(entry.get("quantity") or 0) if isinstance(entry, dict) else None
+            items.append(ProductStockItem(
+                kind=StockItemKind.SIZE, size=label, width=width,
+                length=Decimal(str(length)) if length is not None else None,
+                quantity=quantity, position=len(items),
+            ))
+    return items
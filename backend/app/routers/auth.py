@@ -5,10 +5,11 @@ from datetime import timedelta
 
 from ..database import get_db
 from ..models.user import User
-from ..schemas.token import Token
+from ..schemas.token import Token, UrlToken
 from ..schemas.user import UserCreate, UserResponse
-from ..utils.security import verify_password, get_password_hash, create_access_token
+from ..utils.security import verify_password, get_password_hash, create_access_token, create_url_token, URL_TOKEN_SCOPES, URL_TOKEN_TTL
 from ..utils.dependencies import get_current_user, get_admin_user
+from ..utils.lookup_cache import cache as lookup_cache
 from ..config import get_settings
 
 router = APIRouter()
@@ -49,9 +50,17 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)): #, current_u
     )
     db.add(new_user)
     db.commit()
+    lookup_cache.invalidate("staff")
     db.refresh(new_user)
     return new_user
 
+@router.post("/url-token", response_model=UrlToken)
+def create_url_token_for(scope: str, current_user: User = Depends(get_current_user)):
+    """Short-lived token of `scope` for a URL the browser opens itself, e.g. a spreadsheet download."""
+    if scope not in URL_TOKEN_SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of {', '.join(URL_TOKEN_SCOPES)}")
+    return {"token": create_url_token(current_user.username, scope), "expires_in": int(URL_TOKEN_TTL.total_seconds())}
+
 @router.get("/me", response_model=UserResponse)
 async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
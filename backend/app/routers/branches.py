@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime, timezone
@@ -6,13 +6,23 @@ from ..database import get_db
 from ..models.branch import Branch
 from ..schemas.branch import BranchCreate, BranchResponse, BranchUpdate
 from ..utils.dependencies import get_admin_user, get_current_user
+from ..utils.etag import make_etag, not_modified
+from ..utils.lookup_cache import cache as lookup_cache
 
 router = APIRouter()
 
+def _active_branches(db: Session) -> list[BranchResponse]:
+    return lookup_cache.get(db, "branches", "active", lambda: [
+        BranchResponse.model_validate(b)
+        for b in db.query(Branch).filter(Branch.deleted_at == None).order_by(Branch.created_at, Branch.id)
+    ])
+
 @router.get("/", response_model=List[BranchResponse])
-def read_branches(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    branches = db.query(Branch).filter(Branch.deleted_at == None).offset(skip).limit(limit).all()
-    return branches
+def read_branches(request: Request, response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    cached = not_modified(request, response, make_etag(request, lookup_cache.version(db, "branches")))
+    if cached:
+        return cached
+    return _active_branches(db)[skip:skip + limit]
 
 @router.post("/", response_model=BranchResponse)
 def create_branch(branch: BranchCreate, db: Session = Depends(get_db), current_user = Depends(get_admin_user)):
@@ -36,6 +46,7 @@ def create_branch(branch: BranchCreate, db: Session = Depends(get_db), current_u
     new_branch = Branch(**branch.dict())
     db.add(new_branch)
     db.commit()
+    lookup_cache.invalidate("branches")
     db.refresh(new_branch)
     return new_branch
 
@@ -50,11 +61,12 @@ def delete_branch(branch_id: str, db: Session = Depends(get_db), current_user =
     branch.deleted_by = current_user.id
     
     db.commit()
+    lookup_cache.invalidate("branches")
     return {"status": "success"}
 
 @router.get("/{branch_id}", response_model=BranchResponse)
 def read_branch(branch_id: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    branch = db.query(Branch).filter(Branch.id == branch_id, Branch.deleted_at == None).first()
+    branch = next((b for b in _active_branches(db) if str(b.id) == branch_id), None)
     if branch is None:
         raise HTTPException(status_code=404, detail="Branch not found")
     return branch
@@ -1,19 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
 from ..database import get_db
 from ..models.collection import Collection
 from ..schemas.collection import CollectionCreate, CollectionResponse
 from ..utils.dependencies import get_admin_user
+from ..utils.etag import make_etag, not_modified
+from ..utils.lookup_cache import cache as lookup_cache
 
 router = APIRouter()
 
 @router.get("/", response_model=List[CollectionResponse])
-def read_collections(branch_id: str = None, db: Session = Depends(get_db)):
+def read_collections(request: Request, response: Response, branch_id: str = None, db: Session = Depends(get_db)):
     query = db.query(Collection).filter(Collection.deleted_at == None)
     if branch_id:
         query = query.filter(Collection.branch_id == branch_id)
-    return query.all()
+    cached = not_modified(request, response, make_etag(request, lookup_cache.version(db, "collections")))
+    if cached:
+        return cached
+    return lookup_cache.get(db, "collections", ("list", branch_id), lambda: [CollectionResponse.model_validate(c) for c in query.all()])
 
 @router.post("/", response_model=CollectionResponse)
 def create_collection(collection: CollectionCreate, db: Session = Depends(get_db), admin = Depends(get_admin_user)):
@@ -34,12 +39,14 @@ def create_collection(collection: CollectionCreate, db: Session = Depends(get_db
             existing_collection.buy_price_per_sqm = collection.buy_price_per_sqm
             existing_collection.price_usd_per_sqm = collection.price_usd_per_sqm
             db.commit()
+            lookup_cache.invalidate("collections")
             db.refresh(existing_collection)
             return existing_collection
 
     db_collection = Collection(**collection.dict())
     db.add(db_collection)
     db.commit()
+    lookup_cache.invalidate("collections")
     db.refresh(db_collection)
     return db_collection
 
@@ -70,6 +77,7 @@ def update_collection(collection_id: str, collection: CollectionCreate, db: Sess
             # For fixed units, we might have a different logic, but usually collections are for metraj
                 
     db.commit()
+    lookup_cache.invalidate("collections")
     db.refresh(db_collection)
     return db_collection
 
@@ -82,4 +90,5 @@ def delete_collection(collection_id: str, db: Session = Depends(get_db), admin =
     from datetime import datetime, timezone
     db_collection.deleted_at = datetime.now(timezone.utc)
     db.commit()
+    lookup_cache.invalidate("collections")
     return {"message": "Collection deleted"}
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from decimal import Decimal
 from ..database import get_db
 from ..models.debt import Debt, Payment
 from ..schemas.debt import DebtCreate, DebtResponse, PaymentCreate, PaymentResponse
 from ..utils.dependencies import get_current_user
+from ..utils.pagination import keyset_page
+from ..utils.etag import version_stamp, make_etag, not_modified
+from ..utils.change_feed import record_event
+from ..utils.rollups import record_payment
+from ..utils.report_cache import cache as report_cache
+from ..utils.checkout import build_debt
 
 import logging
 logger = logging.getLogger(__name__)
@@ -15,26 +21,11 @@ router = APIRouter()
 @router.post("/", response_model=DebtResponse)
 def create_debt(debt: DebtCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     try:
-        # Calculate initial remaining
-        remaining = Decimal(str(debt.total_amount)) - Decimal(str(debt.paid_amount))
-        
-        new_debt = Debt(
-            debtor_name=debt.debtor_name,
-            phone_number=debt.phone_number,
-            order_details=debt.order_details,
-            branch_id=debt.branch_id or current_user.branch_id, # Use provided branch_id or user's branch
-            seller_id=current_user.id,
-            total_amount=debt.total_amount,
-            paid_amount=debt.paid_amount,
-            initial_payment=debt.paid_amount,
-            remaining_amount=remaining,
-            payment_deadline=debt.payment_deadline,
-            status="pending" if remaining > 0 else "paid",
-            exchange_rate=debt.exchange_rate or 12200.0
-        )
+        new_debt = build_debt(debt, current_user)
         
         db.add(new_debt)
         db.commit()
+        report_cache.invalidate(new_debt.branch_id, "debts")
         db.refresh(new_debt)
         return new_debt
     except Exception as e:
@@ -45,10 +36,28 @@ def create_debt(debt: DebtCreate, db: Session = Depends(get_db), current_user =
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/", response_model=List[DebtResponse])
-def read_debts(skip: int = 0, limit: int = 10000, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def read_debts(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 10000,
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
     query = db.query(Debt).filter(Debt.deleted_at == None)
     if current_user.role == "seller":
         query = query.filter(Debt.branch_id == current_user.branch_id)
+
+    # Payments bump their debt's paid/remaining amounts, so the debt stamp covers them
+    etag = make_etag(request, current_user.role, current_user.branch_id, version_stamp(query, Debt))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    if cursor or page_size:
+        return keyset_page(query, Debt.created_at, Debt.id, cursor, page_size, response)
     return query.offset(skip).limit(limit).all()
 
 @router.post("/{debt_id}/payments", response_model=PaymentResponse)
@@ -77,7 +86,22 @@ def create_payment(debt_id: str, payment: PaymentCreate, db: Session = Depends(g
         debt.status = "paid"
         
     db.add(new_payment)
+    db.flush()
+
+    record_event(db, "debt.paid", debt.branch_id, {
+        "id": debt.id,
+        "payment_id": new_payment.id,
+        "amount": new_payment.amount,
+        "payment_date": new_payment.payment_date,
+        "recorded_by": new_payment.recorded_by,
+        "paid_amount": debt.paid_amount,
+        "remaining_amount": debt.remaining_amount,
+        "status": debt.status,
+    })
+    record_payment(db, new_payment, debt)
+
     db.commit()
+    report_cache.invalidate(debt.branch_id, "debts")
     db.refresh(new_payment)
     return new_payment
 
@@ -96,5 +120,6 @@ def delete_debt(debt_id: str, db: Session = Depends(get_db), current_user = Depe
     debt.deleted_at = datetime.now(timezone.utc)
     debt.deleted_by = current_user.id
     db.commit()
+    report_cache.invalidate(debt.branch_id, "debts")
     
     return {"message": "Debt deleted successfully"}
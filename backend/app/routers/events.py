@@ -0,0 +1,79 @@
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from ..utils.dependencies import get_user_from_url_token
+from ..utils.change_feed import feed, load_events_after, format_sse, RESET, REPLAY_LIMIT, HEARTBEAT_INTERVAL
+
+import logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/")
+async def stream_events(
+    request: Request,
+    last_event_id: Optional[int] = Query(None),
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID"),
+    # EventSource can't send an Authorization header; the token is only checked on connect
+    current_user = Depends(get_user_from_url_token("events"))
+):
+    """
+    Server-sent change events for the caller's branch (all branches for admins).
+
+    Reconnecting EventSource clients send Last-Event-ID and get the events they
+    missed replayed first. If too many were missed, or the client reads too
+    slowly, a `reset` event tells it to resync via /api/sync.
+    """
+    if current_user.role == "seller" and current_user.branch_id is None:
+        # A branch of None is the all-branches (admin) subscription
+        raise HTTPException(status_code=403, detail="Seller is not assigned to a branch")
+    branch_id = current_user.branch_id if current_user.role == "seller" else None
+    resume_from = last_event_id_header if last_event_id_header is not None else last_event_id
+
+    # Subscribe before replaying so nothing committed in between is lost;
+    # live events already sent by the replay are skipped by id.
+    subscription = feed.subscribe(branch_id)
+    logger.info(f"Change feed: {current_user.username} subscribed (branch={branch_id}, resume={resume_from})")
+
+    async def stream():
+        replayed = set()
+        try:
+            yield "retry: 3000\n\n"
+            if resume_from is not None:
+                missed = await run_in_threadpool(load_events_after, resume_from, branch_id, REPLAY_LIMIT + 1)
+                if len(missed) > REPLAY_LIMIT:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                for event in missed:
+                    yield format_sse(event)
+                    replayed.add(event["id"])
+
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event is RESET:
+                    yield "event: reset\ndata: {}\n\n"
+                    break
+                if event["id"] in replayed:
+                    continue
+                yield format_sse(event)
+        finally:
+            feed.unsubscribe(subscription)
+            logger.info(f"Change feed: {current_user.username} disconnected")
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Tell nginx not to buffer the stream
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import get_db
 from ..models.expense import Expense
 from ..schemas.expense import ExpenseCreate, ExpenseResponse
 from ..utils.dependencies import get_current_user
+from ..utils.pagination import keyset_page
+from ..utils.etag import version_stamp, make_etag, not_modified
+from ..utils.rollups import record_expense
+from ..utils.report_cache import cache as report_cache
 
 import logging
 logger = logging.getLogger(__name__)
@@ -31,7 +35,10 @@ def create_expense(
         )
         
         db.add(new_expense)
+        db.flush()
+        record_expense(db, new_expense)
         db.commit()
+        report_cache.invalidate(new_expense.branch_id, "expenses")
         db.refresh(new_expense)
         return new_expense
     except Exception as e:
@@ -43,19 +50,31 @@ def create_expense(
 
 @router.get("/", response_model=List[ExpenseResponse])
 def read_expenses(
+    request: Request,
+    response: Response,
     skip: int = 0, 
     limit: int = 10000, 
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1),
     db: Session = Depends(get_db), 
     current_user = Depends(get_current_user)
 ):
-    query = db.query(Expense).order_by(Expense.created_at.desc())
+    query = db.query(Expense).filter(Expense.deleted_at == None)
     
     if current_user.role == "seller":
         # Sellers only see their branch expenses
         if current_user.branch_id:
             query = query.filter(Expense.branch_id == current_user.branch_id)
-    
-    return query.offset(skip).limit(limit).all()
+
+    etag = make_etag(request, current_user.role, current_user.branch_id, version_stamp(query, Expense))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    if cursor or page_size:
+        return keyset_page(query, Expense.created_at, Expense.id, cursor, page_size, response)
+
+    return query.order_by(Expense.created_at.desc()).offset(skip).limit(limit).all()
 
 @router.delete("/{expense_id}")
 def delete_expense(
@@ -63,7 +82,7 @@ def delete_expense(
     db: Session = Depends(get_db), 
     current_user = Depends(get_current_user)
 ):
-    expense = db.query(Expense).filter(Expense.id == expense_id).first()
+    expense = db.query(Expense).filter(Expense.id == expense_id, Expense.deleted_at == None).first()
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
     
@@ -71,6 +90,11 @@ def delete_expense(
     if current_user.role != "admin" and str(expense.seller_id) != str(current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db.delete(expense)
+    # Soft delete so delta sync can hand out a tombstone
+    from datetime import datetime, timezone
+    expense.deleted_at = datetime.now(timezone.utc)
+    expense.deleted_by = current_user.id
+    record_expense(db, expense, sign=-1)
     db.commit()
+    report_cache.invalidate(expense.branch_id, "expenses")
     return {"status": "success"}
@@ -0,0 +1,25 @@
+"""In-process counters for monitoring. Each worker reports its own."""
+import os
+
+from fastapi import APIRouter, Depends
+
+from ..utils.dependencies import get_admin_user
+from ..utils.lookup_cache import cache as lookup_cache
+from ..utils.contention import stats as contention_stats
+from ..utils.scheduler import scheduler
+from ..utils.report_cache import cache as report_cache
+
+router = APIRouter()
+
+@router.get("/")
+def read_metrics(current_user = Depends(get_admin_user)):
+    return {
+        "pid": os.getpid(),
+        "lookup_cache": lookup_cache.snapshot(),
+        # Optimistic stock updates per resource (product, size, roll)
+        "stock_contention": contention_stats.snapshot(),
+        # Background jobs: leadership, durations and failures (only the leader runs jobs)
+        "scheduler": scheduler.snapshot(),
+        # Report cache hits / builds / invalidations, and whether Redis is shared
+        "report_cache": report_cache.snapshot(),
+    }
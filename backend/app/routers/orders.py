@@ -0,0 +1,175 @@
+"""
+Checkout of a whole basket in one request and one transaction.
+
+The frontend used to POST /api/sales once per basket line and payment type,
+then POST /api/debts: N round trips, and a failure halfway left a partial
+order behind. Here every line is validated and deducted, and all sales and
+the debt are written, or nothing is.
+"""
+from collections import defaultdict
+from decimal import Decimal
+import time
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..models.sale import Sale, PaymentType
+from ..models.product import Product, ProductType
+from ..schemas.order import OrderCreate, OrderResponse
+from ..utils.dependencies import get_current_user
+from ..utils.change_feed import record_event
+from ..utils.rollups import record_sales
+from ..utils.report_cache import cache as report_cache
+from ..utils.roll_allocator import Cut
+from ..utils.stock import cut_rolls
+from ..utils.reservations import BasketCoverage, basket_reservations, release, check_owner
+from ..utils.checkout import (
+    deduct_units, deduct_metres, get_exchange_rate, standard_values, profit_breakdown,
+    sale_event_payload, stock_event_payload, build_debt,
+)
+
+import logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Payments are spread over the lines in this order (same as the old client-side split)
+PAYMENT_ORDER = (PaymentType.CASH, PaymentType.CARD, PaymentType.TRANSFER, PaymentType.DEBT)
+CENT = Decimal("0.01")
+
+
+def _line_totals(standards: list[Decimal], total: Decimal) -> list[Decimal]:
+    """
+    Split the agreed total over the lines in proportion to their list value.
+    The last line takes the rounding remainder so the lines add up exactly.
+    """
+    standard_total = sum(standards, Decimal("0"))
+    totals = []
+    for standard in standards[:-1]:
+        share = standard / standard_total if standard_total else Decimal(1) / len(standards)
+        totals.append((total * share).quantize(CENT))
+    totals.append(total - sum(totals, Decimal("0")))
+    return totals
+
+
+def _payment_chunks(payments, line_totals: list[Decimal]) -> list[list[tuple]]:
+    """For each line, the (payment_type, amount) chunks that pay for it."""
+    remaining = defaultdict(Decimal)
+    for payment in payments:
+        remaining[payment.payment_type] += Decimal(str(payment.amount))
+
+    chunks = []
+    for line_total in line_totals:
+        due, line = line_total, []
+        for payment_type in PAYMENT_ORDER:
+            if due <= 0:
+                break
+            take = min(due, remaining[payment_type])
+            if take > 0:
+                line.append((payment_type, take))
+                remaining[payment_type] -= take
+                due -= take
+        chunks.append(line)
+    return chunks
+
+
+@router.post("/", response_model=OrderResponse)
+def create_order(order: OrderCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    order_id = order.order_id or f"o{int(time.time() * 1000)}"
+
+    product_ids = {item.product_id for item in order.items}
+    products = {
+        p.id: p for p in
+        db.query(Product).filter(Product.id.in_(product_ids), Product.deleted_at == None).all()
+    }
+    missing = product_ids - products.keys()
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Product not found: {sorted(map(str, missing))[0]}")
+    if order.basket_id:
+        # Only the caller's own holds may cover the order
+        check_owner(db, order.basket_id, current_user)
+
+    metres = []
+    for item in order.items:
+        product = products[item.product_id]
+        metres.append(Decimal(str(item.length if item.length else item.quantity)) if product.type == ProductType.METER else None)
+
+    # Rolls first, the whole basket allocated at once so two cuts can't claim the same roll
+    roll_cuts = [
+        (item.product_id, Cut(width=item.width, length=metres[i], key=i))
+        for i, item in enumerate(order.items)
+        if metres[i] is not None and item.width
+    ]
+    if roll_cuts:
+        cut_rolls(db, roll_cuts)
+
+    # Then sizes and product totals, in product id order. Lines covered by the
+    # basket's reservations skip the reservation check; the stock was set aside
+    # for them when they were reserved.
+    coverage = BasketCoverage(basket_reservations(db, order.basket_id) if order.basket_id else [])
+    for i in sorted(range(len(order.items)), key=lambda i: (str(order.items[i].product_id), i)):
+        item = order.items[i]
+        product = products[item.product_id]
+        if metres[i] is None:
+            covered = coverage.take_units(product.id, item.size, item.quantity)
+            deduct_units(db, product, item.quantity, item.size, current_user, order.basket_id, covered)
+        else:
+            covered = coverage.take_metres(product.id, metres[i])
+            deduct_metres(db, product, metres[i], current_user, order.basket_id, covered)
+
+    exchange_rate = get_exchange_rate(db)
+    values = [
+        standard_values(products[item.product_id], exchange_rate, item.quantity, item.length)
+        for item in order.items
+    ]
+    order_total = sum((Decimal(str(p.amount)) for p in order.payments), Decimal("0"))
+    line_totals = _line_totals([standard for standard, _ in values], order_total)
+
+    sales = []
+    for item, (standard, cost), line_total, chunks in zip(order.items, values, line_totals, _payment_chunks(order.payments, line_totals)):
+        product = products[item.product_id]
+        for n, (payment_type, amount) in enumerate(chunks):
+            share = amount / line_total if line_total else Decimal("1")
+            if product.type == ProductType.UNIT and item.quantity == 1:
+                # A single carpet isn't split: the first payment carries it
+                quantity = 1 if n == 0 else 0
+            else:
+                quantity = Decimal(str(item.quantity)) * share
+            sales.append(Sale(
+                product_id=product.id,
+                branch_id=current_user.branch_id if current_user.branch_id else product.branch_id,
+                seller_id=current_user.id,
+                quantity=quantity,
+                payment_type=payment_type,
+                order_id=order_id,
+                width=item.width,
+                length=Decimal(str(item.length)) * share if item.length else None,
+                area=Decimal(str(item.area)) * share if item.area else None,
+                is_nasiya=order.is_nasiya,
+                exchange_rate=exchange_rate,
+                **profit_breakdown(standard * share, cost * share, amount),
+            ))
+
+    # One flush: the sales go out as a single multi-row INSERT
+    db.add_all(sales)
+    debt = build_debt(order.debt, current_user, order_id) if order.debt else None
+    if debt is not None:
+        db.add(debt)
+    if order.basket_id:
+        release(db, order.basket_id) # converted
+    db.flush()
+
+    for sale in sales:
+        record_event(db, "sale.created", sale.branch_id, sale_event_payload(sale, products[sale.product_id]))
+    for product in products.values():
+        record_event(db, "product.stock_changed", product.branch_id, stock_event_payload(product))
+    record_sales(db, sales, {product.id: product.type for product in products.values()})
+
+    db.commit()
+    for branch_id in {sale.branch_id for sale in sales}:
+        report_cache.invalidate(branch_id, "sales", "products")
+    if debt is not None:
+        report_cache.invalidate(debt.branch_id, "debts")
+    logger.info(f"Order {order_id}: {len(order.items)} items, {len(sales)} sales")
+    return OrderResponse(order_id=order_id, sales=sales, debt=debt)
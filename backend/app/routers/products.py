@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile, BackgroundTasks, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import base64
 import imagehash
 from ..database import get_db
 from ..models.product import Product
-from ..schemas.product import ProductCreate, ProductResponse, ProductUpdate
+from ..schemas.product import ProductCreate, ProductResponse, ProductUpdate, RollPlanRequest, RollPlanItem
 from ..utils.dependencies import get_current_user, get_admin_user
 from ..utils.image import compute_image_hash
+from ..utils.pagination import keyset_page, MAX_PAGE_SIZE
+from ..utils.etag import version_stamp, make_etag, not_modified
+from ..utils.change_feed import record_event
+from ..utils.report_cache import cache as report_cache
+from ..utils.fast_json import response_columns, json_list_response
+from ..utils.product_search import search_products
+from ..utils.stock import with_available_sizes, in_stock_with_size, load_rolls, plan_cuts
+from ..utils.roll_allocator import Cut
+from ..models.stock_item import parse_size
 import logging
 logger = logging.getLogger(__name__)
 
@@ -56,11 +65,16 @@ def compute_clip_embedding_background(product_id: str, image_data: bytes):
 
 @router.get("/", response_model=List[ProductResponse])
 def read_products(
+    request: Request,
+    response: Response,
     skip: int = 0, 
     limit: int = 10000, 
     branch_id: Optional[str] = None,
     category: Optional[str] = None,
     collection: Optional[str] = None, 
+    size: Optional[str] = None,
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1),
     db: Session = Depends(get_db), 
     current_user = Depends(get_current_user)
 ):
@@ -94,23 +108,32 @@ def read_products(
             query = query.filter(Product.category == category)
         if collection:
             query = query.filter(Product.collection == collection)
+        if size:
+            # e.g. size=2x3: only products with that size in stock
+            width, length = parse_size(size)
+            if width is None:
+                raise HTTPException(status_code=400, detail="Invalid size, expected WxL")
+            query = in_stock_with_size(query, width, length)
             
+        etag = make_etag(request, current_user.role, current_user.branch_id, version_stamp(query, Product))
+        cached = not_modified(request, response, etag)
+        if cached:
+            return cached
+
         logger.debug(f"Executing query for user {current_user.username} (role: {current_user.role})")
-        products = query.offset(skip).limit(limit).all()
-        logger.debug(f"Query finished. Found {len(products)} products")
-        
-        # Diagnostic: check for problematic products
-        for i, p in enumerate(products):
-             try:
-                 # Check if we can access all fields
-                 _ = p.id, p.code, p.category, p.type, p.photo[:10] if p.photo else None
-                 if i % 10 == 0:
-                     logger.debug(f"Processed {i} products...")
-             except Exception as e:
-                 logger.error(f"Problematic product at index {i}: id={p.id}, error={e}")
-                 
+        # Plain column rows instead of ORM objects, encoded with orjson rather than
+        # validated one by one through ProductResponse (same fields, same shape).
+        query = query.with_entities(*response_columns(Product, ProductResponse))
+        if cursor or page_size:
+            # Keyset mode: created_at is stable, unlike updated_at which moves on every sale
+            products = keyset_page(query, Product.created_at, Product.id, cursor, page_size, response)
+        else:
+            products = query.offset(skip).limit(limit).all()
+        products = with_available_sizes(db, products)
         logger.debug(f"Returning {len(products)} products")
-        return products
+        return json_list_response(products, response)
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         error_msg = f"Error in read_products: {str(e)}\n{traceback.format_exc()}"
@@ -173,11 +196,11 @@ def create_product(
 
     # Auto-calculate sell_price if collection has price_per_sqm and sizes are provided
     # Only if sell_price is not explicitly provided or we want to enforce it
-    from ..models.collection import Collection
+    from ..utils.lookup_cache import collection_by_name
     
     # Refresh logic for collection price
     if product.collection and (product.width or (product.available_sizes and len(product.available_sizes) > 0)):
-        coll = db.query(Collection).filter(Collection.name == product.collection).first()
+        coll = collection_by_name(db, product.collection, product.branch_id)
         if coll and coll.price_per_sqm:
             area = 0
             if product.width:
@@ -194,6 +217,7 @@ def create_product(
     new_product = Product(**product_data)
     db.add(new_product)
     db.commit()
+    report_cache.invalidate(new_product.branch_id, "products")
     db.refresh(new_product)
     
     # Запускаем фоновую задачу для CLIP embedding
@@ -207,6 +231,79 @@ def create_product(
     
     return new_product
 
+@router.get("/search", response_model=List[ProductResponse])
+def search_products_by_text(
+    q: str = Query(..., min_length=1, max_length=64),
+    branch_id: Optional[str] = None,
+    category: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Typo-tolerant lookup by partial code, collection or category, best match first.
+    Sellers are always scoped to their own branch.
+    """
+    import uuid
+    query = db.query(Product).filter(Product.deleted_at == None)
+
+    if current_user.role == "seller" and current_user.branch_id:
+        query = query.filter(Product.branch_id == current_user.branch_id)
+    elif branch_id and branch_id != "all":
+        try:
+            query = query.filter(Product.branch_id == uuid.UUID(branch_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid branch_id")
+
+    if category:
+        query = query.filter(Product.category == category)
+
+    page_size = min(page_size, MAX_PAGE_SIZE)
+    rows = search_products(
+        db, query, q, response_columns(Product, ProductResponse),
+        limit=page_size, offset=(page - 1) * page_size,
+    )
+    return json_list_response(with_available_sizes(db, rows), Response())
+
+@router.post("/rolls/plan", response_model=List[RollPlanItem])
+def plan_roll_cuts(
+    plan: RollPlanRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Dry run of roll allocation for a basket of metraj cuts: which roll each
+    cut would be taken from, using the same allocator as POST /api/sales.
+    Nothing is locked or written.
+    """
+    product_ids = {cut.product_id for cut in plan.cuts}
+    query = db.query(Product.id).filter(Product.id.in_(product_ids), Product.deleted_at == None)
+    if current_user.role == "seller":
+        query = query.filter(Product.branch_id == current_user.branch_id)
+    found = {row.id for row in query.all()}
+    missing = product_ids - found
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Product not found: {next(iter(missing))}")
+
+    rolls = load_rolls(db, product_ids)
+    allocations = plan_cuts(rolls, [
+        (cut.product_id, Cut(width=cut.width, length=cut.length)) for cut in plan.cuts
+    ])
+    return [
+        RollPlanItem(
+            product_id=cut.product_id,
+            width=cut.width,
+            length=cut.length,
+            roll_id=allocation.roll_id,
+            roll_size=f"{cut.width:g}x{float(allocation.length_before):g}" if allocation.roll_id else None,
+            length_before=allocation.length_before,
+            length_after=allocation.length_after,
+            waste=allocation.waste,
+        )
+        for cut, allocation in zip(plan.cuts, allocations)
+    ]
+
 @router.get("/{product_id}", response_model=ProductResponse)
 def read_product(product_id: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     product = db.query(Product).filter(Product.id == product_id, Product.deleted_at == None).first()
@@ -517,7 +614,9 @@ def update_product(
     for key, value in update_data.items():
         setattr(db_product, key, value)
 
+    record_event(db, "product.updated", db_product.branch_id, {"id": db_product.id})
     db.commit()
+    report_cache.invalidate(db_product.branch_id, "products")
     db.refresh(db_product)
     
     # Запускаем фоновую задачу для CLIP embedding если фото обновлено
@@ -547,6 +646,8 @@ def delete_product(product_id: str, db: Session = Depends(get_db), current_user
     from datetime import datetime, timezone
     db_product.deleted_at = datetime.now(timezone.utc)
     db_product.deleted_by = current_user.id
-    
+
+    record_event(db, "product.deleted", db_product.branch_id, {"id": db_product.id})
     db.commit()
+    report_cache.invalidate(db_product.branch_id, "products")
     return {"status": "success"}
@@ -0,0 +1,680 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, func, literal
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from decimal import Decimal
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from uuid import UUID
+from ..database import get_db
+from ..models.product import Product, ProductType
+from ..models.branch import Branch
+from ..models.settings import Settings
+from ..models.sale import Sale
+from ..models.debt import Debt, Payment
+from ..models.rollup import DailyRollup
+from ..models.cash_closure import CashClosure
+from ..models.expense import Expense
+from ..models.user import User
+from ..schemas.report import (
+    WarehouseReport, BranchValuation, CollectionValuation, StockValuation,
+    RecognizedProfitReport, BranchRecognizedProfit, DailyRollupRow,
+    CashClosureReport, CashClosureCreate, StaffProfitReport, BranchPnlReport,
+    DebtAgingReport, DebtAgingTotals, SalesVelocityReport, SalesHistoryReport,
+)
+from ..schemas.debt import DebtResponse
+from ..utils.dependencies import get_admin_user, get_current_user, get_user_from_url_token
+from ..utils.etag import version_stamp, make_etag, not_modified
+from ..utils.profit import recognized_profit, staff_distribution
+from ..utils.cash_closure import open_shift, shift_totals
+from ..utils.pnl import CURRENCIES, branch_pnl, open_end
+from ..utils.rollups import day_start, local_day
+from ..utils.debt_aging import BUCKETS, debt_aging, in_bucket, week_starts
+from ..utils.pagination import keyset_page
+from ..utils.velocity import GROUPS, WINDOWS, sales_velocity
+from ..utils.export import FORMATS, KINDS, stream_export
+from ..utils import snapshot
+from ..utils.report_store import load_snapshot, refresh_snapshot
+from ..utils.report_cache import cache as report_cache, tags_for
+from ..utils.checkout import get_exchange_rate
+from ..utils.lookup_cache import cache as lookup_cache
+
+import logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def _cached_report(key: tuple, version: str, build, db: Session, schema, tags=(), role=None):
+    """
+    The report for `key` (report, branch, period..., currency) at `version`:
+    from the report cache (utils/report_cache.py, per role, invalidated by
+    writes to `tags`), else as precomputed by a scheduled job, else built now.
+    """
+    def load_or_build():
+        return load_snapshot(db, key, version, schema) or build()
+    return report_cache.get_or_build((*key, role), version, load_or_build, schema, tags)
+
+VALUATION_FIELDS = ("product_count", "quantity", "metres", "cost_value", "sell_value", "potential_profit")
+
+def _warehouse_version(db: Session) -> str:
+    """
+    Changes on every stock-changing write: sales, product edits and deletes
+    all bump products.updated_at; rate changes bump settings.updated_at.
+    Deleted rows are included so a soft delete still moves the stamp.
+    """
+    settings_stamp = db.query(func.max(Settings.updated_at)).scalar()
+    return "|".join([
+        version_stamp(db.query(Product), Product),
+        version_stamp(db.query(Branch), Branch),
+        settings_stamp.isoformat() if settings_stamp else "-",
+    ])
+
+def _sum(rows, **extra):
+    totals = {field: 0 for field in VALUATION_FIELDS}
+    for row in rows:
+        for field in VALUATION_FIELDS:
+            totals[field] += getattr(row, field)
+    return {**totals, **extra}
+
+def _build_warehouse_report(db: Session) -> WarehouseReport:
+    settings = db.query(Settings).first()
+    rate = Decimal(str(settings.exchange_rate if settings else 12200.0))
+
+    is_meter = Product.type == ProductType.METER
+    # Same normalization as create_sale: buy price and unit sell price follow
+    # is_usd_priced; metraj sell_price_per_meter is always USD per linear metre.
+    buy_usd = case((Product.is_usd_priced == True, Product.buy_price), else_=Product.buy_price / literal(rate))
+    unit_sell_usd = case((Product.is_usd_priced == True, Product.sell_price), else_=Product.sell_price / literal(rate))
+    meter_sell_usd = func.coalesce(Product.sell_price_per_meter, Product.sell_price)
+    metres = func.coalesce(Product.remaining_length, Product.total_length, 0)
+    stock = case((is_meter, metres), else_=Product.quantity)
+
+    rows = (
+        db.query(
+            Product.branch_id,
+            Product.collection,
+            func.count(Product.id).label("product_count"),
+            func.sum(case((is_meter, 0), else_=Product.quantity)).label("quantity"),
+            func.sum(case((is_meter, metres), else_=0)).label("metres"),
+            func.sum(buy_usd * stock).label("cost_value"),
+            func.sum(case((is_meter, meter_sell_usd), else_=unit_sell_usd) * stock).label("sell_value"),
+        )
+        .filter(Product.deleted_at == None)
+        .group_by(Product.branch_id, Product.collection)
+        .all()
+    )
+
+    by_branch: dict = {}
+    for row in rows:
+        cost = float(row.cost_value or 0)
+        sell = float(row.sell_value or 0)
+        by_branch.setdefault(row.branch_id, []).append(CollectionValuation(
+            collection=row.collection,
+            product_count=row.product_count,
+            quantity=int(row.quantity or 0),
+            metres=float(row.metres or 0),
+            cost_value=cost,
+            sell_value=sell,
+            potential_profit=sell - cost,
+        ))
+
+    branches = []
+    for branch in db.query(Branch).filter(Branch.deleted_at == None).order_by(Branch.name).all():
+        collections = sorted(by_branch.get(branch.id, []), key=lambda c: c.cost_value, reverse=True)
+        branches.append(BranchValuation(
+            **_sum(collections), branch_id=branch.id, branch_name=branch.name, collections=collections,
+        ))
+
+    return WarehouseReport(
+        exchange_rate=float(rate),
+        totals=StockValuation(**_sum(branches)),
+        branches=branches,
+    )
+
+@router.get("/warehouse", response_model=WarehouseReport)
+def warehouse_report(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_admin_user)
+):
+    """
+    Stock quantity, metres, cost value and potential profit per branch and
+    per collection, in USD. Aggregated in SQL and reused until the next
+    stock-changing write.
+    """
+    version = _warehouse_version(db)
+    cached = not_modified(request, response, make_etag(request, version))
+    if cached:
+        return cached
+
+    return _cached_report(
+        ("warehouse",), version, lambda: _build_warehouse_report(db), db, WarehouseReport,
+        tags_for(["products"]), current_user.role,
+    )
+
+def _money_version(db: Session) -> str:
+    """Changes on every sale, debt and debt payment (including edits and deletes)."""
+    return "|".join([
+        version_stamp(db.query(Sale), Sale),
+        version_stamp(db.query(Debt), Debt),
+        version_stamp(db.query(Payment), Payment),
+        version_stamp(db.query(Branch), Branch),
+    ])
+
+@router.get("/recognized-profit", response_model=RecognizedProfitReport)
+def recognized_profit_report(
+    request: Request,
+    response: Response,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    branch_id: Optional[UUID] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_admin_user)
+):
+    """
+    Profit recognized cost-first (see utils/profit.py) from money received
+    in [start, end), per branch, in USD. Without start it covers all
+    history; without end, up to now.
+    """
+    version = _money_version(db)
+    cached = not_modified(request, response, make_etag(request, version))
+    if cached:
+        return cached
+
+    return _cached_report(
+        ("recognized", branch_id, start, end), version, lambda: _build_recognized_profit(db, start, end, branch_id),
+        db, RecognizedProfitReport, tags_for(["sales", "debts"], branch_id), current_user.role,
+    )
+
+def _build_recognized_profit(db: Session, start, end, branch_id) -> RecognizedProfitReport:
+    by_branch = recognized_profit(db, start, end, branch_id)
+    branches_query = db.query(Branch).filter(Branch.deleted_at == None)
+    if branch_id is not None:
+        branches_query = branches_query.filter(Branch.id == branch_id)
+    branches = []
+    for branch in branches_query.order_by(Branch.name).all():
+        profit, orders = by_branch.get(branch.id, (0, 0))
+        branches.append(BranchRecognizedProfit(
+            branch_id=branch.id, branch_name=branch.name, recognized_profit=profit, order_count=orders,
+        ))
+    return RecognizedProfitReport(
+        start=start,
+        end=end,
+        recognized_profit=sum(b.recognized_profit for b in branches),
+        order_count=sum(b.order_count for b in branches),
+        branches=branches,
+    )
+
+@router.get("/daily", response_model=List[DailyRollupRow])
+def daily_rollups(
+    request: Request,
+    response: Response,
+    start: date,
+    end: date,
+    branch_id: Optional[UUID] = None,
+    seller_id: Optional[UUID] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Daily sums of sales, expenses and debt payments for local days
+    start..end (inclusive), one row per day, branch, user, kind, payment
+    type and currency. Sellers only see their own branch.
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail="end is before start")
+    if current_user.role == "seller":
+        branch_id = current_user.branch_id
+
+    query = db.query(DailyRollup).filter(DailyRollup.day >= start, DailyRollup.day <= end)
+    if branch_id is not None:
+        query = query.filter(DailyRollup.branch_id == branch_id)
+    if seller_id is not None:
+        query = query.filter(DailyRollup.seller_id == seller_id)
+
+    cached = not_modified(request, response, make_etag(request, branch_id, version_stamp(query, DailyRollup)))
+    if cached:
+        return cached
+    return query.order_by(DailyRollup.day, DailyRollup.branch_id).all()
+
+def _branch_scope(branch_id: UUID, current_user) -> UUID:
+    if current_user.role == "seller" and branch_id != current_user.branch_id:
+        raise HTTPException(status_code=403, detail="Not authorized for this branch")
+    return branch_id
+
+def _closure_report(closure: CashClosure) -> CashClosureReport:
+    return CashClosureReport(
+        id=closure.id,
+        branch_id=closure.branch_id,
+        start=closure.opened_at,
+        end=closure.closed_at,
+        closed=True,
+        **{field: getattr(closure, field) for field in (
+            "opening_balance", "cash_sales", "card_sales", "transfer_sales", "debt_payments", "cash_expenses",
+            "sale_count", "expected_cash", "counted_cash", "difference", "carried_over", "closed_by", "note",
+        )},
+    )
+
+@router.get("/cash-closure", response_model=CashClosureReport)
+def cash_closure_report(
+    branch_id: UUID,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Kassa totals of a branch (see utils/cash_closure.py). Without start it
+    is the open shift, from the last closure up to now. A start where a
+    closed shift begins returns that shift's frozen snapshot.
+    """
+    branch_id = _branch_scope(branch_id, current_user)
+    if start is not None:
+        closure = db.query(CashClosure).filter(CashClosure.branch_id == branch_id, CashClosure.opened_at == start).first()
+        if closure is not None:
+            return _closure_report(closure)
+        opening_balance = 0
+    else:
+        start, opening_balance = open_shift(db, branch_id)
+    end = end or datetime.now(timezone.utc)
+    return CashClosureReport(branch_id=branch_id, start=start, end=end, **shift_totals(db, branch_id, start, end, opening_balance))
+
+@router.post("/cash-closure", response_model=CashClosureReport)
+def close_cash_shift(
+    closure_in: CashClosureCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Close the branch's open shift at now: its totals are frozen together
+    with the counted cash, and the next shift opens with carried_over.
+    """
+    branch_id = _branch_scope(closure_in.branch_id, current_user)
+    start, opening_balance = open_shift(db, branch_id)
+    end = datetime.now(timezone.utc)
+    totals = shift_totals(db, branch_id, start, end, opening_balance)
+    counted = Decimal(str(closure_in.counted_cash))
+    closure = CashClosure(
+        branch_id=branch_id,
+        opened_at=start,
+        closed_at=end,
+        closed_by=current_user.id,
+        exchange_rate=get_exchange_rate(db),
+        counted_cash=counted,
+        difference=counted - totals["expected_cash"],
+        carried_over=closure_in.carried_over,
+        note=closure_in.note,
+        **totals,
+    )
+    db.add(closure)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="This shift has already been closed")
+    db.refresh(closure)
+    logger.info(f"Cash shift of branch {branch_id} closed: expected {totals['expected_cash']}, counted {counted}")
+    return _closure_report(closure)
+
+@router.get("/cash-closures", response_model=List[CashClosureReport])
+def list_cash_closures(
+    branch_id: UUID,
+    limit: int = 30,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Closed shifts of a branch, newest first."""
+    branch_id = _branch_scope(branch_id, current_user)
+    closures = (
+        db.query(CashClosure)
+        .filter(CashClosure.branch_id == branch_id)
+        .order_by(CashClosure.closed_at.desc())
+        .limit(limit)
+        .all()
+    )
+    return [_closure_report(closure) for closure in closures]
+
+@router.get("/staff-profit", response_model=StaffProfitReport)
+def staff_profit_report(
+    request: Request,
+    response: Response,
+    branch_id: UUID,
+    start: datetime,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Seller profit, expenses and each staff member's payout for a branch
+    and period (see utils/profit.py). Sellers only see their own branch.
+    """
+    branch_id = _branch_scope(branch_id, current_user)
+    sales = db.query(Sale).filter(Sale.branch_id == branch_id)
+    expenses = db.query(Expense).filter(Expense.branch_id == branch_id)
+    version = "|".join([
+        version_stamp(sales, Sale),
+        version_stamp(expenses, Expense),
+        lookup_cache.version(db, "staff"),
+    ])
+    cached = not_modified(request, response, make_etag(request, version))
+    if cached:
+        return cached
+    return _cached_report(
+        ("staff", branch_id, start, end), version,
+        lambda: StaffProfitReport(branch_id=branch_id, start=start, end=end, **staff_distribution(db, branch_id, start, end)),
+        db, StaffProfitReport, tags_for(["sales", "expenses"], branch_id), current_user.role,
+    )
+
+@router.get("/branches/{branch_id}/pnl", response_model=BranchPnlReport)
+def branch_pnl_report(
+    request: Request,
+    response: Response,
+    branch_id: UUID,
+    start: datetime,
+    end: Optional[datetime] = None,
+    currency: str = "USD",
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Revenue, cost of goods, profit, expenses and debt of a branch for
+    [start, end) and the period of the same length before it (see
+    utils/pnl.py). UZS figures use each row's own exchange rate. Sellers
+    only see their own branch.
+    """
+    branch_id = _branch_scope(branch_id, current_user)
+    if currency not in CURRENCIES:
+        raise HTTPException(status_code=400, detail=f"currency must be one of {', '.join(CURRENCIES)}")
+    if end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    branch = db.query(Branch).filter(Branch.id == branch_id, Branch.deleted_at == None).first()
+    if not branch:
+        raise HTTPException(status_code=404, detail="Branch not found")
+
+    # Up to now: resolved here, so the key and ETag carry the period (and previous period) reported
+    end = end or open_end()
+    version = _pnl_version(db, branch_id, end)
+    cached = not_modified(request, response, make_etag(request, version))
+    if cached:
+        return cached
+    return _cached_report(
+        ("pnl", branch_id, start, end, currency), version,
+        lambda: _build_branch_pnl(db, branch, start, end, currency), db, BranchPnlReport,
+        tags_for(["sales", "expenses", "debts"], branch_id), current_user.role,
+    )
+
+def _pnl_version(db: Session, branch_id: UUID, end: datetime) -> str:
+    return "|".join([
+        end.isoformat(),
+        version_stamp(db.query(Sale).filter(Sale.branch_id == branch_id), Sale),
+        version_stamp(db.query(Expense).filter(Expense.branch_id == branch_id), Expense),
+        version_stamp(db.query(Debt).filter(Debt.branch_id == branch_id), Debt),
+        version_stamp(db.query(Payment).join(Debt, Payment.debt_id == Debt.id).filter(Debt.branch_id == branch_id), Payment),
+        # Debts turn overdue with the date
+        local_day(datetime.now(timezone.utc)).isoformat(),
+    ])
+
+def _build_branch_pnl(db: Session, branch: Branch, start, end, currency: str) -> BranchPnlReport:
+    return BranchPnlReport(
+        currency=currency, branch_id=branch.id, branch_name=branch.name,
+        **branch_pnl(db, branch.id, start, end, currency),
+    )
+
+AGING_WEEKS = 8
+AGING_WINDOW_DAYS = 28
+
+def _debts_version(db: Session, branch_id: Optional[UUID]) -> str:
+    debts = db.query(Debt)
+    payments = db.query(Payment).join(Debt, Payment.debt_id == Debt.id)
+    if branch_id is not None:
+        debts = debts.filter(Debt.branch_id == branch_id)
+        payments = payments.filter(Debt.branch_id == branch_id)
+    return "|".join([version_stamp(debts, Debt), version_stamp(payments, Payment)])
+
+@router.get("/debt-aging", response_model=DebtAgingReport)
+def debt_aging_report(
+    request: Request,
+    response: Response,
+    branch_id: Optional[UUID] = None,
+    weeks: int = Query(AGING_WEEKS, ge=1, le=26),
+    window_days: int = Query(AGING_WINDOW_DAYS, ge=7, le=365),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Open debt balances per branch and seller, bucketed by days past their
+    deadline, with payments collected over the last window_days and the
+    balance falling due in each of the next weeks (see utils/debt_aging.py).
+    UZS. Sellers only see their own branch.
+    """
+    if current_user.role == "seller":
+        branch_id = current_user.branch_id
+    today = local_day(datetime.now(timezone.utc))
+    version = "|".join([_debts_version(db, branch_id), today.isoformat()])
+    cached = not_modified(request, response, make_etag(request, version))
+    if cached:
+        return cached
+    return _cached_report(
+        ("debt-aging", branch_id, weeks, window_days), version,
+        lambda: _build_debt_aging(db, today, weeks, window_days, branch_id), db, DebtAgingReport,
+        tags_for(["debts"], branch_id), current_user.role,
+    )
+
+def _build_debt_aging(db: Session, today: date, weeks: int, window_days: int, branch_id: Optional[UUID]) -> DebtAgingReport:
+    rows = debt_aging(db, today, weeks, window_days, branch_id)
+    totals = DebtAgingTotals(
+        open_count=sum(row["open_count"] for row in rows),
+        overdue_count=sum(row["overdue_count"] for row in rows),
+        remaining=sum(row["remaining"] for row in rows),
+        buckets={bucket: sum(row["buckets"][bucket] for row in rows) for bucket in BUCKETS},
+        payment_count=sum(row["payment_count"] for row in rows),
+        collected=sum(row["collected"] for row in rows),
+        weekly_collection=sum(row["weekly_collection"] for row in rows),
+        expected=[sum(row["expected"][week] for row in rows) for week in range(weeks)],
+    )
+    return DebtAgingReport(
+        as_of=today, window_days=window_days, week_starts=week_starts(today, weeks), totals=totals, rows=rows,
+    )
+
+@router.get("/debt-aging/debts", response_model=List[DebtResponse])
+def debt_aging_debts(
+    request: Request,
+    response: Response,
+    bucket: str,
+    branch_id: Optional[UUID] = None,
+    seller_id: Optional[UUID] = None,
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Open debts in one aging bucket, newest first, one keyset page at a time
+    (next cursor in X-Next-Cursor). Fetched when a bucket is opened.
+    """
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(BUCKETS)}")
+    if current_user.role == "seller":
+        branch_id = current_user.branch_id
+    today = local_day(datetime.now(timezone.utc))
+    query = db.query(Debt).filter(in_bucket(bucket, today))
+    if branch_id is not None:
+        query = query.filter(Debt.branch_id == branch_id)
+    if seller_id is not None:
+        query = query.filter(Debt.seller_id == seller_id)
+
+    version = "|".join([_debts_version(db, branch_id), today.isoformat()])
+    cached = not_modified(request, response, make_etag(request, version))
+    if cached:
+        return cached
+    return keyset_page(query.options(selectinload(Debt.payments)), Debt.created_at, Debt.id, cursor, page_size, response)
+
+@router.get("/sales-velocity", response_model=SalesVelocityReport)
+def sales_velocity_report(
+    request: Request,
+    response: Response,
+    group_by: str = "collection",
+    branch_id: Optional[UUID] = None,
+    dead_only: bool = False,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_admin_user)
+):
+    """
+    Units and metres sold over the last 7, 30 and 90 days, current stock,
+    days of cover and dead stock per product, collection, size or branch
+    (see utils/velocity.py).
+    """
+    if group_by not in GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUPS)}")
+    today = local_day(datetime.now(timezone.utc))
+    version = "|".join([
+        version_stamp(db.query(Sale).filter(Sale.date >= day_start(today - timedelta(days=max(WINDOWS)))), Sale),
+        version_stamp(db.query(Product), Product),
+        today.isoformat(),
+    ])
+    cached = not_modified(request, response, make_etag(request, version))
+    if cached:
+        return cached
+
+    def build():
+        as_of, rows = sales_velocity(db, group_by, branch_id, dead_only)
+        return SalesVelocityReport(as_of=as_of, group_by=group_by, windows=list(WINDOWS), rows=rows)
+    return _cached_report(
+        ("velocity", group_by, branch_id, dead_only), version, build, db, SalesVelocityReport,
+        tags_for(["sales", "products"], branch_id), current_user.role,
+    )
+
+@router.get("/export/{kind}")
+def export_report(
+    kind: str,
+    format: str = "xlsx",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    branch_id: Optional[UUID] = None,
+    current_user = Depends(get_user_from_url_token("export"))
+):
+    """
+    Sales, debts, expenses or current stock as a CSV or XLSX file, streamed
+    as it is read (see utils/export.py). Sales, debts and expenses are limited
+    to [start, end). A short-lived export token (POST /api/auth/url-token)
+    is passed in the URL so a plain link can download it.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if kind not in KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {kind}")
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+    filename = f"{kind}_{local_day(datetime.now(timezone.utc)).isoformat()}.{format}"
+    return StreamingResponse(
+        stream_export(kind, format, branch_id, start, end),
+        media_type=FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            # Tell nginx not to buffer the download
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+@router.get("/sales-history", response_model=SalesHistoryReport)
+def sales_history_report(
+    request: Request,
+    response: Response,
+    group_by: str = "month",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    branch_id: Optional[UUID] = None,
+    currency: str = "USD",
+    db: Session = Depends(get_db),
+    current_user = Depends(get_admin_user)
+):
+    """
+    Sales per month, branch, seller or collection over any range, computed
+    from the Parquet snapshot (utils/snapshot.py) instead of the live tables.
+    as_of tells how far the snapshot goes.
+    """
+    if group_by not in snapshot.HISTORY_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(snapshot.HISTORY_GROUPS)}")
+    if currency not in CURRENCIES:
+        raise HTTPException(status_code=400, detail=f"currency must be one of {', '.join(CURRENCIES)}")
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    as_of = snapshot.watermark("sales") if snapshot.available() else None
+    if as_of is None:
+        raise HTTPException(status_code=503, detail="Analytics snapshot is not available yet")
+
+    cached = not_modified(request, response, make_etag(request, as_of.isoformat()))
+    if cached:
+        return cached
+
+    def build():
+        rows = snapshot.sales_history(group_by, start, end, str(branch_id) if branch_id else None, currency)
+        if group_by in ("branch", "seller"):
+            model, name = (Branch, Branch.name) if group_by == "branch" else (User, func.coalesce(User.full_name, User.username))
+            names = {str(key): label for key, label in db.query(model.id, name).all()}
+            for row in rows:
+                row["label"] = names.get(row["key"])
+        return SalesHistoryReport(currency=currency, group_by=group_by, start=start, end=end, as_of=as_of, rows=rows)
+    # Changes only with the snapshot's watermark, not with writes
+    return _cached_report(
+        ("history", group_by, branch_id, start, end, currency), as_of.isoformat(), build, db, SalesHistoryReport,
+        role=current_user.role,
+    )
+
+# Precomputed by the scheduler (utils/scheduler.py) under the same keys and versions the
+# endpoints above use, so the first admin to open a report gets it without building it.
+
+def _active_branches(db: Session) -> List[Branch]:
+    return db.query(Branch).filter(Branch.deleted_at == None).order_by(Branch.name).all()
+
+def precompute_warehouse(db: Session):
+    refresh_snapshot(db, ("warehouse",), _warehouse_version(db), lambda: _build_warehouse_report(db))
+
+def precompute_debt_aging(db: Session):
+    """All branches (admin view) and each branch (seller view), with the default weeks and window."""
+    today = local_day(datetime.now(timezone.utc))
+    for branch_id in [None] + [branch.id for branch in _active_branches(db)]:
+        refresh_snapshot(
+            db, ("debt-aging", branch_id, AGING_WEEKS, AGING_WINDOW_DAYS),
+            "|".join([_debts_version(db, branch_id), today.isoformat()]),
+            lambda: _build_debt_aging(db, today, AGING_WEEKS, AGING_WINDOW_DAYS, branch_id),
+        )
+
+def period_starts(today: date) -> List[datetime]:
+    """Starts of today, this week (Monday) and this month, as the branch screens request them."""
+    return [day_start(day) for day in (today, today - timedelta(days=today.weekday()), today.replace(day=1))]
+
+def precompute_month_to_date(db: Session):
+    """Branch P&L (USD) for today, week-to-date and month-to-date of every branch."""
+    today = local_day(datetime.now(timezone.utc))
+    # The end the endpoint resolves end=None to within this step
+    end = open_end()
+    for branch in _active_branches(db):
+        version = _pnl_version(db, branch.id, end)
+        for start in period_starts(today):
+            refresh_snapshot(
+                db, ("pnl", branch.id, start, end, "USD"), version,
+                lambda: _build_branch_pnl(db, branch, start, end, "USD"),
+            )
+
+def precompute_end_of_day(db: Session):
+    """Right after midnight every version above changes with the date: rebuild them for the new day."""
+    precompute_month_to_date(db)
+    precompute_debt_aging(db)
+
+def export_analytics_snapshot(db: Session):
+    if snapshot.available():
+        snapshot.export_snapshot(db)
+
+def register_jobs(scheduler):
+    scheduler.add_job("warehouse_valuation", precompute_warehouse, "interval", minutes=15)
+    scheduler.add_job("debt_aging", precompute_debt_aging, "interval", minutes=15)
+    # On the open_end steps, so each run builds the period requests of the coming step ask for
+    scheduler.add_job("month_to_date", precompute_month_to_date, "cron", minute="*/15")
+    scheduler.add_job("end_of_day", precompute_end_of_day, "cron", hour=0, minute=5)
+    scheduler.add_job("analytics_snapshot", export_analytics_snapshot, "interval", hours=1)
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List
+from uuid import UUID
+from ..database import get_db
+from ..models.product import Product, ProductType
+from ..schemas.reservation import ReservationCreate, ReservationResponse, Availability
+from ..utils.dependencies import get_current_user
+from ..utils.reservations import reserve, extend, release, basket_reservations, held_by_product, check_owner
+
+import logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/availability", response_model=List[Availability])
+def read_availability(
+    product_id: List[UUID] = Query(...),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """On-hand stock minus active reservations, for the given products."""
+    products = db.query(Product).filter(Product.id.in_(product_id), Product.deleted_at == None).all()
+    held = held_by_product(db, [p.id for p in products])
+    result = []
+    for product in products:
+        units, metres = held.get(product.id, (0, 0))
+        if product.type == ProductType.METER:
+            on_hand = float(product.remaining_length if product.remaining_length is not None else (product.total_length or 0))
+            reserved = float(metres)
+        else:
+            on_hand, reserved = product.quantity, units
+        result.append(Availability(product_id=product.id, on_hand=on_hand, reserved=reserved, available=max(on_hand - reserved, 0)))
+    return result
+
+@router.get("/{basket_id}", response_model=List[ReservationResponse])
+def read_basket(basket_id: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    check_owner(db, basket_id, current_user)
+    return basket_reservations(db, basket_id)
+
+@router.put("/{basket_id}/{line_id}", response_model=ReservationResponse)
+def reserve_line(
+    basket_id: str,
+    line_id: str,
+    line: ReservationCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Reserve (or change the reservation of) one basket line. 409 if the stock is reserved or sold."""
+    check_owner(db, basket_id, current_user)
+    query = db.query(Product).filter(Product.id == line.product_id, Product.deleted_at == None)
+    if current_user.role == "seller":
+        query = query.filter(Product.branch_id == current_user.branch_id)
+    product = query.first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    reservation = reserve(
+        db, basket_id, line_id, product, current_user,
+        quantity=line.quantity, size=line.size, width=line.width, length=line.length,
+    )
+    db.commit()
+    db.refresh(reservation)
+    return reservation
+
+@router.post("/{basket_id}/refresh", response_model=List[ReservationResponse])
+def refresh_basket(basket_id: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Keep an open basket's reservations from expiring."""
+    check_owner(db, basket_id, current_user)
+    reservations = extend(db, basket_id)
+    db.commit()
+    return reservations
+
+@router.delete("/{basket_id}/{line_id}")
+def release_line(basket_id: str, line_id: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    check_owner(db, basket_id, current_user)
+    released = release(db, basket_id, line_id)
+    db.commit()
+    return {"released": released}
+
+@router.delete("/{basket_id}")
+def release_basket(basket_id: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    check_owner(db, basket_id, current_user)
+    released = release(db, basket_id)
+    db.commit()
+    return {"released": released}
@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..models.settings import Settings
 from ..schemas.settings import SettingsResponse, SettingsUpdate
 from ..utils.dependencies import get_admin_user
+from ..utils.etag import make_etag, not_modified
+from ..utils.change_feed import record_event
+from ..utils.lookup_cache import cache as lookup_cache
 
 router = APIRouter()
 
-@router.get("/", response_model=SettingsResponse)
-def get_settings(db: Session = Depends(get_db)):
+def _load_settings(db: Session) -> SettingsResponse:
     settings = db.query(Settings).first()
     if not settings:
         # Create default settings if not exists
@@ -16,6 +18,14 @@ def get_settings(db: Session = Depends(get_db)):
         db.add(settings)
         db.commit()
         db.refresh(settings)
+    return SettingsResponse.model_validate(settings)
+
+@router.get("/", response_model=SettingsResponse)
+def get_settings(request: Request, response: Response, db: Session = Depends(get_db)):
+    settings = lookup_cache.get(db, "settings", "row", lambda: _load_settings(db))
+    cached = not_modified(request, response, make_etag(request, settings.id, settings.updated_at.isoformat()))
+    if cached:
+        return cached
     return settings
 
 @router.patch("/", response_model=SettingsResponse)
@@ -30,7 +40,9 @@ def update_settings(
         db.add(settings)
     else:
         settings.exchange_rate = settings_update.exchange_rate
-    
+
+    record_event(db, "settings.updated", None, {"exchange_rate": settings_update.exchange_rate})
     db.commit()
+    lookup_cache.invalidate("settings")
     db.refresh(settings)
     return settings
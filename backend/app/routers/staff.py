@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
@@ -6,6 +6,8 @@ from ..database import get_db
 from ..models.staff import Staff
 from ..schemas.staff import StaffCreate, StaffUpdate, StaffResponse
 from ..utils.dependencies import get_current_user, get_admin_user
+from ..utils.etag import make_etag, not_modified
+from ..utils.lookup_cache import cache as lookup_cache
 from ..models.invitation import InvitationLink
 from ..schemas.invitation import InvitationCreate, InvitationResponse
 from datetime import datetime, timedelta, timezone
@@ -23,6 +25,8 @@ def create_staff(
 
 @router.get("/", response_model=List[StaffResponse])
 def get_staff(
+    request: Request,
+    response: Response,
     branch_id: UUID = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
@@ -38,7 +42,15 @@ def get_staff(
     
     if branch_id:
         query = query.filter(User.branch_id == branch_id)
-        
+
+    cached = not_modified(request, response, make_etag(request, lookup_cache.version(db, "staff")))
+    if cached:
+        return cached
+    return lookup_cache.get(db, "staff", branch_id, lambda: _staff_list(query))
+
+def _staff_list(query) -> list[dict]:
+    import logging
+    logger = logging.getLogger(__name__)
     users = query.all()
     logger.info(f"Found {len(users)} active users in DB")
     
@@ -85,6 +97,7 @@ def update_staff(
         db_user.deleted_at = datetime.now()
     
     db.commit()
+    lookup_cache.invalidate("staff")
     db.refresh(db_user)
     
     return {
@@ -114,6 +127,7 @@ def delete_staff(
     # Soft delete
     db_user.deleted_at = datetime.now()
     db.commit()
+    lookup_cache.invalidate("staff")
     
     return {"message": "Staff (User) deactivated"}
 @router.post("/generate-link", response_model=InvitationResponse)
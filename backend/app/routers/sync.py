@@ -0,0 +1,107 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+from ..database import get_db
+from ..models.product import Product
+from ..models.sale import Sale
+from ..models.debt import Debt, Payment
+from ..models.expense import Expense
+from ..models.collection import Collection
+from ..models.settings import Settings
+from ..schemas.sync import SyncResponse, SyncTombstones
+from ..utils.dependencies import get_current_user
+
+import logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# The next watermark is moved back by this much so rows from transactions that
+# were still in flight while we read get sent again on the next pull.
+# Clients upsert by id, so the overlap is harmless.
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+def _split(rows):
+    """Separate live rows from soft-deleted ones (returned as id-only tombstones)."""
+    live, deleted = [], []
+    for row in rows:
+        (deleted if row.deleted_at is not None else live).append(row)
+    return live, [row.id for row in deleted]
+
+@router.get("/", response_model=SyncResponse)
+def sync(
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Rows changed since `since` (the watermark from the previous pull), plus
+    tombstones for rows soft-deleted in that window. Without `since`, every
+    live row is returned and the client should replace its local state.
+    """
+    watermark = datetime.now(timezone.utc) - WATERMARK_OVERLAP
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+
+    if current_user.role == "seller" and current_user.branch_id is None:
+        # A branch of None means every branch (admins)
+        raise HTTPException(status_code=403, detail="Seller is not assigned to a branch")
+    branch_id = current_user.branch_id if current_user.role == "seller" else None
+
+    def changed(model, query=None):
+        query = query if query is not None else db.query(model)
+        if branch_id is not None:
+            if model is Collection:
+                # Collections without a branch are shared by every branch
+                query = query.filter(or_(Collection.branch_id == branch_id, Collection.branch_id == None))
+            else:
+                query = query.filter(model.branch_id == branch_id)
+        if since is None:
+            return query.filter(model.deleted_at == None)
+        return query.filter(model.updated_at > since)
+
+    products, deleted_products = _split(changed(Product, db.query(Product).options(selectinload(Product.stock_items))).all())
+    sales, deleted_sales = _split(changed(Sale, db.query(Sale).options(joinedload(Sale.product))).all())
+    expenses, deleted_expenses = _split(changed(Expense).all())
+    collections, deleted_collections = _split(changed(Collection).all())
+
+    debts_query = db.query(Debt).options(selectinload(Debt.payments))
+    if branch_id is not None:
+        debts_query = debts_query.filter(Debt.branch_id == branch_id)
+    if since is None:
+        debts_query = debts_query.filter(Debt.deleted_at == None)
+    else:
+        # A payment also changes the debt it belongs to, so resend the whole debt
+        paid_debts = select(Payment.debt_id).where(Payment.updated_at > since)
+        debts_query = debts_query.filter(or_(Debt.updated_at > since, Debt.id.in_(paid_debts)))
+    debts, deleted_debts = _split(debts_query.all())
+
+    settings_query = db.query(Settings)
+    if since is not None:
+        settings_query = settings_query.filter(Settings.updated_at > since)
+    settings = settings_query.first()
+
+    logger.debug(
+        f"Sync for {current_user.username} since {since}: {len(products)} products, {len(sales)} sales, "
+        f"{len(debts)} debts, {len(expenses)} expenses, {len(collections)} collections"
+    )
+
+    return SyncResponse(
+        watermark=watermark,
+        full=since is None,
+        products=products,
+        sales=sales,
+        debts=debts,
+        expenses=expenses,
+        collections=collections,
+        settings=settings,
+        deleted=SyncTombstones(
+            products=deleted_products,
+            sales=deleted_sales,
+            debts=deleted_debts,
+            expenses=deleted_expenses,
+            collections=deleted_collections,
+        ),
+    )
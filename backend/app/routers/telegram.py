@@ -16,6 +16,7 @@ from ..models.invitation import InvitationLink
 from ..schemas.token import Token
 from ..schemas.user import UserResponse
 from ..utils.security import create_access_token
+from ..utils.lookup_cache import cache as lookup_cache
 from ..config import get_settings
 from passlib.context import CryptContext
 import secrets
@@ -197,6 +198,7 @@ async def register_by_invitation(init_data: str, token: str, db: Session = Depen
     invitation.is_used = True
     
     db.commit()
+    lookup_cache.invalidate("staff")
     db.refresh(new_user)
 
     access_token = create_access_token(data={"sub": new_user.username})
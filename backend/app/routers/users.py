@@ -6,6 +6,7 @@ from ..models.user import User, UserRole
 from ..schemas.user import UserCreate, UserResponse, UserUpdate
 from ..utils.security import get_password_hash
 from ..utils.dependencies import get_current_user, get_admin_user
+from ..utils.lookup_cache import cache as lookup_cache
 
 router = APIRouter()
 
@@ -29,5 +30,6 @@ def create_user(user: UserCreate, db: Session = Depends(get_db), current_user =
     )
     db.add(new_user)
     db.commit()
+    lookup_cache.invalidate("staff")
     db.refresh(new_user)
     return new_user
@@ -0,0 +1,32 @@
+from pydantic import BaseModel, UUID4, Field
+from typing import Optional, List
+from ..models.sale import PaymentType
+from .sale import SaleResponse
+from .debt import DebtCreate, DebtResponse
+
+class OrderItem(BaseModel):
+    product_id: UUID4
+    quantity: float = Field(..., gt=0) # carpets, or metres for metraj when length is not given
+    size: Optional[str] = None
+    width: Optional[float] = None
+    length: Optional[float] = None
+    area: Optional[float] = None
+
+class OrderPayment(BaseModel):
+    payment_type: PaymentType
+    amount: float = Field(..., gt=0) # USD
+
+class OrderCreate(BaseModel):
+    order_id: Optional[str] = None
+    basket_id: Optional[str] = None # reservations held for this basket are converted into the sales
+    items: List[OrderItem] = Field(..., min_length=1)
+    # The agreed total is the sum of the payments (USD); the part above list
+    # price is spread over the items in proportion to their list value.
+    payments: List[OrderPayment] = Field(..., min_length=1)
+    is_nasiya: bool = False
+    debt: Optional[DebtCreate] = None # recorded with the order, linked by order_id
+
+class OrderResponse(BaseModel):
+    order_id: str
+    sales: List[SaleResponse] = []
+    debt: Optional[DebtResponse] = None
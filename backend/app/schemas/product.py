@@ -57,6 +57,24 @@ class ProductResponse(ProductBase):
     class Config:
         from_attributes = True
 
+class RollCut(BaseModel):
+    product_id: UUID4
+    width: float
+    length: float = Field(..., gt=0)
+
+class RollPlanRequest(BaseModel):
+    cuts: List[RollCut]
+
+class RollPlanItem(BaseModel):
+    product_id: UUID4
+    width: float
+    length: float
+    roll_id: Optional[UUID4] = None # None: no single roll is long enough
+    roll_size: Optional[str] = None # roll before the cut, e.g. "4x25"
+    length_before: Optional[float] = None
+    length_after: Optional[float] = None
+    waste: float = 0 # unsellable offcut left behind
+
 class ProductSearchResult(ProductResponse):
     """
     Расширенная схема для результатов поиска по изображению.
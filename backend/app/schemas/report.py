@@ -0,0 +1,212 @@
+from pydantic import BaseModel, UUID4
+from typing import Optional, List
+from datetime import date, datetime
+
+class StockValuation(BaseModel):
+    product_count: int = 0
+    quantity: int = 0 # carpets (unit products)
+    metres: float = 0 # remaining metraj length
+    cost_value: float = 0 # USD at buy price
+    sell_value: float = 0 # USD at list sell price
+    potential_profit: float = 0 # sell_value - cost_value
+
+class CollectionValuation(StockValuation):
+    collection: Optional[str] = None # None = products without a collection
+
+class BranchValuation(StockValuation):
+    branch_id: UUID4
+    branch_name: str
+    collections: List[CollectionValuation] = []
+
+class WarehouseReport(BaseModel):
+    currency: str = "USD"
+    exchange_rate: float # UZS per USD used to normalize UZS-priced products
+    totals: StockValuation
+    branches: List[BranchValuation] = []
+
+class BranchRecognizedProfit(BaseModel):
+    branch_id: UUID4
+    branch_name: str
+    recognized_profit: float = 0 # USD
+    order_count: int = 0 # orders that recognized profit in the period
+
+class RecognizedProfitReport(BaseModel):
+    currency: str = "USD"
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    recognized_profit: float = 0
+    order_count: int = 0
+    branches: List[BranchRecognizedProfit] = []
+
+class DailyRollupRow(BaseModel):
+    day: date # local day (Settings.TIMEZONE)
+    branch_id: UUID4
+    seller_id: UUID4
+    kind: str # "sale", "expense" or "debt_payment"
+    payment_type: str # sales: cash/card/transfer/debt; "" otherwise
+    currency: str
+    count: int
+    quantity: float
+    metres: float
+    amount: float
+    profit: float
+    admin_profit: float
+    seller_profit: float
+
+    class Config:
+        from_attributes = True
+
+class CashClosureReport(BaseModel):
+    id: Optional[UUID4] = None # set once the shift is closed
+    branch_id: UUID4
+    start: datetime
+    end: datetime
+    closed: bool = False
+    currency: str = "USD"
+    opening_balance: float = 0
+    cash_sales: float = 0
+    card_sales: float = 0
+    transfer_sales: float = 0
+    debt_payments: float = 0 # taken in cash
+    cash_expenses: float = 0
+    sale_count: int = 0
+    expected_cash: float = 0 # opening + cash sales + debt payments - expenses
+    counted_cash: Optional[float] = None
+    difference: Optional[float] = None # counted - expected
+    carried_over: Optional[float] = None
+    closed_by: Optional[UUID4] = None
+    note: Optional[str] = None
+
+class CashClosureCreate(BaseModel):
+    branch_id: UUID4
+    counted_cash: float
+    carried_over: float = 0 # left in the drawer as the next shift's opening balance
+    note: Optional[str] = None
+
+class StaffPayout(BaseModel):
+    user_id: UUID4
+    name: str
+    sales_count: int = 0
+    seller_profit: float = 0 # earned on this person's own sales
+    admin_profit: float = 0
+    share: float = 0 # equal part of the distributable profit
+    advances: float = 0 # staff expenses paid to this person
+    net_payout: float = 0 # share - advances
+
+class StaffProfitReport(BaseModel):
+    currency: str = "USD"
+    branch_id: UUID4
+    start: datetime
+    end: Optional[datetime] = None
+    seller_profit: float = 0
+    admin_profit: float = 0
+    branch_expenses: float = 0
+    staff_expenses: float = 0
+    distributable: float = 0 # seller profit - branch expenses
+    share_per_person: float = 0
+    staff: List[StaffPayout] = []
+
+class PnlFigures(BaseModel):
+    sale_count: int = 0
+    revenue: float = 0
+    cost_of_goods: float = 0 # buy cost recorded with each sale
+    gross_profit: float = 0 # revenue - cost_of_goods
+    admin_profit: float = 0
+    seller_profit: float = 0
+    nasiya_sales: float = 0 # part of revenue sold on credit
+    branch_expenses: float = 0
+    staff_expenses: float = 0
+    expenses: float = 0
+    net_profit: float = 0 # gross_profit - expenses
+    debt_issued: float = 0 # new debt (total - down payment)
+    debt_collected: float = 0 # later payments on debts
+
+class DebtExposure(BaseModel):
+    open_count: int = 0
+    outstanding: float = 0
+    overdue_count: int = 0
+    overdue: float = 0 # past payment_deadline
+
+class BranchPnlReport(BaseModel):
+    currency: str = "USD"
+    branch_id: UUID4
+    branch_name: str
+    start: datetime
+    end: datetime
+    previous_start: datetime # same length, right before start
+    previous_end: datetime
+    current: PnlFigures
+    previous: PnlFigures
+    debt: DebtExposure # open debts as of now
+
+class AgingBuckets(BaseModel):
+    current: float = 0 # not yet due
+    days_1_30: float = 0
+    days_31_60: float = 0
+    days_60_plus: float = 0
+
+class DebtAgingTotals(BaseModel):
+    open_count: int = 0
+    overdue_count: int = 0
+    remaining: float = 0
+    buckets: AgingBuckets = AgingBuckets()
+    payment_count: int = 0
+    collected: float = 0 # paid over the last window_days
+    weekly_collection: float = 0 # collected per week over the window
+    expected: List[float] = [] # remaining falling due in each week of week_starts
+
+class DebtAgingRow(DebtAgingTotals):
+    branch_id: UUID4
+    seller_id: UUID4
+    seller_name: Optional[str] = None
+
+class DebtAgingReport(BaseModel):
+    currency: str = "UZS"
+    as_of: date
+    window_days: int
+    week_starts: List[date] = []
+    totals: DebtAgingTotals
+    rows: List[DebtAgingRow] = [] # per branch and seller, largest balance first
+
+class VelocityRow(BaseModel):
+    key: str # product id, collection, size or branch id, per group_by
+    product_id: Optional[UUID4] = None
+    branch_id: Optional[UUID4] = None
+    code: Optional[str] = None
+    collection: Optional[str] = None
+    size: Optional[str] = None # "WxL" for carpets, "W m" for metraj rolls
+    product_count: int = 0
+    units_7: float = 0 # carpets sold in the last 7 days
+    units_30: float = 0
+    units_90: float = 0
+    metres_7: float = 0 # metraj sold in the last 7 days
+    metres_30: float = 0
+    metres_90: float = 0
+    stock_units: float = 0
+    stock_metres: float = 0
+    cover_days_units: Optional[float] = None # stock / daily sales of the last 30 days; None = not selling
+    cover_days_metres: Optional[float] = None
+    dead_stock: int = 0 # products with stock and no sales in 90 days
+
+class SalesVelocityReport(BaseModel):
+    as_of: date
+    group_by: str
+    windows: List[int] = []
+    rows: List[VelocityRow] = []
+
+class SalesHistoryRow(BaseModel):
+    key: str # "YYYY-MM", branch id, seller id or collection ("" = none), per group_by
+    label: Optional[str] = None # branch / seller name
+    sale_count: int = 0
+    units: float = 0 # carpets sold
+    metres: float = 0 # metraj sold
+    revenue: float = 0
+    profit: float = 0
+
+class SalesHistoryReport(BaseModel):
+    currency: str = "USD"
+    group_by: str
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    as_of: datetime # snapshot watermark: sales changed after it are not included yet
+    rows: List[SalesHistoryRow] = []
@@ -0,0 +1,30 @@
+from pydantic import BaseModel, UUID4, Field
+from typing import Optional
+from datetime import datetime
+
+class ReservationCreate(BaseModel):
+    product_id: UUID4
+    quantity: float = Field(..., gt=0) # carpets, or metres for metraj when length is not given
+    size: Optional[str] = None
+    width: Optional[float] = None
+    length: Optional[float] = None
+
+class ReservationResponse(BaseModel):
+    id: UUID4
+    basket_id: str
+    line_id: str
+    product_id: UUID4
+    quantity: Optional[int] = None
+    size: Optional[str] = None
+    width: Optional[float] = None
+    length: Optional[float] = None
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class Availability(BaseModel):
+    product_id: UUID4
+    on_hand: float # carpets, or metres for metraj
+    reserved: float # held by active reservations
+    available: float
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, UUID4
+from typing import Optional, List
+from datetime import datetime
+from .product import ProductResponse
+from .sale import SaleResponse
+from .debt import DebtResponse
+from .expense import ExpenseResponse
+from .collection import CollectionResponse
+from .settings import SettingsResponse
+
+class SyncTombstones(BaseModel):
+    products: List[UUID4] = []
+    sales: List[UUID4] = []
+    debts: List[UUID4] = []
+    expenses: List[UUID4] = []
+    collections: List[UUID4] = []
+
+class SyncResponse(BaseModel):
+    watermark: datetime
+    full: bool = False # True when no watermark was sent and every live row is returned
+    products: List[ProductResponse] = []
+    sales: List[SaleResponse] = []
+    debts: List[DebtResponse] = []
+    expenses: List[ExpenseResponse] = []
+    collections: List[CollectionResponse] = []
+    settings: Optional[SettingsResponse] = None
+    deleted: SyncTombstones = SyncTombstones()
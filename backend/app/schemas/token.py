@@ -4,5 +4,9 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class UrlToken(BaseModel):
+    token: str
+    expires_in: int # seconds
+
 class TokenData(BaseModel):
     username: str | None = None
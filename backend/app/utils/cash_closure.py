@@ -0,0 +1,95 @@
+"""
+Kassa (cash drawer) totals of a branch over a shift.
+
+A shift runs from the previous closure of the branch (or the start of the
+local day if it was never closed) to now. Its expected drawer amount is:
+
+    opening balance + cash sales + debt payments - expenses
+
+Card and transfer sales are reported but don't go into the drawer. Debt
+payments and expenses are taken in cash, as on the dashboards. All amounts
+are USD; debt payments, stored in UZS, are converted at each payment's own
+exchange rate.
+
+Each figure is one aggregate over a range scan: sales on
+(branch_id, date), expenses on (branch_id, created_at) and payments on
+payment_date.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models.cash_closure import CashClosure
+from ..models.sale import Sale, PaymentType
+from ..models.debt import Debt, Payment
+from ..models.expense import Expense
+from .rollups import day_start, local_day
+
+
+def _aware(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def last_closure(db: Session, branch_id) -> Optional[CashClosure]:
+    return (
+        db.query(CashClosure)
+        .filter(CashClosure.branch_id == branch_id)
+        .order_by(CashClosure.closed_at.desc())
+        .first()
+    )
+
+
+def open_shift(db: Session, branch_id) -> tuple[datetime, Decimal]:
+    """(start, opening balance) of the branch's current shift."""
+    closure = last_closure(db, branch_id)
+    if closure is not None:
+        return _aware(closure.closed_at), Decimal(str(closure.carried_over))
+    return day_start(local_day(datetime.now(timezone.utc))), Decimal("0")
+
+
+def shift_totals(db: Session, branch_id, start: datetime, end: datetime, opening_balance=Decimal("0")) -> dict:
+    """Drawer totals of a branch for [start, end)."""
+    by_type = dict(
+        (getattr(payment_type, "value", payment_type), (Decimal(str(amount or 0)), count))
+        for payment_type, amount, count in (
+            db.query(Sale.payment_type, func.sum(Sale.amount), func.count(Sale.id))
+            .filter(Sale.branch_id == branch_id, Sale.date >= start, Sale.date < end, Sale.deleted_at == None)
+            .group_by(Sale.payment_type)
+            .all()
+        )
+    )
+    expenses = Decimal(str(
+        db.query(func.coalesce(func.sum(Expense.amount), 0))
+        .filter(Expense.branch_id == branch_id, Expense.created_at >= start, Expense.created_at < end, Expense.deleted_at == None)
+        .scalar()
+    ))
+    # payment_date is stored as naive UTC
+    payments = Decimal(str(
+        db.query(func.coalesce(func.sum(Payment.amount / Payment.exchange_rate), 0))
+        .join(Debt, Payment.debt_id == Debt.id)
+        .filter(
+            Debt.branch_id == branch_id,
+            Payment.payment_date >= start.astimezone(timezone.utc).replace(tzinfo=None),
+            Payment.payment_date < end.astimezone(timezone.utc).replace(tzinfo=None),
+            Payment.deleted_at == None,
+        )
+        .scalar()
+    ))
+
+    def amount(payment_type):
+        return by_type.get(payment_type.value, (Decimal("0"), 0))[0]
+
+    cash_sales = amount(PaymentType.CASH)
+    return {
+        "opening_balance": opening_balance,
+        "cash_sales": cash_sales,
+        "card_sales": amount(PaymentType.CARD),
+        "transfer_sales": amount(PaymentType.TRANSFER),
+        "debt_payments": payments,
+        "cash_expenses": expenses,
+        "sale_count": sum(count for _, count in by_type.values()),
+        "expected_cash": opening_balance + cash_sales + payments - expenses,
+    }
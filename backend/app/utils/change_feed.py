@@ -0,0 +1,199 @@
+"""
+Live change feed: a transactional outbox (change_events) relayed to SSE clients.
+
+Write endpoints call record_event() before their commit. A single relay task
+per worker polls the outbox and fans events out to that worker's subscribers,
+so every worker sees every committed change without a separate broker.
+
+Event ids are assigned at insert, so an event of a long transaction can
+commit after later ids have been relayed. The relay remembers the ids it
+skipped over and looks for them again on every poll for GAP_GRACE, then
+gives up on them (a rolled-back transaction leaves its ids unused for good).
+Such late events are sent without an SSE id, so they don't move the
+client's resume position back. Clients reconcile through /api/sync after a
+reset.
+"""
+import time
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..database import SessionLocal
+from ..models.change_event import ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1.0         # seconds between outbox polls
+HEARTBEAT_INTERVAL = 15.0   # keeps proxies (nginx read timeout is 60s) from closing idle streams
+QUEUE_SIZE = 256            # per-connection buffer; a slower client is told to reset
+REPLAY_LIMIT = 500          # max events replayed on resume before falling back to reset
+RETENTION = timedelta(days=1)
+GAP_GRACE = 60.0            # seconds a skipped id is looked for again (longer than any write transaction)
+MAX_GAPS = 1000             # skipped ids remembered at most; the oldest are given up first
+
+# Sentinel put on a subscriber's queue when it fell too far behind
+RESET = object()
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def record_event(db: Session, event_type: str, branch_id, payload: dict):
+    """Stage an event in the caller's transaction; it is published only if that commits."""
+    payload = json.loads(json.dumps(payload, default=_json_default))
+    db.add(ChangeEvent(event_type=event_type, branch_id=branch_id, payload=payload))
+
+
+def _visible(query, branch_id):
+    if branch_id is None:
+        return query
+    return query.filter(or_(ChangeEvent.branch_id == branch_id, ChangeEvent.branch_id == None))
+
+
+def load_events_after(last_id: int, branch_id=None, limit: Optional[int] = None, also_ids=()) -> list[dict]:
+    """Events after `last_id` (and any of `also_ids`), oldest first."""
+    db = SessionLocal()
+    try:
+        after = ChangeEvent.id > last_id
+        if also_ids:
+            after = or_(after, ChangeEvent.id.in_(list(also_ids)))
+        query = _visible(db.query(ChangeEvent).filter(after), branch_id).order_by(ChangeEvent.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return [
+            {"id": e.id, "branch_id": e.branch_id, "type": e.event_type, "payload": e.payload}
+            for e in query.all()
+        ]
+    finally:
+        db.close()
+
+
+def _latest_event_id() -> int:
+    db = SessionLocal()
+    try:
+        latest = db.query(ChangeEvent.id).order_by(ChangeEvent.id.desc()).first()
+        return latest[0] if latest else 0
+    finally:
+        db.close()
+
+
+def _prune_events():
+    db = SessionLocal()
+    try:
+        cutoff = datetime.now(timezone.utc) - RETENTION
+        db.query(ChangeEvent).filter(ChangeEvent.created_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+class Subscription:
+    def __init__(self, branch_id):
+        self.branch_id = branch_id # None = admin, sees every branch
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = False
+
+    def offer(self, event: dict):
+        if self.dropped:
+            return
+        if self.branch_id is not None and event["branch_id"] not in (None, self.branch_id):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Don't let one slow phone grow memory; make it resync instead
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+
+class ChangeFeed:
+    def __init__(self):
+        self._subscribers: set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last_id = 0
+        # Ids skipped over (not committed yet, or rolled back) -> when they were first missed
+        self._gaps: dict[int, float] = {}
+
+    def subscribe(self, branch_id) -> Subscription:
+        subscription = Subscription(branch_id)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    async def start(self):
+        self._last_id = await run_in_threadpool(_latest_event_id)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Change feed relay started at event {self._last_id}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        polls = 0
+        while True:
+            try:
+                if self._subscribers:
+                    events = await run_in_threadpool(load_events_after, self._last_id, None, None, tuple(self._gaps))
+                    self._relay(events)
+                else:
+                    # Nobody listening: skip ahead so a new subscriber only gets live events
+                    self._last_id = await run_in_threadpool(_latest_event_id)
+                    self._gaps.clear()
+                polls += 1
+                if polls % 3600 == 0:
+                    await run_in_threadpool(_prune_events)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Change feed relay error: {e}")
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _relay(self, events: list[dict]):
+        now = time.monotonic()
+        for event in events:
+            if event["id"] > self._last_id:
+                for missing in range(self._last_id + 1, event["id"]):
+                    self._gaps[missing] = now
+                self._last_id = event["id"]
+            else:
+                # Committed late: deliver it now, once
+                self._gaps.pop(event["id"], None)
+                event = {**event, "late": True}
+            for subscription in list(self._subscribers):
+                subscription.offer(event)
+        for gap in [gap for gap, missed_at in self._gaps.items() if now - missed_at > GAP_GRACE]:
+            del self._gaps[gap]
+        for gap in sorted(self._gaps)[:max(len(self._gaps) - MAX_GAPS, 0)]:
+            del self._gaps[gap]
+
+
+feed = ChangeFeed()
+
+
+def format_sse(event: dict) -> str:
+    if event.get("late"):
+        # Without an id line, so the client's Last-Event-ID stays at the newest event
+        return f"event: {event['type']}\ndata: {json.dumps(event['payload'], default=str)}\n\n"
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['payload'], default=str)}\n\n"
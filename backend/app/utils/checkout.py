@@ -0,0 +1,188 @@
+"""
+Stock deduction and profit calculation shared by POST /api/sales (one line)
+and POST /api/orders (a whole basket in one transaction).
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models.product import Product, ProductType
+from ..models.debt import Debt
+from .stock import take_size
+from .contention import attempts
+from .reservations import held_quantity, held_length
+from . import lookup_cache
+
+import logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXCHANGE_RATE = Decimal("12200.0")
+
+
+def get_exchange_rate(db: Session) -> Decimal:
+    rate = lookup_cache.exchange_rate(db)
+    return rate if rate is not None else DEFAULT_EXCHANGE_RATE
+
+
+def _mark_sold_out(product: Product, user):
+    product.deleted_at = datetime.now(timezone.utc)
+    product.deleted_by = user.id
+    logger.debug(f"Product {product.id} marked as deleted")
+
+
+def deduct_units(db: Session, product: Product, quantity, size, user, basket_id=None, covered=False):
+    """
+    Take `quantity` carpets (of `size`, if given) from a unit product. The
+    size row and the product total are each decremented with a conditional
+    UPDATE on stock and version, retried if another sale got in between.
+
+    Stock reserved by other baskets is not sold, unless the line is `covered`
+    by the seller's own reservations (basket_id).
+    """
+    def held(size=None):
+        return 0 if covered else held_quantity(db, product.id, size, exclude_basket=basket_id)
+
+    if size:
+        item = take_size(db, product, size, quantity, held=lambda: held(size))
+        if item is not None:
+            logger.debug(f"Size {size} updated: {item.quantity + int(quantity)} -> {item.quantity}")
+
+    quantity = int(quantity)
+    for _ in attempts("product"):
+        available = product.quantity - held()
+        logger.debug(f"Current quantity: {product.quantity}, available: {available}, Sale quantity: {quantity}")
+        if available < quantity:
+            raise HTTPException(status_code=400, detail=f"Insufficient stock (requested {quantity}, available {max(available, 0)})")
+        updated = (
+            db.query(Product)
+            .filter(Product.id == product.id, Product.version == product.version, Product.quantity >= quantity)
+            .update({Product.quantity: Product.quantity - quantity, Product.version: Product.version + 1}, synchronize_session="fetch")
+        )
+        if updated:
+            break
+        db.refresh(product)
+    logger.debug(f"New quantity: {product.quantity}")
+
+    if product.quantity <= 0:
+        _mark_sold_out(product, user)
+
+
+def deduct_metres(db: Session, product: Product, length, user, basket_id=None, covered=False):
+    """
+    Take `length` metres from a metraj product's remaining length (rolls are
+    cut separately). Reservations are respected as in deduct_units().
+    """
+    length = Decimal(str(length))
+    available_expr = func.coalesce(Product.remaining_length, Product.total_length, 0)
+    for _ in attempts("product"):
+        available = Decimal(str(product.remaining_length if product.remaining_length is not None else (product.total_length or 0)))
+        if not covered:
+            available -= held_length(db, product.id, exclude_basket=basket_id)
+        logger.debug(f"Current remaining_length: {available}, Sale length: {length}")
+        if available < length:
+            raise HTTPException(status_code=400, detail=f"Insufficient stock (requested {float(length)}m, available {float(max(available, 0))}m)")
+        updated = (
+            db.query(Product)
+            .filter(Product.id == product.id, Product.version == product.version, available_expr >= length)
+            .update({Product.remaining_length: available_expr - length, Product.version: Product.version + 1}, synchronize_session="fetch")
+        )
+        if updated:
+            break
+        db.refresh(product)
+    logger.debug(f"New remaining_length: {product.remaining_length}")
+
+    if product.remaining_length <= 0.05:
+        _mark_sold_out(product, user)
+
+
+def standard_values(product: Product, exchange_rate: Decimal, quantity, length=None) -> tuple[Decimal, Decimal]:
+    """
+    (standard sell value, buy cost) of a sale line in USD, at the product's
+    list prices. All values are normalized to USD for storage.
+    """
+    # Normalize buy price to USD
+    raw_buy_price = Decimal(str(product.buy_price))
+    buy_price_usd = raw_buy_price if product.is_usd_priced else raw_buy_price / exchange_rate
+
+    qty = Decimal(str(quantity))
+    if product.type == ProductType.METER:
+        # sell_price_per_meter is stored in USD per LINEAR meter (= pricePerSqm × roll_width),
+        # and buy_price is USD per linear meter too, so the metric is the cut length.
+        metric = Decimal(str(length)) if length else qty
+        base_sell_price_usd = Decimal(str(product.sell_price_per_meter or product.sell_price or 0))
+    else:
+        # Unit products: sell_price is the price PER UNIT (not per m²), in USD or UZS
+        # depending on is_usd_priced.
+        metric = qty
+        raw_sell_price = Decimal(str(product.sell_price))
+        base_sell_price_usd = raw_sell_price if product.is_usd_priced else raw_sell_price / exchange_rate
+
+    return base_sell_price_usd * metric, buy_price_usd * metric
+
+
+def profit_breakdown(standard_sell_usd: Decimal, buy_cost_usd: Decimal, amount_usd: Decimal) -> dict:
+    """
+    Split the profit on a sale of `amount_usd` (USD, as sent by the frontend):
+    the list-price margin goes to the admin, anything above list price to the seller.
+    """
+    return {
+        "amount": float(amount_usd),
+        "profit": amount_usd - buy_cost_usd,
+        "admin_profit": standard_sell_usd - buy_cost_usd,
+        "seller_profit": amount_usd - standard_sell_usd,
+    }
+
+
+def sale_event_payload(sale, product: Product) -> dict:
+    return {
+        "id": sale.id,
+        "product_id": sale.product_id,
+        "branch_id": sale.branch_id,
+        "seller_id": sale.seller_id,
+        "quantity": sale.quantity,
+        "amount": sale.amount,
+        "payment_type": sale.payment_type,
+        "order_id": sale.order_id,
+        "date": sale.date,
+        "profit": sale.profit,
+        "admin_profit": sale.admin_profit,
+        "seller_profit": sale.seller_profit,
+        "width": sale.width,
+        "length": sale.length,
+        "area": sale.area,
+        "is_nasiya": sale.is_nasiya,
+        "product": {"code": product.code, "type": product.type},
+    }
+
+
+def stock_event_payload(product: Product) -> dict:
+    return {
+        "id": product.id,
+        "quantity": product.quantity,
+        "remaining_length": product.remaining_length,
+        "available_sizes": product.available_sizes,
+        "deleted": product.deleted_at is not None,
+    }
+
+
+def build_debt(debt, user, order_id=None) -> Debt:
+    """A new Debt row from a DebtCreate payload."""
+    remaining = Decimal(str(debt.total_amount)) - Decimal(str(debt.paid_amount))
+    return Debt(
+        debtor_name=debt.debtor_name,
+        phone_number=debt.phone_number,
+        order_details=debt.order_details,
+        branch_id=debt.branch_id or user.branch_id, # Use provided branch_id or user's branch
+        seller_id=user.id,
+        total_amount=debt.total_amount,
+        paid_amount=debt.paid_amount,
+        initial_payment=debt.paid_amount,
+        remaining_amount=remaining,
+        payment_deadline=debt.payment_deadline,
+        status="pending" if remaining > 0 else "paid",
+        order_id=order_id or debt.order_id,
+        exchange_rate=debt.exchange_rate or 12200.0
+    )
@@ -0,0 +1,62 @@
+"""
+Bounded retries for optimistic stock updates, and counters for monitoring.
+
+Stock rows carry a version column. A writer reads the row, then updates it
+with `WHERE version = :v` (plus the stock condition). If another sale
+changed the row in between, no row matches. The writer then re-reads and
+tries again, a few times, with a short jittered pause between tries.
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+
+from fastapi import HTTPException
+
+MAX_ATTEMPTS = 5
+BACKOFF = 0.005 # seconds; the pause before retry n is up to n * BACKOFF
+
+
+class ContentionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {"attempts": 0, "conflicts": 0, "exhausted": 0})
+
+    def add(self, resource: str, counter: str):
+        with self._lock:
+            self._counts[resource][counter] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for resource, counts in self._counts.items():
+                result[resource] = {
+                    **counts,
+                    "conflict_ratio": round(counts["conflicts"] / counts["attempts"], 4) if counts["attempts"] else None,
+                }
+            return result
+
+
+stats = ContentionStats()
+
+
+def attempts(resource: str, max_attempts: int = MAX_ATTEMPTS):
+    """
+    Retry loop for one optimistic update:
+
+        for _ in attempts("size"):
+            row = read()
+            if conditional_update(row):
+                break
+
+    Each pass the loop body doesn't leave counts as a conflict. When all
+    attempts conflict, a 409 is raised.
+    """
+    for attempt in range(max_attempts):
+        if attempt:
+            time.sleep(random.uniform(0, BACKOFF * attempt))
+        stats.add(resource, "attempts")
+        yield attempt
+        stats.add(resource, "conflicts")
+    stats.add(resource, "exhausted")
+    raise HTTPException(status_code=409, detail="Stock is being changed by other sales, please retry")
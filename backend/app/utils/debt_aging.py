@@ -0,0 +1,130 @@
+"""
+Aging of open debts and their expected collections.
+
+Remaining balances are bucketed by days past payment_deadline (not yet due,
+1-30, 31-60, more than 60) and the ones falling due in each of the coming
+weeks are summed as the expected inflow of that week. Both come from one
+aggregate over the open debts, grouped by branch and seller, on
+(branch_id, status, payment_deadline); every bucket and week is a
+CASE on the deadline, compared with dates worked out here.
+
+Payment velocity is what was collected on those debts over the last
+window_days, from one more aggregate on payments(payment_date).
+
+Debts and payments are stored in UZS; figures are UZS.
+"""
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session
+
+from ..models.debt import Debt, DebtStatus, Payment
+from ..models.user import User
+
+OPEN = (DebtStatus.PENDING, DebtStatus.OVERDUE)
+BUCKETS = ("current", "days_1_30", "days_31_60", "days_60_plus")
+
+
+def bucket_bounds(today: date) -> dict:
+    """{bucket: (first deadline, last deadline)}; None is an open end."""
+    return {
+        "current": (today, None),
+        "days_1_30": (today - timedelta(days=30), today - timedelta(days=1)),
+        "days_31_60": (today - timedelta(days=60), today - timedelta(days=31)),
+        "days_60_plus": (None, today - timedelta(days=61)),
+    }
+
+
+def _deadline_between(first, last) -> list:
+    conditions = []
+    if first is not None:
+        conditions.append(Debt.payment_deadline >= first)
+    if last is not None:
+        conditions.append(Debt.payment_deadline <= last)
+    return conditions
+
+
+def in_bucket(bucket: str, today: date):
+    """Filter for open debts whose deadline falls in `bucket`."""
+    return and_(Debt.status.in_(OPEN), Debt.deleted_at == None, *_deadline_between(*bucket_bounds(today)[bucket]))
+
+
+def week_starts(today: date, weeks: int) -> list[date]:
+    return [today + timedelta(days=7 * week) for week in range(weeks)]
+
+
+def debt_aging(db: Session, today: date, weeks: int = 8, window_days: int = 28, branch_id=None) -> list[dict]:
+    """
+    One dict per (branch, seller) with open debts or recent payments:
+    open and overdue counts, remaining balance, remaining per bucket,
+    collected over the last window_days and its weekly rate, and the
+    balance falling due in each of the next `weeks` weeks (starting today).
+    """
+    def remaining_where(*conditions):
+        return func.coalesce(func.sum(case((and_(*conditions), Debt.remaining_amount), else_=0)), 0)
+
+    bounds = bucket_bounds(today)
+    columns = [
+        Debt.branch_id,
+        Debt.seller_id,
+        func.count(Debt.id).label("open_count"),
+        func.coalesce(func.sum(case((Debt.payment_deadline < today, 1), else_=0)), 0).label("overdue_count"),
+        func.coalesce(func.sum(Debt.remaining_amount), 0).label("remaining"),
+    ]
+    for bucket in BUCKETS:
+        columns.append(remaining_where(*_deadline_between(*bounds[bucket])).label(bucket))
+    starts = week_starts(today, weeks)
+    for index, start in enumerate(starts):
+        columns.append(remaining_where(
+            Debt.payment_deadline >= start, Debt.payment_deadline < start + timedelta(days=7),
+        ).label(f"week_{index}"))
+
+    query = db.query(*columns).filter(Debt.status.in_(OPEN), Debt.deleted_at == None)
+    if branch_id is not None:
+        query = query.filter(Debt.branch_id == branch_id)
+
+    rows = {}
+    for row in query.group_by(Debt.branch_id, Debt.seller_id).all():
+        rows[(row.branch_id, row.seller_id)] = {
+            "branch_id": row.branch_id,
+            "seller_id": row.seller_id,
+            "open_count": row.open_count,
+            "overdue_count": int(row.overdue_count),
+            "remaining": float(row.remaining),
+            "buckets": {bucket: float(getattr(row, bucket)) for bucket in BUCKETS},
+            "expected": [float(getattr(row, f"week_{index}")) for index in range(weeks)],
+        }
+
+    # payment_date is stored as naive UTC
+    since = datetime.combine(today - timedelta(days=window_days), time.min)
+    payments = (
+        db.query(Debt.branch_id, Debt.seller_id, func.count(Payment.id), func.sum(Payment.amount))
+        .join(Debt, Payment.debt_id == Debt.id)
+        .filter(Payment.payment_date >= since, Payment.deleted_at == None, Debt.deleted_at == None)
+    )
+    if branch_id is not None:
+        payments = payments.filter(Debt.branch_id == branch_id)
+    for branch, seller, count, amount in payments.group_by(Debt.branch_id, Debt.seller_id).all():
+        row = rows.setdefault((branch, seller), {
+            "branch_id": branch,
+            "seller_id": seller,
+            "open_count": 0,
+            "overdue_count": 0,
+            "remaining": 0.0,
+            "buckets": {bucket: 0.0 for bucket in BUCKETS},
+            "expected": [0.0] * weeks,
+        })
+        row["payment_count"] = count
+        row["collected"] = float(amount or 0)
+
+    names = dict(
+        db.query(User.id, func.coalesce(User.full_name, User.username))
+        .filter(User.id.in_([seller for _, seller in rows]))
+        .all()
+    ) if rows else {}
+    for row in rows.values():
+        row.setdefault("payment_count", 0)
+        row.setdefault("collected", 0.0)
+        row["weekly_collection"] = row["collected"] * 7 / window_days
+        row["seller_name"] = names.get(row["seller_id"])
+    return sorted(rows.values(), key=lambda row: row["remaining"], reverse=True)
@@ -1,4 +1,4 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
@@ -12,6 +12,10 @@ settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return _user_for_token(token, db)
+
+def _user_for_token(token: str, db: Session, scope: str = None):
+    """The user of a session token, or of a URL token of `scope` (utils/security.py)."""
     import logging
     logger = logging.getLogger(__name__)
     logger.error(f"DEBUG: get_current_user called with token: {token[:10]}...")
@@ -26,6 +30,10 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         if username is None:
             logger.warning("Token payload missing 'sub' (username)")
             raise credentials_exception
+        if payload.get("scope") != scope:
+            # URL tokens are no sessions, and sessions don't go in URLs
+            logger.warning(f"Token scope {payload.get('scope')} used where {scope} is expected")
+            raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError as e:
         logger.warning(f"JWT decode error: {str(e)}")
@@ -37,6 +45,12 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         raise credentials_exception
     return user
 
+def get_user_from_url_token(scope: str):
+    """Dependency for URLs opened by the browser itself (see create_url_token): ?token=<url token of scope>."""
+    def dependency(token: str = Query(...), db: Session = Depends(get_db)):
+        return _user_for_token(token, db, scope)
+    return dependency
+
 def get_current_active_user(current_user: User = Depends(get_current_user)):
     if current_user.deleted_at:
         import logging
@@ -0,0 +1,43 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func
+
+
+def version_stamp(query, model) -> str:
+    """
+    Cheap version of everything a list query can return: row count plus the
+    newest updated_at. Inserts, updates, soft deletes (row leaves the filter)
+    and hard deletes all change it. Runs as a single aggregate, without loading rows.
+    """
+    count, latest = query.with_entities(func.count(model.id), func.max(model.updated_at)).order_by(None).one()
+    return f"{count}:{latest.isoformat() if latest else '-'}"
+
+
+def make_etag(request: Request, *parts) -> str:
+    """Strong ETag over the request URL (filters, cursor) and the given version parts."""
+    raw = "|".join([request.url.path, request.url.query, *[str(p) for p in parts]])
+    return '"' + hashlib.sha1(raw.encode()).hexdigest() + '"'
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Attach the ETag to the outgoing response and return a bare 304 when the
+    client already holds this version. Callers return the 304 as-is, skipping
+    the list query and serialization entirely.
+    """
+    headers = {
+        "ETag": etag,
+        # Browsers must revalidate every time, but may reuse the body on 304
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+    }
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in candidates or etag in candidates:
+            return Response(status_code=304, headers=headers)
+    return None
@@ -0,0 +1,234 @@
+"""
+Spreadsheet exports (CSV / XLSX) of sales, debts, expenses and stock.
+
+Rows are read as plain projections with yield_per, which streams them from a
+server-side cursor on PostgreSQL, and written out a chunk at a time, so
+memory stays flat whatever the size of the history. CSV chunks go to the
+wire as they are written. XLSX goes through openpyxl's write-only mode,
+which spools rows to a temporary file; the zip it is packed into can only be
+produced at the end, and is then sent in chunks from disk.
+
+Streams open their own session: the request's session is closed before the
+response body is sent.
+
+Money is as stored: sales and expenses in USD, debts in UZS, each with its
+exchange_rate. Times are local (Settings.TIMEZONE).
+"""
+import codecs
+import csv
+import enum
+import io
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Iterable, Iterator, Optional
+
+from openpyxl import Workbook
+from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased
+
+from ..database import SessionLocal
+from ..models.branch import Branch
+from ..models.debt import Debt
+from ..models.expense import Expense
+from ..models.product import Product
+from ..models.sale import Sale
+from ..models.user import User
+from .rollups import local_zone
+
+KINDS = ("sales", "debts", "expenses", "stock")
+FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# Rows fetched from the cursor, and written per CSV chunk
+EXPORT_CHUNK_ROWS = 1000
+# Bytes per chunk when sending a finished XLSX
+XLSX_CHUNK_BYTES = 64 * 1024
+
+
+def _seller_name():
+    seller = aliased(User)
+    return seller, func.coalesce(seller.full_name, seller.username)
+
+
+def _sales(db: Session):
+    seller, seller_name = _seller_name()
+    query = (
+        db.query(
+            Sale.date.label("Date"),
+            Branch.name.label("Branch"),
+            seller_name.label("Seller"),
+            Product.code.label("Product"),
+            Product.collection.label("Collection"),
+            Product.type.label("Type"),
+            Sale.quantity.label("Quantity"),
+            Sale.width.label("Width"),
+            Sale.length.label("Length"),
+            Sale.area.label("Area"),
+            Sale.payment_type.label("Payment type"),
+            Sale.is_nasiya.label("Nasiya"),
+            Sale.amount.label("Amount (USD)"),
+            Sale.profit.label("Profit (USD)"),
+            Sale.admin_profit.label("Admin profit (USD)"),
+            Sale.seller_profit.label("Seller profit (USD)"),
+            Sale.exchange_rate.label("Exchange rate"),
+            Sale.order_id.label("Order"),
+        )
+        .join(Branch, Sale.branch_id == Branch.id)
+        .join(Product, Sale.product_id == Product.id)
+        .join(seller, Sale.seller_id == seller.id)
+        .filter(Sale.deleted_at == None)
+    )
+    return query, Sale.date, Sale.branch_id, (Sale.date, Sale.id)
+
+
+def _debts(db: Session):
+    seller, seller_name = _seller_name()
+    query = (
+        db.query(
+            Debt.created_at.label("Created"),
+            Branch.name.label("Branch"),
+            seller_name.label("Seller"),
+            Debt.debtor_name.label("Debtor"),
+            Debt.phone_number.label("Phone"),
+            Debt.order_details.label("Order details"),
+            Debt.total_amount.label("Total (UZS)"),
+            Debt.initial_payment.label("Initial payment (UZS)"),
+            Debt.paid_amount.label("Paid (UZS)"),
+            Debt.remaining_amount.label("Remaining (UZS)"),
+            Debt.payment_deadline.label("Deadline"),
+            Debt.status.label("Status"),
+            Debt.exchange_rate.label("Exchange rate"),
+            Debt.order_id.label("Order"),
+        )
+        .join(Branch, Debt.branch_id == Branch.id)
+        .join(seller, Debt.seller_id == seller.id)
+        .filter(Debt.deleted_at == None)
+    )
+    return query, Debt.created_at, Debt.branch_id, (Debt.created_at, Debt.id)
+
+
+def _expenses(db: Session):
+    seller, seller_name = _seller_name()
+    staff = aliased(User)
+    query = (
+        db.query(
+            Expense.created_at.label("Date"),
+            Branch.name.label("Branch"),
+            seller_name.label("Recorded by"),
+            Expense.category.label("Category"),
+            func.coalesce(staff.full_name, staff.username).label("Staff member"),
+            Expense.description.label("Description"),
+            Expense.amount.label("Amount (USD)"),
+            Expense.exchange_rate.label("Exchange rate"),
+        )
+        .join(Branch, Expense.branch_id == Branch.id)
+        .join(seller, Expense.seller_id == seller.id)
+        .outerjoin(staff, Expense.staff_id == staff.id)
+        .filter(Expense.deleted_at == None)
+    )
+    return query, Expense.created_at, Expense.branch_id, (Expense.created_at, Expense.id)
+
+
+def _stock(db: Session):
+    query = (
+        db.query(
+            Branch.name.label("Branch"),
+            Product.code.label("Product"),
+            Product.collection.label("Collection"),
+            Product.category.label("Category"),
+            Product.type.label("Type"),
+            Product.quantity.label("Quantity"),
+            Product.width.label("Width"),
+            Product.remaining_length.label("Remaining length"),
+            Product.total_length.label("Total length"),
+            Product.is_usd_priced.label("USD priced"),
+            Product.buy_price.label("Buy price"),
+            Product.sell_price.label("Sell price"),
+            Product.sell_price_per_meter.label("Sell price per metre (USD)"),
+            Product.created_at.label("Created"),
+        )
+        .join(Branch, Product.branch_id == Branch.id)
+        .filter(Product.deleted_at == None)
+    )
+    # Current stock: no date column
+    return query, None, Product.branch_id, (Branch.name, Product.collection, Product.code, Product.id)
+
+
+QUERIES = {"sales": _sales, "debts": _debts, "expenses": _expenses, "stock": _stock}
+
+
+def export_query(db: Session, kind: str, branch_id=None, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Projection query of `kind` (one of KINDS); column labels are the sheet headers."""
+    query, date_column, branch_column, order = QUERIES[kind](db)
+    if branch_id is not None:
+        query = query.filter(branch_column == branch_id)
+    if date_column is not None:
+        if start is not None:
+            query = query.filter(date_column >= start)
+        if end is not None:
+            query = query.filter(date_column < end)
+    return query.order_by(*order)
+
+
+def _cell(value):
+    """Plain spreadsheet values: local naive times, enum values, floats."""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(local_zone()).replace(tzinfo=None, microsecond=0)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def write_csv(headers: list, rows: Iterable) -> Iterator[bytes]:
+    """UTF-8 CSV with a BOM (so Excel reads Cyrillic), EXPORT_CHUNK_ROWS rows per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    yield codecs.BOM_UTF8 + buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def write_xlsx(headers: list, rows: Iterable, title: str) -> Iterator[bytes]:
+    """One-sheet workbook built in write-only mode, then sent from disk in chunks."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while chunk := output.read(XLSX_CHUNK_BYTES):
+            yield chunk
+
+
+def stream_export(kind: str, format: str, branch_id=None, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[bytes]:
+    """File body of an export, read with its own session."""
+    db = SessionLocal()
+    try:
+        query = export_query(db, kind, branch_id, start, end)
+        headers = [column["name"] for column in query.column_descriptions]
+        rows = ([_cell(value) for value in row] for row in query.yield_per(EXPORT_CHUNK_ROWS))
+        if format == "csv":
+            yield from write_csv(headers, rows)
+        else:
+            yield from write_xlsx(headers, rows, kind)
+    finally:
+        db.close()
@@ -0,0 +1,56 @@
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+import orjson
+from fastapi.responses import StreamingResponse
+
+# Rows per chunk written to the wire while streaming a JSON array
+STREAM_CHUNK_ROWS = 500
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+
+def dumps(value) -> bytes:
+    """orjson with Decimal support (DECIMAL columns come back from projections as Decimal)."""
+    return orjson.dumps(value, default=_default)
+
+
+def response_columns(model, schema):
+    """
+    The model columns a response schema exposes, for Query.with_entities().
+    Loading only these skips ORM identity-map bookkeeping and heavy columns
+    (e.g. image embeddings) that the schema would drop anyway. Fields backed
+    by a Python property rather than a column are left for the caller to add.
+    """
+    columns = model.__mapper__.columns
+    return [getattr(model, field) for field in schema.model_fields if field in columns]
+
+
+def stream_json_array(rows: Iterable, chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Encode projection rows (SQLAlchemy Row objects or dicts) as a JSON array, a chunk of
+    rows at a time, so the first bytes go out before the whole list is built.
+    """
+    yield b"["
+    first = True
+    chunk = []
+    for row in rows:
+        chunk.append(row if isinstance(row, dict) else row._asdict())
+        if len(chunk) >= chunk_rows:
+            # Encode the chunk as one array and drop its brackets
+            yield (b"" if first else b",") + dumps(chunk)[1:-1]
+            first = False
+            chunk = []
+    if chunk:
+        yield (b"" if first else b",") + dumps(chunk)[1:-1]
+    yield b"]"
+
+
+def json_list_response(rows, response) -> StreamingResponse:
+    """Stream projection rows as a JSON array, keeping headers (ETag, cursor) set on `response`."""
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return StreamingResponse(stream_json_array(rows), media_type="application/json", headers=headers)
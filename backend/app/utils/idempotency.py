@@ -0,0 +1,231 @@
+"""
+Idempotency-Key support for write requests.
+
+The frontend retries writes on flaky connections. Without this, a retry of a
+sale, payment or expense whose response was lost records it a second time.
+A client that sends `Idempotency-Key: <uuid>` on a POST/PUT/PATCH/DELETE
+gets these guarantees:
+
+- The first request claims the key in its own short transaction, before the
+  endpoint runs. The claim is committed straight away, so it never holds or
+  waits on product or debt locks.
+- A retry after a successful response gets the stored response back
+  (status, body, plus `Idempotent-Replayed: true`). The endpoint doesn't run
+  and stock and balances are untouched.
+- A duplicate arriving while the first request is still running gets 409 with
+  Retry-After. If the first request fails (non-2xx or an exception), its claim
+  is released and the key can be retried.
+- Reusing a key for a different body gets 422.
+
+Keys are scoped to the user (JWT subject), method and path, and expire after
+KEY_TTL. Expired rows are purged at most every PURGE_INTERVAL per worker.
+"""
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from jose import jwt, JWTError
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+KEY_TTL = timedelta(hours=24)
+# A claim older than this with no response is from a crashed worker: take it over
+IN_PROGRESS_TIMEOUT = timedelta(minutes=2)
+PURGE_INTERVAL = 600.0 # seconds
+MAX_KEY_LENGTH = 255
+
+NEW, REPLAY, IN_PROGRESS, MISMATCH = "new", "replay", "in_progress", "mismatch"
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands timezone-aware columns back naive
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _subject(headers: Headers):
+    """Username from the bearer token, or None if there is no valid token."""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    settings = get_settings()
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+
+class IdempotencyStore:
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._last_purge = 0.0
+
+    def claim(self, key: str, request_hash: str):
+        """(outcome, stored row or None) for a request, claiming the key if it is free."""
+        now = datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            self._maybe_purge(db, now)
+            for _ in range(2):
+                db.add(IdempotencyKey(key=key, request_hash=request_hash, created_at=now, expires_at=now + KEY_TTL))
+                try:
+                    db.commit()
+                    return NEW, None
+                except IntegrityError:
+                    db.rollback()
+
+                row = db.get(IdempotencyKey, key, with_for_update=True)
+                if row is None:
+                    continue # released or purged in between: try to claim again
+                if _aware(row.expires_at) <= now:
+                    db.delete(row)
+                    db.commit()
+                    continue
+                if row.request_hash != request_hash:
+                    db.rollback()
+                    return MISMATCH, None
+                if row.status_code is None:
+                    if now - _aware(row.created_at) < IN_PROGRESS_TIMEOUT:
+                        db.rollback()
+                        return IN_PROGRESS, None
+                    logger.warning(f"Taking over stale idempotency claim {key[:12]}")
+                    row.created_at = now
+                    db.commit()
+                    return NEW, None
+                stored = (row.status_code, row.content_type, row.response_body)
+                db.rollback()
+                return REPLAY, stored
+            return IN_PROGRESS, None
+        finally:
+            db.close()
+
+    def complete(self, key: str, status_code: int, content_type, body: bytes):
+        db = self.session_factory()
+        try:
+            row = db.get(IdempotencyKey, key)
+            if row is not None:
+                row.status_code = status_code
+                row.content_type = content_type
+                row.response_body = body
+                db.commit()
+        finally:
+            db.close()
+
+    def release(self, key: str):
+        db = self.session_factory()
+        try:
+            db.query(IdempotencyKey).filter(IdempotencyKey.key == key, IdempotencyKey.status_code == None).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def _maybe_purge(self, db, now: datetime):
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = time.monotonic()
+        purged = db.query(IdempotencyKey).filter(IdempotencyKey.expires_at < now).delete(synchronize_session=False)
+        db.commit()
+        if purged:
+            logger.info(f"Purged {purged} expired idempotency keys")
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app, store: IdempotencyStore = None):
+        self.app = app
+        self.store = store or IdempotencyStore()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        client_key = headers.get("idempotency-key")
+        if not client_key:
+            await self.app(scope, receive, send)
+            return
+        if len(client_key) > MAX_KEY_LENGTH:
+            await self._send_json(send, 400, {"detail": f"Idempotency-Key is longer than {MAX_KEY_LENGTH} characters"})
+            return
+
+        # The body is needed for the request hash; it is replayed to the app below
+        chunks, more = [], True
+        while more:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        replayed = False
+
+        async def replay_body():
+            nonlocal replayed
+            if replayed:
+                return await receive() # disconnect
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        user = _subject(headers)
+        if user is None:
+            # Unauthenticated: the endpoint rejects it anyway
+            await self.app(scope, replay_body, send)
+            return
+
+        path = scope["path"]
+        key = hashlib.sha256("\n".join([user, scope["method"], path, client_key]).encode()).hexdigest()
+        request_hash = hashlib.sha256(scope.get("query_string", b"") + b"\n" + body).hexdigest()
+
+        outcome, stored = await run_in_threadpool(self.store.claim, key, request_hash)
+        if outcome == MISMATCH:
+            await self._send_json(send, 422, {"detail": "Idempotency-Key was already used for a different request"})
+            return
+        if outcome == IN_PROGRESS:
+            await self._send_json(send, 409, {"detail": "A request with this Idempotency-Key is still being processed"}, {"retry-after": "1"})
+            return
+        if outcome == REPLAY:
+            status_code, content_type, stored_body = stored
+            logger.info(f"Replaying idempotent {scope['method']} {path}")
+            await self._send(send, status_code, stored_body or b"", content_type, {"idempotent-replayed": "true"})
+            return
+
+        response = {"status": None, "content_type": None, "body": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["content_type"] = Headers(raw=message["headers"]).get("content-type")
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        except Exception:
+            await run_in_threadpool(self.store.release, key)
+            raise
+
+        if response["status"] is not None and 200 <= response["status"] < 300:
+            await run_in_threadpool(self.store.complete, key, response["status"], response["content_type"], b"".join(response["body"]))
+        else:
+            # Nothing was written (the endpoint rolled back), so the key may be retried
+            await run_in_threadpool(self.store.release, key)
+
+    async def _send_json(self, send, status_code: int, content: dict, extra_headers: dict = None):
+        await self._send(send, status_code, json.dumps(content).encode(), "application/json", extra_headers)
+
+    async def _send(self, send, status_code: int, body: bytes, content_type, extra_headers: dict = None):
+        headers = [(b"content-length", str(len(body)).encode())]
+        if content_type:
+            headers.append((b"content-type", content_type.encode()))
+        for name, value in (extra_headers or {}).items():
+            headers.append((name.encode(), value.encode()))
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
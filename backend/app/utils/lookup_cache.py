@@ -0,0 +1,125 @@
+"""
+Read-through cache for the small reference tables every screen and every
+sale reads: settings (exchange rate), collections, branches and staff. They
+change a few times a day, so reloading and re-serializing them on each
+request is wasted work.
+
+Each namespace is tied to one table. Entries are stored with that table's
+version stamp (row count + newest updated_at, see utils/etag.py) and served
+while the stamp is unchanged. The stamp itself is re-read at most every
+VERSION_TTL seconds, so a write made through another worker is picked up
+within that window. Write endpoints call invalidate() after their commit, so
+writes through this worker are visible immediately.
+
+Values are plain data (Decimals, response schemas), never ORM objects, so
+they can be shared between sessions and threads.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from sqlalchemy.orm import Session
+
+from ..models.settings import Settings
+from ..models.collection import Collection
+from ..models.branch import Branch
+from ..models.user import User
+from ..schemas.collection import CollectionResponse
+from .etag import version_stamp
+
+# Seconds a table's version stamp is trusted before it is read again
+VERSION_TTL = 2.0
+
+NAMESPACES = {
+    "settings": Settings,
+    "collections": Collection,
+    "branches": Branch,
+    "staff": User,
+}
+
+
+class LookupCache:
+    def __init__(self, version_ttl: float = VERSION_TTL):
+        self.version_ttl = version_ttl
+        self._entries: dict[tuple, tuple[str, object]] = {} # (namespace, key) -> (stamp, value)
+        self._versions: dict[str, tuple[float, str]] = {} # namespace -> (checked at, stamp)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "version_checks": 0, "invalidations": 0}
+
+    def version(self, db: Session, namespace: str) -> str:
+        """Current version stamp of a namespace's table (re-read at most every version_ttl seconds)."""
+        now = time.monotonic()
+        checked = self._versions.get(namespace)
+        if checked and now - checked[0] < self.version_ttl:
+            return checked[1]
+        model = NAMESPACES[namespace]
+        stamp = version_stamp(db.query(model), model)
+        with self._lock:
+            self._versions[namespace] = (now, stamp)
+            self.stats["version_checks"] += 1
+        return stamp
+
+    def get(self, db: Session, namespace: str, key, loader):
+        """The cached value for (namespace, key), or loader() stored under the current version."""
+        # Read the stamp before loading, so a write that lands meanwhile makes the entry stale
+        stamp = self.version(db, namespace)
+        entry = self._entries.get((namespace, key))
+        if entry and entry[0] == stamp:
+            with self._lock:
+                self.stats["hits"] += 1
+            return entry[1]
+
+        value = loader()
+        with self._lock:
+            self._entries[(namespace, key)] = (stamp, value)
+            self.stats["misses"] += 1
+        return value
+
+    def invalidate(self, namespace: str):
+        """Drop a namespace after a write. Call after commit."""
+        with self._lock:
+            self._versions.pop(namespace, None)
+            for key in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[key]
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def snapshot(self) -> dict:
+        requests = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_ratio": round(self.stats["hits"] / requests, 4) if requests else None,
+        }
+
+
+cache = LookupCache()
+
+
+def exchange_rate(db: Session):
+    """The exchange rate from settings as a Decimal, or None if there are no settings yet."""
+    def load():
+        settings = db.query(Settings).first()
+        return Decimal(str(settings.exchange_rate)) if settings else None
+    return cache.get(db, "settings", "exchange_rate", load)
+
+
+def collection_by_name(db: Session, name: str, branch_id=None):
+    """
+    Active collection called `name`, preferring the one in `branch_id`.
+    All collections are cached as one (name, branch_id) map.
+    """
+    def load():
+        by_key = {}
+        for collection in db.query(Collection).filter(Collection.deleted_at == None).order_by(Collection.created_at):
+            by_key.setdefault((collection.name, collection.branch_id), CollectionResponse.model_validate(collection))
+        return by_key
+    by_key = cache.get(db, "collections", "by_name", load)
+    found = by_key.get((name, branch_id))
+    if found is None:
+        found = next((c for (n, _), c in by_key.items() if n == name), None)
+    return found
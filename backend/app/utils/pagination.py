@@ -0,0 +1,55 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+# Upper bound for a single keyset page; larger page_size values are clamped.
+MAX_PAGE_SIZE = 500
+DEFAULT_PAGE_SIZE = 200
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: datetime, row_id: uuid.UUID) -> str:
+    """Pack the (sort key, id) of the last row into an opaque URL-safe token."""
+    payload = json.dumps({"k": sort_value.isoformat(), "id": str(row_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["k"]), uuid.UUID(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(query, sort_column, id_column, cursor: Optional[str], page_size: Optional[int], response: Response):
+    """
+    Newest-first keyset page over (sort_column, id_column).
+
+    Rows strictly "older" than the cursor are returned, so the page cost does not
+    depend on how deep the client has scrolled (unlike OFFSET). When more rows
+    remain, the cursor for the next page is sent in the X-Next-Cursor header and
+    the body stays a plain list, matching the non-paginated response shape.
+    """
+    size = min(page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+    query = query.order_by(sort_column.desc(), id_column.desc())
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        query = query.filter(tuple_(sort_column, id_column) < (last_value, last_id))
+
+    rows = query.limit(size + 1).all()
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            getattr(last, sort_column.key), getattr(last, id_column.key)
+        )
+    return rows
@@ -0,0 +1,176 @@
+"""
+Profit and loss of a branch for a period and the period of the same length
+right before it, as on the branch detail screens.
+
+Sales, expenses, payments and new debts are each read with one grouped
+range scan covering both periods (sales on (branch_id, date), expenses and
+debts on (branch_id, created_at), payments on payment_date); a CASE puts
+every row in its period. Open debts are one more aggregate, as of now.
+
+Sales and expenses are stored in USD, debts and their payments in UZS. Each
+row is converted at its own stored exchange_rate, i.e. at the rate of the
+day it happened, so old periods don't move when the rate changes.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import case, func, literal
+from sqlalchemy.orm import Session
+
+from ..models.sale import Sale
+from ..models.debt import Debt, DebtStatus, Payment
+from ..models.expense import Expense
+from .profit import _utc
+from .rollups import local_day
+
+CURRENT, PREVIOUS = "current", "previous"
+CURRENCIES = ("USD", "UZS")
+# Open periods ("up to now") end at the end of the current step
+OPEN_END_STEP = timedelta(minutes=15)
+
+
+def previous_period(start: datetime, end: datetime) -> tuple[datetime, datetime]:
+    """The period of the same length ending where [start, end) begins."""
+    return start - (end - start), start
+
+
+def open_end(now: Optional[datetime] = None) -> datetime:
+    """
+    End of an open period: the end of the current OPEN_END_STEP, so the
+    period and the one before it stay the same for every request, ETag and
+    cached copy within the step.
+    """
+    now = now or datetime.now(timezone.utc)
+    step = OPEN_END_STEP.total_seconds()
+    return datetime.fromtimestamp((now.timestamp() // step + 1) * step, timezone.utc)
+
+
+def _money(column, rate, currency: str, stored: str = "USD"):
+    if currency == stored:
+        return column
+    return column * rate if currency == "UZS" else column / rate
+
+
+def _period(column, bounds: dict):
+    """'current' / 'previous' for the period a row falls in."""
+    return case(
+        (column >= bounds[CURRENT][0], literal(CURRENT)),
+        else_=literal(PREVIOUS),
+    ).label("period")
+
+
+def branch_pnl(db: Session, branch_id, start: datetime, end: Optional[datetime] = None, currency: str = "USD") -> dict:
+    """
+    {"current": figures, "previous": figures, "debt": exposure,
+    "previous_start", "previous_end"} for [start, end) (see open_end for end=None).
+    """
+    start = _utc(start)
+    end = _utc(end) or open_end()
+    previous_start, previous_end = previous_period(start, end)
+    bounds = {CURRENT: (start, end), PREVIOUS: (previous_start, previous_end)}
+    figures = {period: {
+        "sale_count": 0, "revenue": 0.0, "cost_of_goods": 0.0, "gross_profit": 0.0,
+        "admin_profit": 0.0, "seller_profit": 0.0, "nasiya_sales": 0.0,
+        "branch_expenses": 0.0, "staff_expenses": 0.0, "expenses": 0.0, "net_profit": 0.0,
+        "debt_issued": 0.0, "debt_collected": 0.0,
+    } for period in bounds}
+
+    def money(column, rate, stored="USD"):
+        return func.coalesce(func.sum(_money(column, rate, currency, stored)), 0)
+
+    period = _period(Sale.date, bounds)
+    for row in (
+        db.query(
+            period,
+            func.count(Sale.id).label("sales"),
+            money(Sale.amount, Sale.exchange_rate).label("revenue"),
+            money(Sale.profit, Sale.exchange_rate).label("profit"),
+            money(Sale.admin_profit, Sale.exchange_rate).label("admin_profit"),
+            money(Sale.seller_profit, Sale.exchange_rate).label("seller_profit"),
+            money(case((Sale.is_nasiya == True, Sale.amount), else_=0), Sale.exchange_rate).label("nasiya"),
+        )
+        .filter(Sale.branch_id == branch_id, Sale.date >= previous_start, Sale.date < end, Sale.deleted_at == None)
+        .group_by(period)
+        .all()
+    ):
+        totals = figures[row.period]
+        totals.update(
+            sale_count=row.sales,
+            revenue=float(row.revenue),
+            cost_of_goods=float(row.revenue) - float(row.profit),
+            gross_profit=float(row.profit),
+            admin_profit=float(row.admin_profit),
+            seller_profit=float(row.seller_profit),
+            nasiya_sales=float(row.nasiya),
+        )
+
+    period = _period(Expense.created_at, bounds)
+    staff = Expense.category == "staff"
+    for row in (
+        db.query(
+            period,
+            money(case((staff, 0), else_=Expense.amount), Expense.exchange_rate).label("branch"),
+            money(case((staff, Expense.amount), else_=0), Expense.exchange_rate).label("staff"),
+        )
+        .filter(Expense.branch_id == branch_id, Expense.created_at >= previous_start, Expense.created_at < end, Expense.deleted_at == None)
+        .group_by(period)
+        .all()
+    ):
+        figures[row.period].update(branch_expenses=float(row.branch), staff_expenses=float(row.staff))
+
+    period = _period(Debt.created_at, bounds)
+    for row in (
+        db.query(period, money(Debt.total_amount - Debt.initial_payment, Debt.exchange_rate, "UZS").label("issued"))
+        .filter(Debt.branch_id == branch_id, Debt.created_at >= previous_start, Debt.created_at < end, Debt.deleted_at == None)
+        .group_by(period)
+        .all()
+    ):
+        figures[row.period]["debt_issued"] = float(row.issued)
+
+    # payment_date is stored as naive UTC
+    naive = {key: tuple(moment.replace(tzinfo=None) for moment in value) for key, value in bounds.items()}
+    period = _period(Payment.payment_date, naive)
+    for row in (
+        db.query(period, money(Payment.amount, Payment.exchange_rate, "UZS").label("collected"))
+        .join(Debt, Payment.debt_id == Debt.id)
+        .filter(
+            Debt.branch_id == branch_id,
+            Payment.payment_date >= naive[PREVIOUS][0],
+            Payment.payment_date < naive[CURRENT][1],
+            Payment.deleted_at == None,
+        )
+        .group_by(period)
+        .all()
+    ):
+        figures[row.period]["debt_collected"] = float(row.collected)
+
+    for totals in figures.values():
+        totals["expenses"] = totals["branch_expenses"] + totals["staff_expenses"]
+        totals["net_profit"] = totals["gross_profit"] - totals["expenses"]
+
+    today = local_day(datetime.now(timezone.utc))
+    overdue = Debt.payment_deadline < today
+    exposure = (
+        db.query(
+            func.count(Debt.id).label("open"),
+            money(Debt.remaining_amount, Debt.exchange_rate, "UZS").label("outstanding"),
+            func.coalesce(func.sum(case((overdue, 1), else_=0)), 0).label("overdue_count"),
+            money(case((overdue, Debt.remaining_amount), else_=0), Debt.exchange_rate, "UZS").label("overdue"),
+        )
+        .filter(Debt.branch_id == branch_id, Debt.status != DebtStatus.PAID, Debt.deleted_at == None)
+        .one()
+    )
+    return {
+        "start": start,
+        "end": end,
+        "previous_start": previous_start,
+        "previous_end": previous_end,
+        "current": figures[CURRENT],
+        "previous": figures[PREVIOUS],
+        "debt": {
+            "open_count": exposure.open,
+            "outstanding": float(exposure.outstanding),
+            "overdue_count": int(exposure.overdue_count),
+            "overdue": float(exposure.overdue),
+        },
+    }
@@ -0,0 +1,112 @@
+"""
+Product lookup by partial code, collection or category.
+
+On Postgres this uses pg_trgm: ILIKE prefix/substring matches and the `%`
+similarity operator are all served by the GIN trigram indexes on code and
+collection, and results are ranked by match kind then trigram similarity.
+Other databases (SQLite in tests) get the same ranking computed in Python
+with difflib, which is fine for small catalogues.
+"""
+from difflib import SequenceMatcher
+
+from sqlalchemy import case, func, or_
+
+from ..models.product import Product, ProductCategory
+
+# pg_trgm's default similarity threshold for the % operator
+SIMILARITY_THRESHOLD = 0.3
+# difflib ratios run higher than trigram similarity for short codes
+FALLBACK_RATIO_THRESHOLD = 0.6
+
+EXACT, PREFIX, SUBSTRING = 3.0, 2.0, 1.0
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def matching_categories(q: str) -> list[ProductCategory]:
+    """Category is a four-value enum, so it is prefix-matched here rather than indexed."""
+    needle = q.lower()
+    return [c for c in ProductCategory if c.value.lower().startswith(needle)]
+
+
+def _python_score(q: str, code: str, collection: str | None) -> float:
+    needle = q.lower()
+    best = 0.0
+    for value, weight in ((code, 1.0), (collection, 0.5)):
+        if not value:
+            continue
+        value = value.lower()
+        if value == needle:
+            kind = EXACT
+        elif value.startswith(needle):
+            kind = PREFIX
+        elif needle in value:
+            kind = SUBSTRING
+        else:
+            kind = 0.0
+        similarity = SequenceMatcher(None, needle, value).ratio()
+        if kind == 0.0 and similarity < FALLBACK_RATIO_THRESHOLD:
+            continue
+        best = max(best, (kind + similarity) * weight)
+    return best
+
+
+def search_products(db, query, q: str, columns, limit: int, offset: int):
+    """
+    Rank products from `query` (already filtered by branch and deleted_at)
+    against `q` and return one page of `columns` rows, best match first.
+    """
+    q = q.strip()
+    categories = matching_categories(q)
+
+    if db.bind.dialect.name == "postgresql":
+        pattern = _escape_like(q)
+        code_kind = case(
+            (func.lower(Product.code) == q.lower(), EXACT),
+            (Product.code.ilike(f"{pattern}%"), PREFIX),
+            (Product.code.ilike(f"%{pattern}%"), SUBSTRING),
+            else_=0.0,
+        )
+        collection_kind = case(
+            (Product.collection.ilike(f"{pattern}%"), PREFIX),
+            (Product.collection.ilike(f"%{pattern}%"), SUBSTRING),
+            else_=0.0,
+        )
+        score = func.greatest(
+            code_kind + func.similarity(Product.code, q),
+            (collection_kind + func.coalesce(func.similarity(Product.collection, q), 0.0)) * 0.5,
+        )
+        if categories:
+            score = func.greatest(score, case((Product.category.in_(categories), SUBSTRING * 0.5), else_=0.0))
+
+        conditions = [
+            Product.code.ilike(f"%{pattern}%"),
+            Product.code.bool_op("%")(q),
+            Product.collection.ilike(f"%{pattern}%"),
+            Product.collection.bool_op("%")(q),
+        ]
+        if categories:
+            conditions.append(Product.category.in_(categories))
+
+        return (
+            query.filter(or_(*conditions))
+            .with_entities(*columns)
+            .order_by(score.desc(), Product.code)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+    # Fallback: score every candidate in Python
+    rows = query.with_entities(*columns).all()
+    scored = []
+    for row in rows:
+        score = _python_score(q, row.code, row.collection)
+        if categories and row.category in categories:
+            score = max(score, SUBSTRING * 0.5)
+        if score > 0:
+            scored.append((score, row))
+    scored.sort(key=lambda item: (-item[0], item[1].code))
+    return [row for _, row in scored[offset:offset + limit]]
@@ -0,0 +1,193 @@
+"""
+Conservative (cost-first) profit recognition, as shown on the admin Hisob
+screen.
+
+An order's profit is recognized only once the money received for it covers
+what its goods cost: after payments P, the recognized profit is
+min(admin profit, max(0, P - cost)). Profit recognized in a period is that
+figure at the end of the period minus the same figure at its start, so it
+moves with the payments made in the period (a debt payment can recognize
+profit on an order sold months earlier).
+
+Everything is grouped by order in one SQL statement. Only orders that
+received money in the period are looked at; for every other order both
+figures are equal and contribute nothing.
+
+Money received for an order:
+- non-nasiya sales, on the sale date;
+- the down payment of a debt linked by order_id, on the debt's date;
+- each later payment on that debt, on its payment date.
+Debts and payments are stored in UZS; they are converted to USD at the
+exchange rate stored with each row.
+
+Cost is the USD buy cost recorded with each sale (amount - profit), and the
+admin profit is the sum of its admin_profit, so prices changed later don't
+rewrite history.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import String, and_, case, cast, func, select, union_all
+from sqlalchemy.orm import Session
+
+from ..models.sale import Sale
+from ..models.debt import Debt, Payment
+from ..models.expense import Expense
+from ..models.user import User
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _order_key():
+    # Sales saved without an order are orders of their own
+    return func.coalesce(Sale.order_id, cast(Sale.id, String))
+
+
+def _money_in(branch_id=None):
+    """(order_key, branch_id, USD amount, at) for every payment received for an order."""
+    live_debts = and_(Debt.deleted_at == None, Debt.order_id != None)
+    sales = select(
+        _order_key().label("order_key"), Sale.branch_id, Sale.amount.label("amount"), Sale.date.label("at"),
+    ).where(Sale.deleted_at == None, Sale.is_nasiya == False)
+    down_payments = select(
+        Debt.order_id, Debt.branch_id, Debt.initial_payment / Debt.exchange_rate, Debt.created_at,
+    ).where(live_debts, Debt.initial_payment > 0)
+    payments = select(
+        Debt.order_id, Debt.branch_id, Payment.amount / Payment.exchange_rate, Payment.payment_date,
+    ).join(Debt, Payment.debt_id == Debt.id).where(live_debts, Payment.deleted_at == None)
+    if branch_id is not None:
+        sales = sales.where(Sale.branch_id == branch_id)
+        down_payments = down_payments.where(Debt.branch_id == branch_id)
+        payments = payments.where(Debt.branch_id == branch_id)
+    return union_all(sales, down_payments, payments).subquery("money_in")
+
+
+def _recognized(paid, cost, potential):
+    """min(potential, max(0, paid - cost)), as a SQL expression."""
+    covered = case((paid - cost > 0, paid - cost), else_=0)
+    return case((covered > potential, potential), else_=covered)
+
+
+def recognized_profit(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None, branch_id=None) -> dict:
+    """
+    {branch_id: (recognized profit, orders)} for money received in
+    [start, end), in USD. Open ends mean the beginning of time and now.
+    """
+    start = _utc(start) or datetime.min.replace(tzinfo=timezone.utc)
+    end = _utc(end) or datetime.now(timezone.utc)
+
+    money = _money_in(branch_id)
+    in_period = and_(money.c.at >= start, money.c.at < end)
+    paid = (
+        select(
+            money.c.order_key,
+            money.c.branch_id,
+            func.sum(case((money.c.at < start, money.c.amount), else_=0)).label("before"),
+            func.sum(case((money.c.at < end, money.c.amount), else_=0)).label("after"),
+        )
+        .group_by(money.c.order_key, money.c.branch_id)
+        .having(func.sum(case((in_period, 1), else_=0)) > 0)
+        .subquery("paid")
+    )
+
+    order_key = _order_key()
+    orders = select(
+        order_key.label("order_key"),
+        Sale.branch_id,
+        func.sum(Sale.amount - Sale.profit).label("cost"),
+        func.sum(Sale.admin_profit).label("potential"),
+    ).where(Sale.deleted_at == None)
+    if branch_id is not None:
+        orders = orders.where(Sale.branch_id == branch_id)
+    orders = orders.group_by(order_key, Sale.branch_id).subquery("orders")
+
+    recognized = (
+        _recognized(paid.c.after, orders.c.cost, orders.c.potential)
+        - _recognized(paid.c.before, orders.c.cost, orders.c.potential)
+    )
+    rows = db.execute(
+        select(
+            orders.c.branch_id,
+            func.sum(recognized).label("profit"),
+            func.sum(case((recognized != 0, 1), else_=0)).label("orders"),
+        )
+        .select_from(paid)
+        .join(orders, and_(orders.c.order_key == paid.c.order_key, orders.c.branch_id == paid.c.branch_id))
+        .group_by(orders.c.branch_id)
+    ).all()
+    return {row.branch_id: (float(row.profit or 0), int(row.orders or 0)) for row in rows}
+
+
+def staff_distribution(db: Session, branch_id, start: datetime, end: Optional[datetime] = None) -> dict:
+    """
+    How a branch's seller profit for [start, end) is shared among its staff,
+    as on the Hisob and seller home screens: seller profit minus branch
+    expenses, split equally between the branch's users, minus each person's
+    own staff expenses (advances). USD.
+
+    Two grouped queries: sales per seller on (branch_id, date) and expenses
+    per category and staff member on (branch_id, created_at).
+    """
+    start = _utc(start)
+    end = _utc(end) or datetime.now(timezone.utc)
+
+    by_seller = {
+        row.seller_id: row
+        for row in (
+            db.query(
+                Sale.seller_id,
+                func.count(Sale.id).label("sales"),
+                func.coalesce(func.sum(Sale.seller_profit), 0).label("seller_profit"),
+                func.coalesce(func.sum(Sale.admin_profit), 0).label("admin_profit"),
+            )
+            .filter(Sale.branch_id == branch_id, Sale.date >= start, Sale.date < end, Sale.deleted_at == None)
+            .group_by(Sale.seller_id)
+            .all()
+        )
+    }
+    branch_expenses = 0.0
+    advances = {}
+    for category, staff_id, amount in (
+        db.query(Expense.category, Expense.staff_id, func.sum(Expense.amount))
+        .filter(Expense.branch_id == branch_id, Expense.created_at >= start, Expense.created_at < end, Expense.deleted_at == None)
+        .group_by(Expense.category, Expense.staff_id)
+        .all()
+    ):
+        if category == "staff":
+            if staff_id is not None:
+                advances[staff_id] = advances.get(staff_id, 0.0) + float(amount or 0)
+        else:
+            branch_expenses += float(amount or 0)
+
+    staff = db.query(User).filter(User.branch_id == branch_id, User.deleted_at == None).order_by(User.created_at).all()
+    seller_profit = sum(float(row.seller_profit) for row in by_seller.values())
+    distributable = seller_profit - branch_expenses
+    share = distributable / len(staff) if staff else 0.0
+
+    rows = []
+    for user in staff:
+        sold = by_seller.get(user.id)
+        advance = advances.get(user.id, 0.0)
+        rows.append({
+            "user_id": user.id,
+            "name": user.full_name or user.username,
+            "sales_count": sold.sales if sold else 0,
+            "seller_profit": float(sold.seller_profit) if sold else 0.0,
+            "admin_profit": float(sold.admin_profit) if sold else 0.0,
+            "share": share,
+            "advances": advance,
+            "net_payout": share - advance,
+        })
+    return {
+        "seller_profit": seller_profit,
+        "admin_profit": sum(float(row.admin_profit) for row in by_seller.values()),
+        "branch_expenses": branch_expenses,
+        "staff_expenses": sum(advances.values()),
+        "distributable": distributable,
+        "share_per_person": share,
+        "staff": rows,
+    }
@@ -0,0 +1,245 @@
+"""
+Shared cache of computed reports, so admins opening the same dashboard at
+the same time don't each rebuild the same aggregates.
+
+Entries are keyed by (report, branch, period, currency, role) and tagged
+with the data they were built from: "sales:<branch>", "debts:*", ...
+Write endpoints call invalidate(branch_id, "sales", ...) after their commit,
+which bumps the generation of "sales:<branch>" and "sales:*"; an entry is
+only served while its tags are at the generations it was built at. Every
+entry also carries the version stamp its endpoint computed (see
+utils/etag.py), so writes the cache is not told about (scripts, SQL by
+hand, another worker without Redis) still make it stale, and it expires
+after its report's TTL.
+
+Two tiers: a bounded in-process LRU, and Redis when REDIS_URL is set, which
+shares entries and tag generations between workers. A Redis error falls
+back to the in-process tier.
+
+Stampede protection: when an entry is missing or stale, one request builds
+it and the others wait for its result, behind a per-key lock within the
+worker and, with Redis, a lock across workers. A waiter that gets nothing
+within LOCK_TIMEOUT builds the report itself.
+"""
+import enum
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Iterable, Optional
+
+from pydantic import BaseModel
+
+try:
+    import redis
+except ImportError:  # optional: in-process tier only
+    redis = None
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+
+LOCAL_SIZE = 256
+DEFAULT_TTL = 300 # seconds
+TTLS = {
+    "warehouse": 900,
+    "recognized": 300,
+    "staff": 300,
+    "pnl": 120,
+    "debt-aging": 300,
+    "velocity": 900,
+    "history": 3600,
+}
+LOCK_TIMEOUT = 30.0 # seconds a build may hold the lock before others stop waiting
+LOCK_POLL = 0.05
+PREFIX = "gilamchi:report:"
+
+
+def tags_for(kinds: Iterable[str], branch_id=None) -> list[str]:
+    """Tags of a report over `kinds` of data of one branch, or of all branches ("*")."""
+    return [f"{kind}:{branch_id if branch_id is not None else '*'}" for kind in kinds]
+
+
+def _part(value) -> str:
+    return str(value.value if isinstance(value, enum.Enum) else value)
+
+
+class ReportCache:
+    def __init__(self, redis_url: Optional[str] = None, local_size: int = LOCAL_SIZE):
+        self.local_size = local_size
+        self._redis = redis.Redis.from_url(redis_url) if redis is not None and redis_url else None
+        # name -> (expires at, version, tag generations, report)
+        self._local: OrderedDict = OrderedDict()
+        self._generations = defaultdict(int)
+        self._lock = threading.Lock()
+        self._building: dict[str, threading.Lock] = {}
+        self.stats = {
+            "hits": 0, "redis_hits": 0, "misses": 0, "waits": 0,
+            "invalidations": 0, "redis_errors": 0,
+        }
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def _redis_failed(self, error: Exception):
+        self._count("redis_errors")
+        logger.warning(f"Report cache: Redis unavailable, using the in-process tier: {error}")
+
+    def _tag_generations(self, tags: tuple) -> tuple:
+        if not tags:
+            return ()
+        if self._redis is not None:
+            try:
+                return tuple(int(value or 0) for value in self._redis.mget([PREFIX + "tag:" + tag for tag in tags]))
+            except redis.RedisError as e:
+                self._redis_failed(e)
+        return tuple(self._generations[tag] for tag in tags)
+
+    def _lookup(self, name: str, version: str, generations: tuple, schema):
+        now = time.time()
+        with self._lock:
+            entry = self._local.get(name)
+            if entry and entry[0] > now and entry[1] == version and entry[2] == generations:
+                self._local.move_to_end(name)
+                self.stats["hits"] += 1
+                return entry[3]
+        if self._redis is None or schema is None:
+            return None
+        try:
+            raw = self._redis.get(PREFIX + name)
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return None
+        if raw is None:
+            return None
+        stored = json.loads(raw)
+        if stored["version"] != version or tuple(stored["generations"]) != generations:
+            return None
+        report = schema.model_validate(stored["report"])
+        self._store_local(name, stored["expires_at"], version, generations, report)
+        self._count("redis_hits")
+        return report
+
+    def _store_local(self, name: str, expires_at: float, version: str, generations: tuple, report):
+        with self._lock:
+            self._local[name] = (expires_at, version, generations, report)
+            self._local.move_to_end(name)
+            while len(self._local) > self.local_size:
+                evicted, _ = self._local.popitem(last=False)
+                lock = self._building.get(evicted)
+                if lock is not None and not lock.locked():
+                    del self._building[evicted]
+
+    def _store(self, name: str, ttl: int, version: str, generations: tuple, report):
+        expires_at = time.time() + ttl
+        self._store_local(name, expires_at, version, generations, report)
+        if self._redis is None or not isinstance(report, BaseModel):
+            return
+        payload = json.dumps({
+            "version": version,
+            "generations": list(generations),
+            "expires_at": expires_at,
+            "report": report.model_dump(mode="json"),
+        })
+        try:
+            self._redis.set(PREFIX + name, payload, ex=ttl)
+        except redis.RedisError as e:
+            self._redis_failed(e)
+
+    def _wait(self, name: str, lock_name: str, version: str, generations: tuple, schema):
+        """Poll for the report another worker is building, until it is stored or its lock is gone."""
+        self._count("waits")
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL)
+            report = self._lookup(name, version, generations, schema)
+            if report is not None:
+                return report
+            try:
+                if not self._redis.exists(lock_name):
+                    return self._lookup(name, version, generations, schema)
+            except redis.RedisError as e:
+                self._redis_failed(e)
+                return None
+        return None
+
+    def get_or_build(self, key: tuple, version: str, build: Callable, schema=None, tags: Iterable[str] = (), ttl: Optional[int] = None):
+        """
+        The cached report for `key` (report name first) at `version`, or
+        build() stored for the report's TTL. `schema` (the response model)
+        is needed to share the report through Redis.
+        """
+        name = "|".join(_part(part) for part in key)
+        ttl = ttl or TTLS.get(key[0], DEFAULT_TTL)
+        # Read before building, so an invalidation during the build makes the result stale
+        generations = self._tag_generations(tuple(tags))
+        report = self._lookup(name, version, generations, schema)
+        if report is not None:
+            return report
+
+        with self._lock:
+            building = self._building.setdefault(name, threading.Lock())
+        with building:
+            # Built by another request of this worker while this one waited
+            report = self._lookup(name, version, generations, schema)
+            if report is not None:
+                return report
+
+            lock = None
+            if self._redis is not None:
+                lock_name = PREFIX + "lock:" + name
+                try:
+                    lock = self._redis.lock(lock_name, timeout=LOCK_TIMEOUT)
+                    if not lock.acquire(blocking=False):
+                        lock = None
+                        report = self._wait(name, lock_name, version, generations, schema)
+                        if report is not None:
+                            return report
+                except redis.RedisError as e:
+                    self._redis_failed(e)
+                    lock = None
+            try:
+                self._count("misses")
+                report = build()
+                self._store(name, ttl, version, generations, report)
+                return report
+            finally:
+                if lock is not None:
+                    try:
+                        lock.release()
+                    except redis.RedisError:
+                        pass # expired meanwhile; the next build takes over
+
+    def invalidate(self, branch_id, *kinds: str):
+        """Make the reports over `kinds` of `branch_id` (and all-branch ones) stale. Call after commit."""
+        tags = [tag for kind in kinds for tag in (f"{kind}:*", f"{kind}:{branch_id}")]
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] += 1
+            self.stats["invalidations"] += 1
+        if self._redis is not None:
+            try:
+                pipeline = self._redis.pipeline()
+                for tag in tags:
+                    pipeline.incr(PREFIX + "tag:" + tag)
+                pipeline.execute()
+            except redis.RedisError as e:
+                self._redis_failed(e)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "redis": self._redis is not None,
+            "entries": len(self._local),
+            "hit_ratio": round((self.stats["hits"] + self.stats["redis_hits"]) / lookups, 4) if lookups else None,
+        }
+
+
+cache = ReportCache(get_settings().REDIS_URL or None)
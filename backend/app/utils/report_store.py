@@ -0,0 +1,57 @@
+"""
+Reports precomputed by scheduled jobs, stored in report_snapshots.
+
+A snapshot is keyed by the report and its parameters and stamped with the
+version of the tables it was built from (the same version the endpoint
+puts in its ETag), so it is only served while nothing it depends on has
+changed. Endpoints only read snapshots; jobs write them.
+"""
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.report_snapshot import ReportSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_key(key: tuple) -> str:
+    return "|".join(str(part) for part in key)
+
+
+def load_snapshot(db: Session, key: tuple, version: str, schema):
+    """The stored report for `key` if it was built at `version`, else None."""
+    row = db.get(ReportSnapshot, snapshot_key(key))
+    if row is None or row.version != version:
+        return None
+    return schema.model_validate_json(row.payload)
+
+
+def refresh_snapshot(db: Session, key: tuple, version: str, build) -> Optional[float]:
+    """
+    Build and store the report unless the stored one is still at `version`.
+    Returns the build time in seconds, None when it was up to date.
+    """
+    row = db.get(ReportSnapshot, snapshot_key(key))
+    if row is not None and row.version == version:
+        return None
+    started = time.perf_counter()
+    payload = build().model_dump_json()
+    elapsed = time.perf_counter() - started
+    if row is None:
+        row = ReportSnapshot(key=snapshot_key(key))
+        db.add(row)
+    row.version = version
+    row.payload = payload
+    row.duration_ms = int(elapsed * 1000)
+    row.built_at = datetime.now(timezone.utc)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Stored meanwhile by another worker (e.g. during a leader change)
+        db.rollback()
+    return elapsed
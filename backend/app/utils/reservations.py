@@ -0,0 +1,282 @@
+"""
+Time-limited stock reservations for baskets.
+
+Adding an item to a basket reserves it for RESERVATION_TTL. The basket
+keeps its reservations alive while it is open. Other sellers then see the
+item as unavailable (available = on-hand - active reservations of other
+baskets), instead of finding out at checkout that it is gone.
+
+Reserving bumps the product's version (and the size row's), so a
+concurrent sale or reservation of the same product fails its version check
+and re-reads the reservations before trying again (see utils/contention.py).
+
+A basket belongs to the seller who reserved its lines: other sellers get
+404 for it (see check_owner), admins can see and release any basket.
+
+Expired rows don't count towards reserved stock, whether or not they have
+been deleted yet. The sweeper deletes them in batches through the
+expires_at index.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, and_, not_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..database import SessionLocal
+from ..models.product import Product, ProductType
+from ..models.reservation import StockReservation
+from ..models.stock_item import ProductStockItem, StockItemKind
+from .contention import attempts
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_TTL = timedelta(minutes=15)
+SWEEP_INTERVAL = 30.0 # seconds
+SWEEP_BATCH = 500
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _held(db: Session, column, product_id, size=None, exclude_basket=None, exclude_line=None):
+    query = db.query(func.coalesce(func.sum(column), 0)).filter(
+        StockReservation.product_id == product_id,
+        StockReservation.expires_at > _now(),
+    )
+    if size is not None:
+        query = query.filter(StockReservation.size == size)
+    if exclude_line is not None:
+        query = query.filter(not_(and_(StockReservation.basket_id == exclude_basket, StockReservation.line_id == exclude_line)))
+    elif exclude_basket is not None:
+        query = query.filter(StockReservation.basket_id != exclude_basket)
+    return query.scalar()
+
+
+def held_quantity(db: Session, product_id, size=None, exclude_basket=None, exclude_line=None) -> int:
+    """Carpets held by active reservations (of `size`, if given), other than the excluded basket or line."""
+    return int(_held(db, StockReservation.quantity, product_id, size, exclude_basket, exclude_line))
+
+
+def held_length(db: Session, product_id, exclude_basket=None, exclude_line=None) -> Decimal:
+    """Metres held by active reservations, other than the excluded basket or line."""
+    return Decimal(str(_held(db, StockReservation.length, product_id, None, exclude_basket, exclude_line)))
+
+
+def held_by_product(db: Session, product_ids) -> dict:
+    """{product_id: (carpets, metres)} held by active reservations, in one grouped query."""
+    rows = (
+        db.query(
+            StockReservation.product_id,
+            func.coalesce(func.sum(StockReservation.quantity), 0),
+            func.coalesce(func.sum(StockReservation.length), 0),
+        )
+        .filter(StockReservation.product_id.in_(product_ids), StockReservation.expires_at > _now())
+        .group_by(StockReservation.product_id)
+        .all()
+    )
+    return {product_id: (int(quantity), Decimal(str(length))) for product_id, quantity, length in rows}
+
+
+def check_owner(db: Session, basket_id: str, user):
+    """404 if the basket holds another seller's reservations. Admins may use any basket."""
+    if user.role == "admin":
+        return
+    foreign = (
+        db.query(StockReservation.id)
+        .filter(StockReservation.basket_id == basket_id, StockReservation.seller_id != user.id)
+        .first()
+    )
+    if foreign is not None:
+        raise HTTPException(status_code=404, detail="Basket not found")
+
+
+def basket_reservations(db: Session, basket_id: str) -> list[StockReservation]:
+    return (
+        db.query(StockReservation)
+        .filter(StockReservation.basket_id == basket_id, StockReservation.expires_at > _now())
+        .order_by(StockReservation.created_at)
+        .all()
+    )
+
+
+def reserve(db: Session, basket_id: str, line_id: str, product: Product, user,
+            quantity=None, size: Optional[str] = None, width: Optional[float] = None, length=None) -> StockReservation:
+    """
+    Create or replace the reservation for one basket line. Raises 409 when
+    other baskets already hold the stock. The caller commits.
+    """
+    for _ in attempts("reservation"):
+        size_item = None
+        if product.type == ProductType.METER:
+            length = Decimal(str(length if length else quantity))
+            on_hand = Decimal(str(product.remaining_length if product.remaining_length is not None else (product.total_length or 0)))
+            available = on_hand - held_length(db, product.id, basket_id, line_id)
+            if available < length:
+                raise HTTPException(status_code=409, detail=f"Only {float(max(available, 0)):g}m available, the rest is reserved or sold")
+            quantity = None
+        else:
+            quantity = int(quantity)
+            available = product.quantity - held_quantity(db, product.id, exclude_basket=basket_id, exclude_line=line_id)
+            if available < quantity:
+                raise HTTPException(status_code=409, detail=f"Only {max(available, 0)} available, the rest is reserved or sold")
+            if size:
+                size_item = (
+                    db.query(ProductStockItem)
+                    .populate_existing()
+                    .filter(ProductStockItem.product_id == product.id, ProductStockItem.kind == StockItemKind.SIZE, ProductStockItem.size == size)
+                    .order_by(ProductStockItem.position)
+                    .first()
+                )
+                if size_item is not None and size_item.quantity is not None:
+                    available = size_item.quantity - held_quantity(db, product.id, size, basket_id, line_id)
+                    if available < quantity:
+                        raise HTTPException(status_code=409, detail=f"Only {max(available, 0)} of size {size} available, the rest is reserved or sold")
+            length = None
+
+        # Claim the product (and size row) at the version the check was made
+        # against; a concurrent sale or reservation makes this fail and retry
+        claimed = (
+            db.query(Product)
+            .filter(Product.id == product.id, Product.version == product.version)
+            .update({Product.version: Product.version + 1}, synchronize_session="fetch")
+        )
+        if claimed and size_item is not None:
+            claimed = (
+                db.query(ProductStockItem)
+                .filter(ProductStockItem.id == size_item.id, ProductStockItem.version == size_item.version)
+                .update({ProductStockItem.version: ProductStockItem.version + 1}, synchronize_session="fetch")
+            )
+        if not claimed:
+            db.refresh(product)
+            continue
+
+        reservation = (
+            db.query(StockReservation)
+            .filter(StockReservation.basket_id == basket_id, StockReservation.line_id == line_id)
+            .first()
+        )
+        if reservation is None:
+            reservation = StockReservation(basket_id=basket_id, line_id=line_id)
+            db.add(reservation)
+        elif reservation.seller_id != user.id:
+            # Never take over another seller's line
+            raise HTTPException(status_code=404, detail="Basket not found")
+        reservation.product_id = product.id
+        reservation.branch_id = product.branch_id
+        reservation.seller_id = user.id
+        reservation.quantity = quantity
+        reservation.size = size
+        reservation.width = width
+        reservation.length = length
+        reservation.expires_at = _now() + RESERVATION_TTL
+        db.flush()
+        return reservation
+
+
+def extend(db: Session, basket_id: str) -> list[StockReservation]:
+    """Keep a basket's active reservations alive for another RESERVATION_TTL. Expired ones are not revived."""
+    reservations = basket_reservations(db, basket_id)
+    expires_at = _now() + RESERVATION_TTL
+    for reservation in reservations:
+        reservation.expires_at = expires_at
+    return reservations
+
+
+def release(db: Session, basket_id: str, line_id: Optional[str] = None) -> int:
+    query = db.query(StockReservation).filter(StockReservation.basket_id == basket_id)
+    if line_id is not None:
+        query = query.filter(StockReservation.line_id == line_id)
+    return query.delete(synchronize_session=False)
+
+
+class BasketCoverage:
+    """
+    What a basket's active reservations cover at checkout. A line fully
+    covered by them skips the reservation check: the stock was set aside for
+    it when it was reserved. The conditional stock update still runs.
+    """
+    def __init__(self, reservations: list[StockReservation]):
+        self._units = defaultdict(int)
+        self._metres = defaultdict(Decimal)
+        for r in reservations:
+            if r.length is not None:
+                self._metres[r.product_id] += Decimal(str(r.length))
+            elif r.quantity:
+                self._units[(r.product_id, r.size)] += int(r.quantity)
+
+    def take_units(self, product_id, size, quantity) -> bool:
+        key = (product_id, size)
+        if self._units[key] >= quantity:
+            self._units[key] -= int(quantity)
+            return True
+        return False
+
+    def take_metres(self, product_id, length) -> bool:
+        length = Decimal(str(length))
+        if self._metres[product_id] >= length:
+            self._metres[product_id] -= length
+            return True
+        return False
+
+
+def sweep_expired(batch_size: int = SWEEP_BATCH) -> int:
+    """Delete expired reservations, oldest first, a batch at a time."""
+    db = SessionLocal()
+    swept = 0
+    try:
+        while True:
+            ids = [row.id for row in (
+                db.query(StockReservation.id)
+                .filter(StockReservation.expires_at <= _now())
+                .order_by(StockReservation.expires_at)
+                .limit(batch_size)
+                .all()
+            )]
+            if not ids:
+                return swept
+            db.query(StockReservation).filter(StockReservation.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            swept += len(ids)
+    finally:
+        db.close()
+
+
+class ReservationSweeper:
+    def __init__(self, interval: float = SWEEP_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                swept = await run_in_threadpool(sweep_expired)
+                if swept:
+                    logger.info(f"Swept {swept} expired stock reservations")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reservation sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+sweeper = ReservationSweeper()
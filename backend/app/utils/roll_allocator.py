@@ -0,0 +1,113 @@
+"""
+Roll allocation for metraj sales: which roll a cut of width x length is taken from.
+
+Rolls are indexed by width, each width keeping its rolls sorted by remaining
+length, so a lookup is a binary search rather than a scan. Two strategies:
+
+- BEST_FIT: the shortest roll that is long enough.
+- MIN_WASTE (default): like best fit, but never leaves an offcut shorter than
+  MIN_SELLABLE_OFFCUT when another roll can take the cut without one. Such an
+  offcut is too short to sell and ends up as waste.
+
+Ties are broken by roll position (the order rolls were added) and then by id,
+so the same inventory and the same cuts always give the same plan. The engine
+does no I/O. Callers load the rolls and apply the plan (see utils/stock.py).
+"""
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Iterable, Optional
+
+# Offcuts at or below this length (m) are treated as used up
+ROLL_EMPTY_LENGTH = Decimal("0.05")
+# Shortest piece (m) still worth keeping as a roll
+MIN_SELLABLE_OFFCUT = Decimal("1.0")
+
+BEST_FIT = "best_fit"
+MIN_WASTE = "min_waste"
+STRATEGIES = (BEST_FIT, MIN_WASTE)
+
+
+def _width_key(width) -> Decimal:
+    # Widths are Float columns; compare them at centimetre precision
+    return Decimal(str(width)).quantize(Decimal("0.01"))
+
+
+@dataclass(frozen=True)
+class Cut:
+    width: float
+    length: Decimal
+    key: object = None # caller's reference (basket line, product id, ...)
+
+
+@dataclass(frozen=True)
+class Allocation:
+    cut: Cut
+    roll_id: Optional[object] # None: no single roll fits
+    length_before: Optional[Decimal] = None
+    length_after: Optional[Decimal] = None
+
+    @property
+    def waste(self) -> Decimal:
+        """Offcut too short to sell, left behind by this cut."""
+        if self.length_after is None or self.length_after <= ROLL_EMPTY_LENGTH:
+            return Decimal("0")
+        return self.length_after if self.length_after < MIN_SELLABLE_OFFCUT else Decimal("0")
+
+
+class RollInventory:
+    def __init__(self, rolls: Iterable = ()):
+        """`rolls`: objects with id, width, length and position (ORM rows work)."""
+        # width -> sorted [(length, position, id)]
+        self._by_width: dict[Decimal, list[tuple]] = {}
+        for roll in rolls:
+            self.add(roll.id, roll.width, roll.length, roll.position or 0)
+
+    def add(self, roll_id, width, length, position: int = 0):
+        entry = (Decimal(str(length)), position, str(roll_id), roll_id)
+        insort(self._by_width.setdefault(_width_key(width), []), entry)
+
+    def lengths(self, width) -> list[Decimal]:
+        return [entry[0] for entry in self._by_width.get(_width_key(width), [])]
+
+    def _pick(self, rolls: list[tuple], length: Decimal, strategy: str) -> Optional[int]:
+        fits = bisect_left(rolls, (length,))
+        if fits == len(rolls):
+            return None
+        if strategy == BEST_FIT or rolls[fits][0] - length <= ROLL_EMPTY_LENGTH:
+            return fits
+        if rolls[fits][0] - length >= MIN_SELLABLE_OFFCUT:
+            return fits
+        # Best fit would leave an unsellable offcut: take the shortest roll that
+        # leaves a sellable one instead, if there is such a roll
+        sellable = bisect_left(rolls, (length + MIN_SELLABLE_OFFCUT,), lo=fits)
+        return sellable if sellable < len(rolls) else fits
+
+    def allocate(self, cut: Cut, strategy: str = MIN_WASTE) -> Allocation:
+        """Pick a roll for `cut` and update the inventory as if it had been cut."""
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown allocation strategy: {strategy}")
+        length = Decimal(str(cut.length))
+        rolls = self._by_width.get(_width_key(cut.width), [])
+        index = self._pick(rolls, length, strategy)
+        if index is None:
+            return Allocation(cut=cut, roll_id=None)
+
+        roll_length, position, id_key, roll_id = rolls.pop(index)
+        remaining = roll_length - length
+        if remaining > ROLL_EMPTY_LENGTH:
+            insort(rolls, (remaining, position, id_key, roll_id))
+        return Allocation(cut=cut, roll_id=roll_id, length_before=roll_length, length_after=max(remaining, Decimal("0")))
+
+    def allocate_many(self, cuts: Iterable[Cut], strategy: str = MIN_WASTE) -> list[Allocation]:
+        """
+        Allocate a whole basket in one pass. Longest cuts go first so short
+        cuts don't fragment the rolls the long ones need. Results come back
+        in the order the cuts were given.
+        """
+        cuts = list(cuts)
+        order = sorted(range(len(cuts)), key=lambda i: (-Decimal(str(cuts[i].length)), i))
+        results: list[Optional[Allocation]] = [None] * len(cuts)
+        for i in order:
+            results[i] = self.allocate(cuts[i], strategy)
+        return results
@@ -0,0 +1,201 @@
+"""
+Daily rollups of sales, expenses and debt payments (models/rollup.py).
+
+Write endpoints call record_sales() / record_expense() / record_payment()
+after their flush and before their commit, so a rollup row changes in the
+same transaction as the rows it sums: if the write rolls back, so does the
+rollup. Deletes call the same functions with sign=-1.
+
+Rows are upserted (INSERT ... ON CONFLICT DO UPDATE adding to the sums), one
+statement per key, so concurrent writes to the same key add up instead of
+overwriting each other. Each write touches a handful of keys and holds those
+rows only until its commit; call these last, right before the commit.
+
+rebuild() recomputes a range of days from the raw rows, for backfills and
+after fixing data by hand (see rebuild_rollups.py).
+"""
+import logging
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import and_, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models.rollup import DailyRollup
+from ..models.sale import Sale
+from ..models.debt import Debt, Payment
+from ..models.expense import Expense
+from ..models.product import Product, ProductType
+
+logger = logging.getLogger(__name__)
+
+KEY = ("day", "branch_id", "seller_id", "kind", "payment_type", "currency")
+SUMS = ("count", "quantity", "metres", "amount", "profit", "admin_profit", "seller_profit")
+SALE, EXPENSE, DEBT_PAYMENT = "sale", "expense", "debt_payment"
+
+
+@lru_cache()
+def local_zone() -> ZoneInfo:
+    return ZoneInfo(get_settings().TIMEZONE)
+
+
+def local_day(moment: datetime) -> date:
+    """Calendar day of `moment` in Settings.TIMEZONE. Naive values are UTC."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(local_zone()).date()
+
+
+def day_start(day: date) -> datetime:
+    """UTC instant the local `day` starts."""
+    return datetime.combine(day, time.min, tzinfo=local_zone()).astimezone(timezone.utc)
+
+
+def _value(value) -> Decimal:
+    return Decimal(str(value or 0))
+
+
+def _sale_sums(sale: Sale, product_type) -> tuple[tuple, dict]:
+    payment_type = getattr(sale.payment_type, "value", sale.payment_type)
+    key = (local_day(sale.date), sale.branch_id, sale.seller_id, SALE, payment_type, "USD")
+    is_meter = product_type == ProductType.METER
+    return key, {
+        "count": 1,
+        "quantity": Decimal(0) if is_meter else _value(sale.quantity),
+        "metres": _value(sale.length if sale.length is not None else sale.quantity) if is_meter else Decimal(0),
+        "amount": _value(sale.amount),
+        "profit": _value(sale.profit),
+        "admin_profit": _value(sale.admin_profit),
+        "seller_profit": _value(sale.seller_profit),
+    }
+
+
+def _expense_sums(expense: Expense) -> tuple[tuple, dict]:
+    # The frontend converts expenses to USD before saving them (is_usd is never set)
+    key = (local_day(expense.created_at), expense.branch_id, expense.seller_id, EXPENSE, "", "USD")
+    return key, {"count": 1, "amount": _value(expense.amount)}
+
+
+def _payment_sums(payment: Payment, debt: Debt) -> tuple[tuple, dict]:
+    # Debts and their payments are kept in UZS
+    key = (local_day(payment.payment_date), debt.branch_id, payment.recorded_by, DEBT_PAYMENT, "", "UZS")
+    return key, {"count": 1, "amount": _value(payment.amount)}
+
+
+def _add(totals: dict, key: tuple, sums: dict, sign: int):
+    row = totals[key]
+    for name, value in sums.items():
+        row[name] = row.get(name, 0) + value * sign
+
+
+def _upsert(db: Session, key: tuple, sums: dict):
+    keys = dict(zip(KEY, key))
+    now = datetime.now(timezone.utc)
+    dialect = db.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        table = DailyRollup.__table__
+        stmt = insert(table).values(
+            id=uuid.uuid4(), created_at=now, updated_at=now,
+            **{**{name: 0 for name in SUMS}, **sums}, **keys,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(KEY),
+            set_={**{name: table.c[name] + stmt.excluded[name] for name in sums}, "updated_at": now},
+        )
+        db.execute(stmt)
+        return
+
+    matched = db.execute(
+        update(DailyRollup)
+        .where(and_(*[getattr(DailyRollup, name) == value for name, value in keys.items()]))
+        .values({**{name: getattr(DailyRollup, name) + value for name, value in sums.items()}, "updated_at": now})
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not matched:
+        db.add(DailyRollup(**keys, **sums))
+        db.flush()
+
+
+def _apply(db: Session, totals: dict):
+    # Fixed key order, so two writes touching the same keys can't deadlock
+    for key in sorted(totals, key=lambda k: tuple(str(part) for part in k)):
+        _upsert(db, key, totals[key])
+
+
+def record_sales(db: Session, sales: list[Sale], product_types: dict, sign: int = 1):
+    """Add flushed sales to their rollups. product_types is {product_id: ProductType}."""
+    totals = defaultdict(dict)
+    for sale in sales:
+        _add(totals, *_sale_sums(sale, product_types[sale.product_id]), sign)
+    _apply(db, totals)
+
+
+def record_expense(db: Session, expense: Expense, sign: int = 1):
+    totals = defaultdict(dict)
+    _add(totals, *_expense_sums(expense), sign)
+    _apply(db, totals)
+
+
+def record_payment(db: Session, payment: Payment, debt: Debt, sign: int = 1):
+    totals = defaultdict(dict)
+    _add(totals, *_payment_sums(payment, debt), sign)
+    _apply(db, totals)
+
+
+def rebuild(db: Session, first_day: Optional[date] = None, last_day: Optional[date] = None) -> int:
+    """
+    Recompute the rollups of [first_day, last_day] (local days; open ends
+    mean all history) from sales, expenses and payments. Returns the number
+    of rollup rows written. The caller commits.
+    """
+    start = day_start(first_day) if first_day else None
+    end = day_start(last_day + timedelta(days=1)) if last_day else None
+
+    def in_range(query, column, naive=False):
+        if start is not None:
+            query = query.filter(column >= (start.replace(tzinfo=None) if naive else start))
+        if end is not None:
+            query = query.filter(column < (end.replace(tzinfo=None) if naive else end))
+        return query
+
+    totals = defaultdict(dict)
+    sales = in_range(
+        db.query(Sale, Product.type).join(Product, Sale.product_id == Product.id).filter(Sale.deleted_at == None),
+        Sale.date,
+    )
+    for sale, product_type in sales.yield_per(1000):
+        _add(totals, *_sale_sums(sale, product_type), 1)
+    for expense in in_range(db.query(Expense).filter(Expense.deleted_at == None), Expense.created_at).yield_per(1000):
+        _add(totals, *_expense_sums(expense), 1)
+    # payment_date is stored as naive UTC
+    payments = in_range(
+        db.query(Payment, Debt).join(Debt, Payment.debt_id == Debt.id).filter(Payment.deleted_at == None),
+        Payment.payment_date, naive=True,
+    )
+    for payment, debt in payments.yield_per(1000):
+        _add(totals, *_payment_sums(payment, debt), 1)
+
+    stale = db.query(DailyRollup)
+    if first_day:
+        stale = stale.filter(DailyRollup.day >= first_day)
+    if last_day:
+        stale = stale.filter(DailyRollup.day <= last_day)
+    stale.delete(synchronize_session=False)
+
+    db.add_all([
+        DailyRollup(**dict(zip(KEY, key)), **{**{name: 0 for name in SUMS}, **sums})
+        for key, sums in totals.items()
+    ])
+    db.flush()
+    logger.info(f"Rebuilt {len(totals)} daily rollups ({first_day or 'start'} .. {last_day or 'now'})")
+    return len(totals)
@@ -0,0 +1,187 @@
+"""
+Scheduled background jobs (APScheduler), e.g. precomputing reports before
+admins open them (see register_jobs in routers/reports.py).
+
+Every worker starts the scheduler from the lifespan hook, but only the
+leader runs jobs: the worker holding the scheduler_leases row. It renews
+the lease every LEASE_RENEW; if it dies, another worker takes the lease
+over once it expires (LEASE_TTL). Each job run gets its own session.
+
+Run counts, durations, failures and the last error of every job are kept
+per worker and reported in /api/metrics.
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models.report_snapshot import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "scheduler"
+LEASE_TTL = timedelta(seconds=90)
+LEASE_RENEW = timedelta(seconds=30)
+
+
+def acquire_lease(name: str, holder: str, ttl: timedelta = LEASE_TTL) -> bool:
+    """Take or renew the lease; False while another holder's lease is valid."""
+    db = SessionLocal()
+    try:
+        now = datetime.now(timezone.utc)
+        taken = (
+            db.query(SchedulerLease)
+            .filter(SchedulerLease.name == name, or_(SchedulerLease.holder == holder, SchedulerLease.expires_at < now))
+            .update({"holder": holder, "expires_at": now + ttl}, synchronize_session=False)
+        )
+        if not taken:
+            if db.get(SchedulerLease, name) is not None:
+                db.rollback()
+                return False
+            db.add(SchedulerLease(name=name, holder=holder, expires_at=now + ttl))
+        db.commit()
+        return True
+    except IntegrityError:
+        # Another worker created it first
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def release_lease(name: str, holder: str):
+    db = SessionLocal()
+    try:
+        db.query(SchedulerLease).filter(SchedulerLease.name == name, SchedulerLease.holder == holder).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+class JobStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def record(self, name: str, duration: float, error: Optional[str] = None):
+        with self._lock:
+            job = self._jobs.setdefault(name, {
+                "runs": 0, "failures": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                "last_seconds": None, "last_run": None, "last_error": None, "last_error_at": None,
+            })
+            job["runs"] += 1
+            job["total_seconds"] += duration
+            job["max_seconds"] = max(job["max_seconds"], duration)
+            job["last_seconds"] = round(duration, 4)
+            job["last_run"] = datetime.now(timezone.utc).isoformat()
+            if error is not None:
+                job["failures"] += 1
+                job["last_error"] = error
+                job["last_error_at"] = job["last_run"]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    **{key: value for key, value in job.items() if key != "total_seconds"},
+                    "max_seconds": round(job["max_seconds"], 4),
+                    "avg_seconds": round(job["total_seconds"] / job["runs"], 4),
+                }
+                for name, job in self._jobs.items()
+            }
+
+
+class Scheduler:
+    def __init__(self):
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.stats = JobStats()
+        self._jobs = {}
+        self._scheduler: Optional[BackgroundScheduler] = None
+
+    def add_job(self, name: str, func: Callable, trigger: str, **trigger_args):
+        """Register func(db) to run on an APScheduler trigger ("interval" / "cron")."""
+        self._jobs[name] = (func, trigger, trigger_args)
+
+    async def start(self):
+        if not get_settings().SCHEDULER_ENABLED:
+            logger.info("Scheduler disabled (SCHEDULER_ENABLED=false)")
+            return
+        scheduler = BackgroundScheduler(
+            timezone=get_settings().TIMEZONE,
+            # A run missed while the process was busy runs once, not once per missed slot
+            job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 300},
+        )
+        scheduler.add_job(
+            self._renew_lease, "interval", seconds=LEASE_RENEW.total_seconds(),
+            id="lease", next_run_time=datetime.now(timezone.utc),
+        )
+        for name, (func, trigger, trigger_args) in self._jobs.items():
+            scheduler.add_job(self._run, trigger, args=(name, func), id=name, **trigger_args)
+        scheduler.start()
+        self._scheduler = scheduler
+        logger.info(f"Scheduler started as {self.holder} with jobs: {', '.join(self._jobs)}")
+
+    async def stop(self):
+        if self._scheduler is None:
+            return
+        self._scheduler.shutdown(wait=False)
+        self._scheduler = None
+        if self.is_leader:
+            self.is_leader = False
+            # Let another worker take over right away instead of after LEASE_TTL
+            await asyncio.to_thread(release_lease, LEASE_NAME, self.holder)
+
+    def _renew_lease(self):
+        try:
+            leader = acquire_lease(LEASE_NAME, self.holder)
+        except Exception as e:
+            logger.error(f"Scheduler lease renewal failed: {e}")
+            leader = False
+        if leader != self.is_leader:
+            logger.info(f"Scheduler: {self.holder} {'is now' if leader else 'is no longer'} the leader")
+        self.is_leader = leader
+
+    def _run(self, name: str, func: Callable):
+        if not self.is_leader:
+            return
+        db = SessionLocal()
+        started = time.perf_counter()
+        try:
+            func(db)
+            db.commit()
+            self.stats.record(name, time.perf_counter() - started)
+        except Exception as e:
+            db.rollback()
+            self.stats.record(name, time.perf_counter() - started, error=f"{type(e).__name__}: {e}")
+            logger.exception(f"Scheduled job {name} failed")
+        finally:
+            db.close()
+
+    def snapshot(self) -> dict:
+        next_runs = {}
+        if self._scheduler is not None:
+            for job in self._scheduler.get_jobs():
+                if job.id in self._jobs and job.next_run_time:
+                    next_runs[job.id] = job.next_run_time.isoformat()
+        return {
+            "running": self._scheduler is not None,
+            "leader": self.is_leader,
+            "holder": self.holder,
+            "next_runs": next_runs,
+            "jobs": self.stats.snapshot(),
+        }
+
+
+scheduler = Scheduler()
@@ -8,6 +8,12 @@ settings = get_settings()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Tokens for URLs the browser opens itself (downloads, EventSource streams),
+# which can't carry an Authorization header. Short-lived and only valid for their scope, so a URL
+# that ends up in a log or the history can't be used as a session.
+URL_TOKEN_TTL = timedelta(seconds=60)
+URL_TOKEN_SCOPES = ("export", "events")
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -23,3 +29,6 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
+
+def create_url_token(username: str, scope: str) -> str:
+    return create_access_token({"sub": username, "scope": scope}, expires_delta=URL_TOKEN_TTL)
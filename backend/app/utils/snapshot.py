@@ -0,0 +1,365 @@
+"""
+Columnar (Parquet) snapshot of sales, debt payments and expenses plus the
+product dimension, so heavy analytics read files instead of scanning the
+tables checkout writes to.
+
+Facts are Hive-style partitions by local month and branch:
+
+    ANALYTICS_DIR/sales/month=2025-03/branch_id=<uuid>/part-<stamp>-<n>.parquet
+
+export_snapshot() appends the rows changed (updated_at) since each table's
+watermark, up to SNAPSHOT_LAG behind now so rows of transactions that are
+still open when it runs aren't skipped for good. Edited and soft-deleted
+rows are simply appended again: load() keeps the newest version of every id
+and drops deleted ones, and a partition with more than COMPACT_FILES parts
+is rewritten as one. Hard deletes are not seen; rebuild with full=True
+(export_snapshot.py --full) after deleting rows by hand.
+
+Products are small and rewritten whole on every export.
+
+Money is as stored: sales and expenses in USD, payments in UZS, each row
+with its exchange_rate. Needs pyarrow; without it available() is False.
+"""
+import enum
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+try:
+    import pyarrow  # noqa: F401  (parquet engine used by pandas)
+except ImportError:  # optional: no snapshot
+    pyarrow = None
+
+from ..config import get_settings
+from ..models.debt import Debt, Payment
+from ..models.expense import Expense
+from ..models.product import Product
+from ..models.sale import Sale
+from .rollups import local_day
+
+logger = logging.getLogger(__name__)
+
+# Rows read from the database and written per part
+SNAPSHOT_CHUNK_ROWS = 50_000
+SNAPSHOT_LAG = timedelta(minutes=2)
+COMPACT_FILES = 32
+WATERMARKS = "_watermarks.json"
+
+STR, FLOAT, BOOL, TIME = "str", "float", "bool", "time"
+
+# Fact tables: (model whose updated_at is the watermark, joins, [(name, column, kind)]).
+# Every fact has id, date, branch_id, updated_at and deleted_at.
+FACTS = {
+    "sales": (Sale, (), [
+        ("id", Sale.id, STR),
+        ("date", Sale.date, TIME),
+        ("branch_id", Sale.branch_id, STR),
+        ("product_id", Sale.product_id, STR),
+        ("seller_id", Sale.seller_id, STR),
+        ("quantity", Sale.quantity, FLOAT),
+        ("width", Sale.width, FLOAT),
+        ("length", Sale.length, FLOAT),
+        ("area", Sale.area, FLOAT),
+        ("payment_type", Sale.payment_type, STR),
+        ("is_nasiya", Sale.is_nasiya, BOOL),
+        ("amount", Sale.amount, FLOAT),
+        ("profit", Sale.profit, FLOAT),
+        ("admin_profit", Sale.admin_profit, FLOAT),
+        ("seller_profit", Sale.seller_profit, FLOAT),
+        ("exchange_rate", Sale.exchange_rate, FLOAT),
+        ("order_id", Sale.order_id, STR),
+        ("updated_at", Sale.updated_at, TIME),
+        ("deleted_at", Sale.deleted_at, TIME),
+    ]),
+    # Branch and seller of the debt; payment_date is naive UTC
+    "payments": (Payment, ((Debt, Payment.debt_id == Debt.id),), [
+        ("id", Payment.id, STR),
+        ("date", Payment.payment_date, TIME),
+        ("branch_id", Debt.branch_id, STR),
+        ("debt_id", Payment.debt_id, STR),
+        ("seller_id", Debt.seller_id, STR),
+        ("recorded_by", Payment.recorded_by, STR),
+        ("amount", Payment.amount, FLOAT),
+        ("exchange_rate", Payment.exchange_rate, FLOAT),
+        ("updated_at", Payment.updated_at, TIME),
+        ("deleted_at", Payment.deleted_at, TIME),
+    ]),
+    "expenses": (Expense, (), [
+        ("id", Expense.id, STR),
+        ("date", Expense.created_at, TIME),
+        ("branch_id", Expense.branch_id, STR),
+        ("seller_id", Expense.seller_id, STR),
+        ("staff_id", Expense.staff_id, STR),
+        ("category", Expense.category, STR),
+        ("amount", Expense.amount, FLOAT),
+        ("is_usd", Expense.is_usd, BOOL),
+        ("exchange_rate", Expense.exchange_rate, FLOAT),
+        ("updated_at", Expense.updated_at, TIME),
+        ("deleted_at", Expense.deleted_at, TIME),
+    ]),
+}
+
+PRODUCTS = [
+    ("product_id", Product.id, STR),
+    ("branch_id", Product.branch_id, STR),
+    ("code", Product.code, STR),
+    ("collection", Product.collection, STR),
+    ("category", Product.category, STR),
+    ("type", Product.type, STR),
+    ("width", Product.width, FLOAT),
+    ("is_usd_priced", Product.is_usd_priced, BOOL),
+    ("buy_price", Product.buy_price, FLOAT),
+    ("sell_price", Product.sell_price, FLOAT),
+    ("sell_price_per_meter", Product.sell_price_per_meter, FLOAT),
+    ("created_at", Product.created_at, TIME),
+    ("deleted_at", Product.deleted_at, TIME),
+]
+
+
+def available() -> bool:
+    return pyarrow is not None
+
+
+def snapshot_dir() -> Path:
+    return Path(get_settings().ANALYTICS_DIR)
+
+
+def _plain(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _frame(rows: list, columns: list) -> pd.DataFrame:
+    """Rows as a frame with fixed dtypes, so every part has the same schema."""
+    frame = pd.DataFrame([[_plain(value) for value in row] for row in rows], columns=[name for name, _, _ in columns])
+    for name, _, kind in columns:
+        if kind == TIME:
+            frame[name] = pd.to_datetime(frame[name], utc=True)
+        elif kind == FLOAT:
+            frame[name] = frame[name].astype("float64")
+        elif kind == BOOL:
+            frame[name] = frame[name].fillna(False).astype(bool)
+        else:
+            frame[name] = frame[name].astype("object").where(frame[name].notna(), None)
+    return frame
+
+
+def _write(frame: pd.DataFrame, path: Path):
+    """Write atomically: readers never see a half-written part."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".tmp")
+    frame.to_parquet(partial, index=False)
+    os.replace(partial, path)
+
+
+def _read_watermarks(root: Path) -> dict:
+    try:
+        return json.loads((root / WATERMARKS).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def _save_watermarks(root: Path, marks: dict):
+    root.mkdir(parents=True, exist_ok=True)
+    partial = root / (WATERMARKS + ".tmp")
+    partial.write_text(json.dumps(marks, indent=2))
+    os.replace(partial, root / WATERMARKS)
+
+
+def watermark(table: str) -> Optional[datetime]:
+    """Time up to which `table` has been exported, None before the first export."""
+    mark = _read_watermarks(snapshot_dir()).get(table)
+    return datetime.fromisoformat(mark) if mark else None
+
+
+def _partition(root: Path, table: str, month: str, branch_id) -> Path:
+    return root / table / f"month={month}" / f"branch_id={branch_id}"
+
+
+def _latest(frame: pd.DataFrame) -> pd.DataFrame:
+    """Newest version of every id, without the deleted ones."""
+    frame = frame.sort_values("updated_at", kind="stable").drop_duplicates("id", keep="last")
+    return frame[frame["deleted_at"].isna()]
+
+
+def _read_parts(directory: Path) -> list:
+    frames = []
+    for part in sorted(directory.glob("*.parquet")):
+        try:
+            frames.append(pd.read_parquet(part))
+        except FileNotFoundError:  # removed by a compaction meanwhile
+            continue
+    return frames
+
+
+def _compact(directory: Path, stamp: str):
+    parts = sorted(directory.glob("*.parquet"))
+    if len(parts) <= COMPACT_FILES:
+        return
+    frame = _latest(pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True))
+    # Sorts after the parts it replaces, so they lose on updated_at ties
+    _write(frame, directory / f"part-{stamp}-compact.parquet")
+    for part in parts:
+        part.unlink()
+
+
+def export_snapshot(db: Session, full: bool = False) -> dict:
+    """
+    Append the rows changed since the last export; {table: rows written}.
+    full=True drops the snapshot and exports all history again.
+    """
+    if not available():
+        raise RuntimeError("pyarrow is not installed")
+    root = snapshot_dir()
+    marks = {} if full else _read_watermarks(root)
+    upper = datetime.now(timezone.utc) - SNAPSHOT_LAG
+    stamp = upper.strftime("%Y%m%d%H%M%S")
+    written = {}
+
+    for table, (model, joins, columns) in FACTS.items():
+        if full:
+            shutil.rmtree(root / table, ignore_errors=True)
+        query = db.query(*[column.label(name) for name, column, _ in columns])
+        for target, condition in joins:
+            query = query.join(target, condition)
+        query = query.filter(model.updated_at <= upper)
+        if marks.get(table):
+            query = query.filter(model.updated_at > datetime.fromisoformat(marks[table]))
+
+        touched = set()
+        count = 0
+        chunk = []
+        for row in query.order_by(model.updated_at).yield_per(SNAPSHOT_CHUNK_ROWS):
+            chunk.append(row)
+            if len(chunk) == SNAPSHOT_CHUNK_ROWS:
+                touched |= _append(root, table, _frame(chunk, columns), f"{stamp}-{count // SNAPSHOT_CHUNK_ROWS}")
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            touched |= _append(root, table, _frame(chunk, columns), f"{stamp}-{count // SNAPSHOT_CHUNK_ROWS}")
+            count += len(chunk)
+        for directory in touched:
+            _compact(directory, stamp)
+
+        marks[table] = upper.isoformat()
+        _save_watermarks(root, marks)
+        written[table] = count
+
+    products = db.query(*[column.label(name) for name, column, _ in PRODUCTS]).all()
+    _write(_frame(products, PRODUCTS), root / "products.parquet")
+    written["products"] = len(products)
+    logger.info(f"Analytics snapshot: {written} (up to {upper.isoformat()})")
+    return written
+
+
+def _append(root: Path, table: str, frame: pd.DataFrame, name: str) -> set:
+    months = frame["date"].map(lambda moment: local_day(moment).strftime("%Y-%m"))
+    touched = set()
+    for (month, branch_id), part in frame.groupby([months, "branch_id"]):
+        directory = _partition(root, table, month, branch_id)
+        _write(part, directory / f"part-{name}.parquet")
+        touched.add(directory)
+    return touched
+
+
+def _months(start: Optional[datetime], end: Optional[datetime]):
+    """Local months [start, end) touches, None for an open end."""
+    first = local_day(start).strftime("%Y-%m") if start else None
+    last = local_day(end - timedelta(microseconds=1)).strftime("%Y-%m") if end else None
+    return first, last
+
+
+def load(table: str, start: Optional[datetime] = None, end: Optional[datetime] = None, branch_id=None) -> pd.DataFrame:
+    """
+    Current rows of a fact table dated in [start, end), optionally of one
+    branch. Only the partitions of those months and branch are read.
+    """
+    if table not in FACTS:
+        raise ValueError(f"Unknown snapshot table: {table}")
+    if start is not None and start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end is not None and end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    first, last = _months(start, end)
+    frames = []
+    for month_dir in sorted((snapshot_dir() / table).glob("month=*")):
+        month = month_dir.name.split("=", 1)[1]
+        if (first and month < first) or (last and month > last):
+            continue
+        pattern = f"branch_id={branch_id}" if branch_id is not None else "branch_id=*"
+        for directory in month_dir.glob(pattern):
+            frames.extend(_read_parts(directory))
+
+    columns = FACTS[table][2]
+    if not frames:
+        return _frame([], columns)
+    frame = _latest(pd.concat(frames, ignore_index=True))
+    if start is not None:
+        frame = frame[frame["date"] >= start]
+    if end is not None:
+        frame = frame[frame["date"] < end]
+    return frame.reset_index(drop=True)
+
+
+def load_products() -> pd.DataFrame:
+    path = snapshot_dir() / "products.parquet"
+    return pd.read_parquet(path) if path.exists() else _frame([], PRODUCTS)
+
+
+
+HISTORY_GROUPS = ("month", "branch", "seller", "collection")
+
+
+def sales_history(group_by: str, start: Optional[datetime] = None, end: Optional[datetime] = None, branch_id=None, currency: str = "USD") -> list[dict]:
+    """
+    Sale count, carpets and metres sold, revenue and profit per local month,
+    branch, seller or collection, from the snapshot. Amounts are converted
+    at each sale's own exchange_rate when currency is UZS.
+    """
+    sales = load("sales", start, end, branch_id)
+    products = load_products()[["product_id", "collection", "type"]]
+    sales = sales.merge(products, on="product_id", how="left")
+    rate = sales["exchange_rate"] if currency == "UZS" else 1.0
+    is_meter = sales["type"] == "meter"
+    sales = sales.assign(
+        revenue=sales["amount"] * rate,
+        profit=sales["profit"] * rate,
+        units=sales["quantity"].where(~is_meter, 0.0),
+        metres=sales["length"].fillna(sales["quantity"]).where(is_meter, 0.0),
+        key={
+            "month": lambda frame: frame["date"].map(lambda moment: local_day(moment).strftime("%Y-%m")),
+            "branch": lambda frame: frame["branch_id"],
+            "seller": lambda frame: frame["seller_id"],
+            "collection": lambda frame: frame["collection"].fillna(""),
+        }[group_by],
+    )
+    grouped = sales.groupby("key").agg(
+        sale_count=("id", "count"),
+        units=("units", "sum"),
+        metres=("metres", "sum"),
+        revenue=("revenue", "sum"),
+        profit=("profit", "sum"),
+    ).reset_index()
+    rows = [
+        {key: getattr(value, "item", lambda: value)() for key, value in row.items()}
+        for row in grouped.to_dict("records")
+    ]
+    if group_by == "month":
+        return sorted(rows, key=lambda row: row["key"])
+    return sorted(rows, key=lambda row: row["revenue"], reverse=True)
@@ -0,0 +1,181 @@
+"""
+Per-size and per-roll stock operations on product_stock_items.
+
+Stock rows are updated optimistically: a sale reads the size or roll row
+without locking it, then writes it with a conditional UPDATE that also
+checks the row's version (see utils/contention.py). Nothing is held locked
+while the sale computes prices and inserts its rows, and two sales of
+different sizes or rolls of the same product never wait on each other.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from ..models.product import Product
+from ..models.stock_item import ProductStockItem, StockItemKind, size_entry
+from .roll_allocator import RollInventory, Cut, Allocation, MIN_WASTE, ROLL_EMPTY_LENGTH
+from .contention import attempts
+
+
+def take_size(db: Session, product: Product, size: str, quantity: int, held=None):
+    """
+    Deduct `quantity` carpets of `size`. Sizes listed without a count are left
+    alone. `held()`, if given, returns how many of them other baskets have reserved.
+    """
+    quantity = int(quantity)
+    for _ in attempts("size"):
+        item = (
+            db.query(ProductStockItem)
+            .populate_existing()
+            .filter(
+                ProductStockItem.product_id == product.id,
+                ProductStockItem.kind == StockItemKind.SIZE,
+                ProductStockItem.size == size,
+            )
+            .order_by(ProductStockItem.position)
+            .first()
+        )
+        if item is None or item.quantity is None:
+            return None
+        if item.quantity - (held() if held else 0) < quantity:
+            raise HTTPException(status_code=400, detail=f"Insufficient stock for size {size}")
+        updated = (
+            db.query(ProductStockItem)
+            .filter(
+                ProductStockItem.id == item.id,
+                ProductStockItem.version == item.version,
+                ProductStockItem.quantity >= quantity,
+            )
+            .update({
+                ProductStockItem.quantity: ProductStockItem.quantity - quantity,
+                ProductStockItem.version: ProductStockItem.version + 1,
+            }, synchronize_session="fetch")
+        )
+        if updated:
+            return item
+
+
+def load_rolls(db: Session, product_ids) -> list[ProductStockItem]:
+    """Rolls of the given products, freshly read, in (product, width, length, id) order."""
+    return (
+        db.query(ProductStockItem)
+        .populate_existing()
+        .filter(ProductStockItem.product_id.in_(product_ids), ProductStockItem.kind == StockItemKind.ROLL)
+        .order_by(ProductStockItem.product_id, ProductStockItem.width, ProductStockItem.length, ProductStockItem.id)
+        .all()
+    )
+
+
+def plan_cuts(rolls: list[ProductStockItem], product_cuts: list[tuple], strategy: str = MIN_WASTE) -> list[Allocation]:
+    """
+    Allocate (product_id, Cut) pairs against `rolls`, one inventory per
+    product, longest cuts first. Nothing is written; see apply_cut().
+    """
+    by_product = defaultdict(list)
+    for roll in rolls:
+        by_product[roll.product_id].append(roll)
+    inventories = {product_id: RollInventory(items) for product_id, items in by_product.items()}
+
+    results = [None] * len(product_cuts)
+    grouped = defaultdict(list)
+    for i, (product_id, cut) in enumerate(product_cuts):
+        grouped[product_id].append(i)
+    for product_id, indexes in grouped.items():
+        inventory = inventories.get(product_id) or RollInventory()
+        allocations = inventory.allocate_many([product_cuts[i][1] for i in indexes], strategy)
+        for i, allocation in zip(indexes, allocations):
+            results[i] = allocation
+    return results
+
+
+def apply_cut(db: Session, roll: ProductStockItem, allocation: Allocation) -> bool:
+    """
+    Write a planned cut to its roll, if the roll hasn't changed since it was
+    read; used-up rolls are removed. False means another sale got there first.
+    """
+    unchanged = db.query(ProductStockItem).filter(
+        ProductStockItem.id == roll.id,
+        ProductStockItem.version == roll.version,
+    )
+    if allocation.length_after <= ROLL_EMPTY_LENGTH:
+        return bool(unchanged.delete(synchronize_session="fetch"))
+    return bool(unchanged.update({
+        ProductStockItem.length: allocation.length_after,
+        ProductStockItem.version: ProductStockItem.version + 1,
+    }, synchronize_session="fetch"))
+
+
+def cut_rolls(db: Session, product_cuts: list[tuple], strategy: str = MIN_WASTE) -> list:
+    """
+    Plan and apply (product_id, Cut) pairs in one go. Returns the roll each
+    cut was taken from, or None where no single roll fits (that sale is then
+    taken from the product's remaining length only, as before).
+
+    If a roll was changed by another sale after it was read, the cuts not yet
+    applied are planned again against fresh rolls.
+    """
+    results = [None] * len(product_cuts)
+    pending = list(range(len(product_cuts)))
+    for _ in attempts("roll"):
+        rolls = load_rolls(db, {product_cuts[i][0] for i in pending})
+        by_id = {roll.id: roll for roll in rolls}
+        plan = plan_cuts(rolls, [product_cuts[i] for i in pending], strategy)
+        for n, (i, allocation) in enumerate(zip(pending, plan)):
+            if allocation.roll_id is None:
+                continue
+            roll = by_id[allocation.roll_id]
+            if not apply_cut(db, roll, allocation):
+                pending = pending[n:]
+                break
+            results[i] = roll
+        else:
+            return results
+
+
+def cut_roll(db: Session, product: Product, width: float, length: float):
+    """Cut `length` metres from the roll of `width` chosen by the allocator (see cut_rolls)."""
+    return cut_rolls(db, [(product.id, Cut(width=width, length=Decimal(str(length))))])[0]
+
+
+def sizes_by_product(db: Session, product_ids) -> dict:
+    """available_sizes for many products in one query, keyed by product id."""
+    sizes = defaultdict(list)
+    if not product_ids:
+        return sizes
+    items = (
+        db.query(
+            ProductStockItem.product_id, ProductStockItem.kind, ProductStockItem.size, ProductStockItem.width,
+            ProductStockItem.length, ProductStockItem.initial_length, ProductStockItem.quantity,
+        )
+        .filter(ProductStockItem.product_id.in_(product_ids))
+        .order_by(ProductStockItem.product_id, ProductStockItem.position)
+        .all()
+    )
+    for item in items:
+        sizes[item.product_id].append(size_entry(item))
+    return sizes
+
+
+def with_available_sizes(db: Session, rows) -> list[dict]:
+    """Projection rows (which carry `id`) as dicts with available_sizes filled in."""
+    sizes = sizes_by_product(db, [row.id for row in rows])
+    return [{**row._asdict(), "available_sizes": sizes.get(row.id) or None} for row in rows]
+
+
+def in_stock_with_size(query, width: float, length: float):
+    """
+    Narrow a Product query to carpets of exactly width x length in stock.
+    A size listed without its own count is in stock while the product is.
+    """
+    return query.filter(Product.stock_items.any(and_(
+        ProductStockItem.kind == StockItemKind.SIZE,
+        ProductStockItem.width == width,
+        ProductStockItem.length == Decimal(str(length)),
+        or_(
+            ProductStockItem.quantity > 0,
+            and_(ProductStockItem.quantity == None, Product.quantity > 0),
+        ),
+    )))
@@ -0,0 +1,200 @@
+"""
+Sales velocity, days of cover and dead stock, for reorder decisions.
+
+Units (carpets) and metres (metraj) sold over the last 7, 30 and 90 local
+days are summed per product and size with pandas, then rolled up to
+collections, sizes or branches. Days of cover is current stock divided by
+the average daily sales of the last 30 days. A product is dead stock when
+it has stock, is older than the longest window and sold nothing in it.
+
+Only the last 90 days of sales are read. They are kept per worker as
+per-(product, size, day) sums: closed days are reused until a sale dated
+in them changes (its count / updated_at stamp moves), and only today's
+sales are read again on each refresh.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from ..models.product import Product, ProductType
+from ..models.sale import Sale
+from ..models.stock_item import ProductStockItem, StockItemKind, parse_size
+from .etag import version_stamp
+from .rollups import day_start, local_day
+
+WINDOWS = (7, 30, 90)
+COVER_WINDOW = 30
+GROUPS = ("product", "collection", "size", "branch")
+SOLD_COLUMNS = ["product_id", "size", "day", "units", "metres"]
+# Sizes are "" when unknown, so they can be merged and grouped on
+
+# Per-(product, size, day) sums of closed days: {"first": date, "last": date, "stamp": str, "frame": DataFrame}
+_history: dict = {}
+
+
+def _num(value) -> str:
+    return f"{float(value):g}"
+
+
+def size_label(product_type, width, length) -> Optional[str]:
+    """"WxL" for carpets, "W m" (roll width) for metraj, None if unknown."""
+    if product_type == ProductType.METER:
+        return f"{_num(width)} m" if width else None
+    if width and length:
+        return f"{_num(width)}x{_num(length)}"
+    return None
+
+
+def _sold(db: Session, start: datetime, end: datetime) -> pd.DataFrame:
+    """Per-(product, size, local day) units and metres sold in [start, end)."""
+    rows = (
+        db.query(Sale.product_id, Sale.date, Sale.quantity, Sale.width, Sale.length, Product.type)
+        .join(Product, Sale.product_id == Product.id)
+        .filter(Sale.date >= start, Sale.date < end, Sale.deleted_at == None)
+        .all()
+    )
+    if not rows:
+        return pd.DataFrame(columns=SOLD_COLUMNS)
+    frame = pd.DataFrame(rows, columns=["product_id", "date", "quantity", "width", "length", "type"])
+    is_meter = frame["type"] == ProductType.METER
+    quantity = frame["quantity"].astype(float)
+    length = frame["length"].astype(float)
+    frame["units"] = quantity.where(~is_meter, 0.0)
+    frame["metres"] = length.fillna(quantity).where(is_meter, 0.0)
+    frame["day"] = frame["date"].map(local_day)
+    frame["size"] = [size_label(*values) or "" for values in zip(frame["type"], frame["width"], frame["length"])]
+    return (
+        frame.groupby(["product_id", "size", "day"], dropna=False)[["units", "metres"]]
+        .sum()
+        .reset_index()
+    )
+
+
+def _history_frame(db: Session, first: date, today: date) -> pd.DataFrame:
+    """Sums of the closed days [first, today), rebuilt only when they changed."""
+    start, end = day_start(first), day_start(today)
+    stamp = version_stamp(db.query(Sale).filter(Sale.date >= start, Sale.date < end), Sale)
+    cached = _history.get("sold")
+    if cached and cached["first"] == first and cached["last"] == today and cached["stamp"] == stamp:
+        return cached["frame"]
+    frame = _sold(db, start, end)
+    _history["sold"] = {"first": first, "last": today, "stamp": stamp, "frame": frame}
+    return frame
+
+
+def _stock(db: Session, branch_id=None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """(current stock per product and size, product attributes)."""
+    products = db.query(
+        Product.id, Product.branch_id, Product.collection, Product.code, Product.type,
+        Product.quantity, Product.remaining_length, Product.total_length, Product.width, Product.created_at,
+    ).filter(Product.deleted_at == None)
+    if branch_id is not None:
+        products = products.filter(Product.branch_id == branch_id)
+    products = pd.DataFrame(products.all(), columns=[
+        "product_id", "branch_id", "collection", "code", "type",
+        "quantity", "remaining_length", "total_length", "width", "created_at",
+    ])
+    attributes = products[["product_id", "branch_id", "collection", "code", "created_at"]]
+    if products.empty:
+        return pd.DataFrame(columns=["product_id", "size", "stock_units", "stock_metres"]), attributes
+
+    is_meter = products["type"] == ProductType.METER
+    metres = products["remaining_length"].astype(float).fillna(products["total_length"].astype(float)).fillna(0.0)
+
+    # Carpets with per-size stock are split by size; the rest stay on the product
+    items = db.query(ProductStockItem.product_id, ProductStockItem.size, ProductStockItem.quantity).filter(
+        ProductStockItem.kind == StockItemKind.SIZE,
+        ProductStockItem.quantity != None,
+        ProductStockItem.product_id.in_(products.loc[~is_meter, "product_id"].tolist()),
+    ).all()
+    sized = pd.DataFrame(items, columns=["product_id", "label", "stock_units"])
+    sized["size"] = [size_label(ProductType.UNIT, *parse_size(label)) or label for label in sized["label"]]
+    sized = sized.groupby(["product_id", "size"], dropna=False)["stock_units"].sum().reset_index()
+    sized["stock_units"] = sized["stock_units"].astype(float)
+    sized["stock_metres"] = 0.0
+
+    whole = pd.DataFrame({
+        "product_id": products["product_id"],
+        "size": [(size_label(ProductType.METER, width, None) if meter else None) or ""
+                 for meter, width in zip(is_meter, products["width"])],
+        "stock_units": products["quantity"].astype(float).where(~is_meter, 0.0),
+        "stock_metres": metres.where(is_meter, 0.0),
+    })
+    whole = whole[~whole["product_id"].isin(sized["product_id"])]
+    return pd.concat([sized, whole], ignore_index=True), attributes
+
+
+def sales_velocity(db: Session, group_by: str = "collection", branch_id=None, dead_only: bool = False) -> tuple[date, list[dict]]:
+    """
+    (as_of, rows) with units and metres sold per window, current stock,
+    days of cover and dead stock, grouped by `group_by` (one of GROUPS).
+    """
+    now = datetime.now(timezone.utc)
+    today = local_day(now)
+    first = today - timedelta(days=max(WINDOWS) - 1)
+    frames = [frame for frame in (_history_frame(db, first, today), _sold(db, day_start(today), now)) if not frame.empty]
+    sold = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SOLD_COLUMNS)
+    age = sold["day"].map(lambda day: (today - day).days)
+    for window in WINDOWS:
+        recent = age < window
+        sold[f"units_{window}"] = sold["units"].where(recent, 0.0).astype(float)
+        sold[f"metres_{window}"] = sold["metres"].where(recent, 0.0).astype(float)
+    sums = [f"{kind}_{window}" for kind in ("units", "metres") for window in WINDOWS]
+    sold = sold.groupby(["product_id", "size"], dropna=False)[sums].sum().reset_index()
+
+    # Sizes sold out (or sold from a product without per-size stock) keep their sales;
+    # products of other branches and deleted ones drop out with the attributes
+    stock, attributes = _stock(db, branch_id)
+    rows = stock.merge(sold, on=["product_id", "size"], how="outer").merge(attributes, on="product_id")
+    rows[sums + ["stock_units", "stock_metres"]] = rows[sums + ["stock_units", "stock_metres"]].astype(float).fillna(0.0)
+
+    longest = max(WINDOWS)
+    per_product = rows.groupby("product_id").agg(
+        sold=(f"units_{longest}", "sum"), sold_metres=(f"metres_{longest}", "sum"),
+        stock_units=("stock_units", "sum"), stock_metres=("stock_metres", "sum"),
+        created_at=("created_at", "first"),
+    )
+    created = pd.to_datetime(per_product["created_at"], utc=True)
+    dead = (
+        (per_product["sold"] + per_product["sold_metres"] == 0)
+        & (per_product["stock_units"] + per_product["stock_metres"] > 0)
+        & (created < pd.Timestamp(now - timedelta(days=longest)))
+    )
+    rows["dead_stock"] = rows["product_id"].map(dead).astype(bool)
+    if dead_only:
+        rows = rows[rows["dead_stock"]]
+    rows["dead_product"] = rows["product_id"].where(rows["dead_stock"])
+
+    keys = {
+        "product": ["product_id", "branch_id", "code", "collection"],
+        "collection": ["collection"],
+        "size": ["size"],
+        "branch": ["branch_id"],
+    }[group_by]
+    grouped = rows.groupby(keys, dropna=False).agg(
+        product_count=("product_id", "nunique"),
+        dead_stock=("dead_product", "nunique"),
+        stock_units=("stock_units", "sum"),
+        stock_metres=("stock_metres", "sum"),
+        **{name: (name, "sum") for name in sums},
+    ).reset_index()
+
+    def cover(stock_value, sold_value):
+        daily = sold_value / COVER_WINDOW
+        return None if daily <= 0 else float(stock_value / daily)
+
+    result = []
+    for row in grouped.to_dict("records"):
+        # numpy scalars to plain Python values
+        row = {key: (None if pd.isna(value) else getattr(value, "item", lambda: value)()) for key, value in row.items()}
+        result.append({
+            **row,
+            "key": str(row[keys[0]] or ""),
+            "size": row.get("size") or None,
+            "cover_days_units": cover(row["stock_units"], row[f"units_{COVER_WINDOW}"]),
+            "cover_days_metres": cover(row["stock_metres"], row[f"metres_{COVER_WINDOW}"]),
+        })
+    result.sort(key=lambda row: (row[f"units_{COVER_WINDOW}"] + row[f"metres_{COVER_WINDOW}"], row["stock_units"] + row["stock_metres"]), reverse=True)
+    return today, result
@@ -0,0 +1,139 @@
+"""
+Benchmark: CPU time to build one 10k-product GET /api/products response.
+
+"before" is the previous path: load ORM objects, run the per-product diagnostic
+loop, validate each through ProductResponse (from_attributes) and encode with
+jsonable_encoder + json.dumps, as FastAPI does for response_model.
+"after" is the current path: column projection, orjson, chunked array stream,
+plus gzip/brotli of the stream.
+
+Runs against a throwaway SQLite file, no server or Postgres needed:
+python benchmark_products_serialization.py [count]
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+DB_FILE = os.path.join(tempfile.gettempdir(), "gilamchi_bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_FILE}")
+for key, value in {
+    "APP_NAME": "bench", "APP_VERSION": "0", "DEBUG": "false", "SECRET_KEY": "bench",
+    "ALGORITHM": "HS256", "ACCESS_TOKEN_EXPIRE_MINUTES": "60", "REFRESH_TOKEN_EXPIRE_DAYS": "1",
+    "CORS_ORIGINS": "*", "TIMEZONE": "Asia/Tashkent",
+}.items():
+    os.environ.setdefault(key, value)
+
+from fastapi.encoders import jsonable_encoder
+from app.database import engine, SessionLocal, Base
+from app.models.branch import Branch
+from app.models.product import Product, ProductCategory, ProductType
+from app.models.stock_item import ProductStockItem, StockItemKind
+from app.schemas.product import ProductResponse
+from app.utils.fast_json import response_columns, stream_json_array
+from app.utils.stock import with_available_sizes
+from sqlalchemy.orm import selectinload
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+ROUNDS = 5
+
+def seed():
+    if os.path.exists(DB_FILE):
+        os.remove(DB_FILE)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    branch = Branch(name="Bench")
+    db.add(branch)
+    db.flush()
+    now = datetime.now(timezone.utc)
+    ids = [uuid.uuid4() for _ in range(COUNT)]
+    db.bulk_insert_mappings(Product, [
+        {
+            "id": product_id, "code": f"A{i:05d}", "category": ProductCategory.GILAMLAR, "collection": "Lara",
+            "type": ProductType.UNIT, "buy_price": Decimal("41.5"), "sell_price": Decimal("55"), "quantity": 12,
+            "photo": f"/uploads/product_{i}.jpg", "image_embedding": os.urandom(2048),
+            "branch_id": branch.id, "created_at": now, "updated_at": now,
+        }
+        for i, product_id in enumerate(ids)
+    ])
+    db.bulk_insert_mappings(ProductStockItem, [
+        {
+            "id": uuid.uuid4(), "product_id": product_id, "kind": StockItemKind.SIZE, "size": size,
+            "width": width, "length": Decimal(length), "quantity": 6, "position": position,
+            "created_at": now, "updated_at": now,
+        }
+        for product_id in ids
+        for position, (size, width, length) in enumerate([("2x3", 2.0, "3"), ("3x4", 3.0, "4")])
+    ])
+    db.commit()
+    db.close()
+
+def before() -> bytes:
+    db = SessionLocal()
+    try:
+        products = (
+            db.query(Product).options(selectinload(Product.stock_items))
+            .filter(Product.deleted_at == None).offset(0).limit(10000).all()
+        )
+        for i, p in enumerate(products):
+            _ = p.id, p.code, p.category, p.type, p.photo[:10] if p.photo else None
+        validated = [ProductResponse.model_validate(p) for p in products]
+        # Same settings as starlette's JSONResponse.render
+        return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode()
+    finally:
+        db.close()
+
+def after() -> bytes:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Product).filter(Product.deleted_at == None)
+            .with_entities(*response_columns(Product, ProductResponse))
+            .offset(0).limit(10000).all()
+        )
+        return b"".join(stream_json_array(with_available_sizes(db, rows)))
+    finally:
+        db.close()
+
+def cpu_ms(fn):
+    best = None
+    for _ in range(ROUNDS):
+        start = time.process_time()
+        result = fn()
+        elapsed = (time.process_time() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    seed()
+    before_ms, before_body = cpu_ms(before)
+    after_ms, after_body = cpu_ms(after)
+    before_rows, after_rows = json.loads(before_body), json.loads(after_body)
+    assert len(before_rows) == len(after_rows) == COUNT
+    assert before_rows[0] == after_rows[0], "fast path must return the same fields and values"
+
+    print(f"{COUNT} products, best of {ROUNDS} (CPU ms)")
+    print(f"  before (ORM + Pydantic + json):   {before_ms:8.1f} ms  {len(before_body) / 1024:8.0f} KiB")
+    print(f"  after  (projection + orjson):     {after_ms:8.1f} ms  {len(after_body) / 1024:8.0f} KiB")
+    print(f"  speedup:                          {before_ms / after_ms:8.1f}x")
+
+    gzip_ms, gzipped = cpu_ms(lambda: zlib.compress(after_body, 6))
+    print(f"  gzip level 6:                     {gzip_ms:8.1f} ms  {len(gzipped) / 1024:8.0f} KiB")
+    if brotli is not None:
+        br_ms, brotlied = cpu_ms(lambda: brotli.compress(after_body, quality=4))
+        print(f"  brotli quality 4:                 {br_ms:8.1f} ms  {len(brotlied) / 1024:8.0f} KiB")
+
+    os.remove(DB_FILE)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Append the sales, payments and expenses changed since the last run to the
+Parquet analytics snapshot (Settings.ANALYTICS_DIR, see app/utils/snapshot.py).
+
+Run it periodically; --full drops the snapshot and exports all history again
+(first run, and after deleting rows by hand).
+
+Run this on the production server with:
+docker compose -f docker-compose.prod.yml exec backend python export_snapshot.py [--full]
+"""
+
+import sys
+
+from app.database import SessionLocal
+from app.utils.snapshot import export_snapshot
+
+def main():
+    full = "--full" in sys.argv[1:]
+    db = SessionLocal()
+    try:
+        written = export_snapshot(db, full=full)
+        print("✓ Exported " + ", ".join(f"{count} {table}" for table, count in written.items()))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
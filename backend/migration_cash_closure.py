@@ -0,0 +1,34 @@
+"""
+Migration script for kassa shift closures.
+
+Creates the cash_closures table and the payments(payment_date) index used by
+GET /api/reports/cash-closure. Fresh databases get both from
+Base.metadata.create_all; this is for existing ones.
+
+Run this on the production server with:
+docker compose -f docker-compose.prod.yml exec backend python migration_cash_closure.py
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    print("ERROR: DATABASE_URL environment variable not set")
+    sys.exit(1)
+
+def main():
+    from app.models.cash_closure import CashClosure
+
+    engine = create_engine(DATABASE_URL)
+    print("→ Creating table cash_closures...")
+    CashClosure.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        print("→ Creating index ix_payments_payment_date on payments(payment_date)...")
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_payments_payment_date ON payments (payment_date)"))
+    engine.dispose()
+    print("✓ Cash closure table and index are in place")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Migration script for the debt aging report.
+
+Creates the debts(branch_id, status, payment_deadline) index used by
+GET /api/reports/debt-aging. Fresh databases get it from
+Base.metadata.create_all; this is for existing ones.
+
+Run this on the production server with:
+docker compose -f docker-compose.prod.yml exec backend python migration_debt_aging.py
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    print("ERROR: DATABASE_URL environment variable not set")
+    sys.exit(1)
+
+def main():
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as conn:
+        print("→ Creating index ix_debts_branch_status_deadline on debts(branch_id, status, payment_deadline)...")
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_debts_branch_status_deadline "
+            "ON debts (branch_id, status, payment_deadline)"
+        ))
+    engine.dispose()
+    print("✓ Debt aging index is in place")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Migration script for keyset (cursor) pagination indexes.
+
+Creates composite indexes matching the ORDER BY used by the cursor mode of
+GET /api/products, /api/sales, /api/debts and /api/expenses.
+Fresh databases get them from Base.metadata.create_all; this is for existing ones.
+
+Run this on the production server with:
+docker compose -f docker-compose.prod.yml exec backend python migration_keyset_indexes.py
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    print("ERROR: DATABASE_URL environment variable not set")
+    sys.exit(1)
+
+INDEXES = [
+    ("ix_products_branch_created_id", "products", "branch_id, created_at, id"),
+    ("ix_sales_date_id", "sales", "date, id"),
+    ("ix_sales_branch_date_id", "sales", "branch_id, date, id"),
+    ("ix_debts_branch_created_id", "debts", "branch_id, created_at, id"),
+    ("ix_expenses_branch_created_id", "expenses", "branch_id, created_at, id"),
+]
+
+def main():
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as conn:
+        for name, table, columns in INDEXES:
+            print(f"→ Creating index {name} on {table}({columns})...")
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+    engine.dispose()
+    print("✓ Keyset pagination indexes are in place")
+
+if __name__ == "__main__":
+    main()
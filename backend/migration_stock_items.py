@@ -0,0 +1,64 @@
+"""
+Migration script for normalized per-size / per-roll stock.
+
+This script:
+1. Creates the product_stock_items table (with its width/length indexes)
+2. Copies every product's available_sizes JSON list into stock item rows
+   (products that already have stock items are skipped, so it can be re-run)
+
+The products.available_sizes column is left in place untouched as a backup;
+the application no longer reads or writes it and it can be dropped later.
+
+Run this on the production server with:
+docker compose -f docker-compose.prod.yml exec backend python migration_stock_items.py
+"""
+
+import json
+import uuid
+from sqlalchemy import inspect, select, text
+from app.database import engine, SessionLocal
+from app.models.product import ProductType
+from app.models.stock_item import ProductStockItem, stock_items_from_sizes
+
+BATCH_SIZE = 500
+
+def main():
+    ProductStockItem.__table__.create(bind=engine, checkfirst=True)
+    print("✓ Table product_stock_items is in place")
+
+    columns = [col["name"] for col in inspect(engine).get_columns("products")]
+    if "available_sizes" not in columns:
+        print("ℹ products.available_sizes does not exist, nothing to copy")
+        return
+
+    db = SessionLocal()
+    try:
+        migrated = set(db.execute(select(ProductStockItem.product_id).distinct()).scalars())
+        rows = db.execute(text(
+            "SELECT id, type, available_sizes FROM products WHERE available_sizes IS NOT NULL"
+        )).all()
+        print(f"Found {len(rows)} products with available_sizes ({len(migrated)} already migrated)")
+
+        copied = 0
+        for product_id, product_type, sizes in rows:
+            product_id = uuid.UUID(str(product_id))
+            if product_id in migrated:
+                continue
+            if isinstance(sizes, str):
+                sizes = json.loads(sizes)
+            # Enum columns store the member name ("METER")
+            is_roll = product_type in (ProductType.METER.name, ProductType.METER.value)
+            for item in stock_items_from_sizes(sizes, is_roll=is_roll):
+                item.product_id = product_id
+                db.add(item)
+            copied += 1
+            if copied % BATCH_SIZE == 0:
+                db.commit()
+                print(f"  {copied} products copied...")
+        db.commit()
+        print(f"✓ Copied stock items for {copied} products")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
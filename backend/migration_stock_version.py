@@ -0,0 +1,43 @@
+"""
+Migration script for optimistic stock updates.
+
+This script adds a version column (default 1) to products and
+product_stock_items. Sales update stock with
+`... WHERE quantity >= :n AND version = :v` and bump the version, instead of
+locking the rows with SELECT ... FOR UPDATE.
+
+Run this on the production server with:
+docker compose -f docker-compose.prod.yml exec backend python migration_stock_version.py
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text, inspect
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    print("ERROR: DATABASE_URL environment variable not set")
+    sys.exit(1)
+
+print(f"Connecting to database...")
+engine = create_engine(DATABASE_URL)
+inspector = inspect(engine)
+
+def add_column_if_missing(table_name: str, column_name: str, column_def: str):
+    """Add a column to a table if it doesn't exist."""
+    columns = [col['name'] for col in inspector.get_columns(table_name)]
+    if column_name in columns:
+        print(f"✓ Column {table_name}.{column_name} already exists, skipping")
+        return
+    print(f"→ Adding column {table_name}.{column_name}...")
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_def}"))
+    print(f"✓ Added column {table_name}.{column_name}")
+
+def main():
+    add_column_if_missing("products", "version", "INTEGER NOT NULL DEFAULT 1")
+    add_column_if_missing("product_stock_items", "version", "INTEGER NOT NULL DEFAULT 1")
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Migration script for the delta sync endpoint (GET /api/sync).
+
+This script:
+1. Adds deleted_at / deleted_by to expenses (expenses are now soft-deleted so
+   sync can return tombstones for them)
+2. Creates updated_at indexes used to find rows changed since a watermark
+
+Run this on the production server with:
+docker compose -f docker-compose.prod.yml exec backend python migration_sync.py
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text, inspect
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    print("ERROR: DATABASE_URL environment variable not set")
+    sys.exit(1)
+
+print(f"Connecting to database...")
+engine = create_engine(DATABASE_URL)
+inspector = inspect(engine)
+
+UPDATED_AT_TABLES = ["products", "sales", "debts", "payments", "expenses", "collections"]
+
+def add_column_if_missing(table_name: str, column_name: str, column_def: str):
+    """Add a column to a table if it doesn't exist."""
+    columns = [col['name'] for col in inspector.get_columns(table_name)]
+    if column_name in columns:
+        print(f"✓ Column {table_name}.{column_name} already exists, skipping")
+        return
+    print(f"→ Adding column {table_name}.{column_name}...")
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_def}"))
+    print(f"✓ Added column {table_name}.{column_name}")
+
+def main():
+    add_column_if_missing("expenses", "deleted_at", "TIMESTAMP WITH TIME ZONE")
+    add_column_if_missing("expenses", "deleted_by", "UUID")
+
+    with engine.begin() as conn:
+        for table in UPDATED_AT_TABLES:
+            print(f"→ Creating index ix_{table}_updated_at...")
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_updated_at ON {table} (updated_at)"))
+    print("✓ Sync indexes are in place")
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
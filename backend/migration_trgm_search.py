@@ -0,0 +1,40 @@
+"""
+Migration script for server-side product search (GET /api/products/search).
+
+This script:
+1. Enables the pg_trgm extension
+2. Creates GIN trigram indexes on products.code and products.collection
+   (prefix, substring and typo-tolerant matching)
+3. Creates a (branch_id, code) btree index for exact code lookups
+
+Run this on the production server with:
+docker compose -f docker-compose.prod.yml exec backend python migration_trgm_search.py
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    print("ERROR: DATABASE_URL environment variable not set")
+    sys.exit(1)
+
+STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_products_code_trgm ON products USING gin (code gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_products_collection_trgm ON products USING gin (collection gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_products_branch_code ON products (branch_id, code)",
+]
+
+def main():
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as conn:
+        for statement in STATEMENTS:
+            print(f"→ {statement}")
+            conn.execute(text(statement))
+    engine.dispose()
+    print("✓ Product search indexes are in place")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Rebuild the daily rollups (daily_rollups) from sales, expenses and payments.
+
+Run once after deploying the rollups to backfill history, and again for the
+affected days after changing those tables by hand. Days are local days in
+Settings.TIMEZONE; without arguments all history is rebuilt.
+
+Run this on the production server with:
+docker compose -f docker-compose.prod.yml exec backend python rebuild_rollups.py [first_day] [last_day]
+e.g. python rebuild_rollups.py 2025-01-01 2025-12-31
+"""
+
+import sys
+from datetime import date
+
+from app.database import SessionLocal, engine
+from app.models.rollup import DailyRollup
+from app.utils.rollups import rebuild
+
+def main():
+    first_day = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    last_day = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    DailyRollup.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        rows = rebuild(db, first_day, last_day)
+        db.commit()
+        print(f"✓ Rebuilt {rows} daily rollups ({first_day or 'start'} .. {last_day or 'now'})")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Randomized property checks for the roll allocator (app/utils/roll_allocator.py).
+
+The allocator does no I/O, so these run without a database:
+
+    cd backend && python -m pytest test_roll_allocator.py
+"""
+import random
+from decimal import Decimal
+
+import pytest
+
+from app.utils.roll_allocator import (
+    BEST_FIT, MIN_WASTE, STRATEGIES, MIN_SELLABLE_OFFCUT, ROLL_EMPTY_LENGTH,
+    Cut, RollInventory,
+)
+
+SEEDS = range(200)
+WIDTHS = (2.0, 3.0, 4.0)
+
+
+class Roll:
+    def __init__(self, id, width, length, position):
+        self.id, self.width, self.length, self.position = id, width, length, position
+
+
+def _length(rng, low, high) -> Decimal:
+    return Decimal(rng.randint(int(low * 100), int(high * 100))) / 100
+
+
+def _rolls(rng) -> list[Roll]:
+    return [
+        Roll(f"r{i}", rng.choice(WIDTHS), _length(rng, 0.1, 30), rng.randint(0, 5))
+        for i in range(rng.randint(0, 15))
+    ]
+
+
+def _cuts(rng) -> list[Cut]:
+    return [Cut(width=rng.choice(WIDTHS), length=_length(rng, 0.1, 12), key=i) for i in range(rng.randint(1, 10))]
+
+
+def _plan(allocations) -> list:
+    return [(a.cut, a.roll_id, a.length_before, a.length_after) for a in allocations]
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_same_inventory_same_plan(seed, strategy):
+    rng = random.Random(seed)
+    rolls, cuts = _rolls(rng), _cuts(rng)
+    shuffled = rolls[:]
+    rng.shuffle(shuffled)
+    first = RollInventory(rolls).allocate_many(cuts, strategy)
+    again = RollInventory(shuffled).allocate_many(cuts, strategy)
+    assert _plan(first) == _plan(again)
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_length_taken_equals_length_cut(seed, strategy):
+    rng = random.Random(seed)
+    rolls, cuts = _rolls(rng), _cuts(rng)
+    inventory = RollInventory(rolls)
+    before = sum(sum(inventory.lengths(width)) for width in WIDTHS)
+    allocations = inventory.allocate_many(cuts, strategy)
+    after = sum(sum(inventory.lengths(width)) for width in WIDTHS)
+
+    cut, used_up = Decimal("0"), Decimal("0")
+    for a in allocations:
+        if a.roll_id is None:
+            continue
+        assert a.length_before - a.length_after == a.cut.length
+        cut += a.cut.length
+        if a.length_after <= ROLL_EMPTY_LENGTH:
+            used_up += a.length_after # dropped from the inventory
+    assert before - after == cut + used_up
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_best_fit_picks_shortest_roll_that_fits(seed):
+    rng = random.Random(seed)
+    inventory = RollInventory(_rolls(rng))
+    for cut in _cuts(rng):
+        fitting = [length for length in inventory.lengths(cut.width) if length >= cut.length]
+        a = inventory.allocate(cut, BEST_FIT)
+        if not fitting:
+            assert a.roll_id is None
+        else:
+            assert a.length_before == min(fitting)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_min_waste_avoids_unsellable_offcuts(seed):
+    rng = random.Random(seed)
+    inventory = RollInventory(_rolls(rng))
+    for cut in _cuts(rng):
+        offcuts = [length - cut.length for length in inventory.lengths(cut.width) if length >= cut.length]
+        a = inventory.allocate(cut, MIN_WASTE)
+        if not offcuts:
+            assert a.roll_id is None
+        elif a.waste > 0:
+            # Only when no roll is used up by the cut or leaves a sellable piece
+            assert not any(offcut <= ROLL_EMPTY_LENGTH or offcut >= MIN_SELLABLE_OFFCUT for offcut in offcuts)
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_allocate_many_keeps_input_order(seed, strategy):
+    rng = random.Random(seed)
+    cuts = _cuts(rng)
+    allocations = RollInventory(_rolls(rng)).allocate_many(cuts, strategy)
+    assert [a.cut for a in allocations] == cuts
@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useState, useEffect } from "react";
 import {
   DollarSign,
   Building2,
@@ -16,6 +16,11 @@ import { useLanguage } from "../../context/LanguageContext";
 import { BottomNav } from "../shared/BottomNav";
 import { DatePickerWithRange } from "../ui/date-range-picker";
 import { DateRange } from "react-day-picker";
+import { reportsService } from "../../../services/api";
+
+// Local calendar day as YYYY-MM-DD, matching the server's daily rollups
+const dayKey = (date: Date) =>
+  `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, "0")}-${String(date.getDate()).padStart(2, "0")}`;
 
 export function AdminDashboard() {
   const [period, setPeriod] = useState<
@@ -23,7 +28,7 @@ export function AdminDashboard() {
   >("today");
   const [dateRange, setDateRange] = useState<DateRange | undefined>();
   const navigate = useNavigate();
-  const { sales, branches, exchangeRate, expenses } = useApp();
+  const { sales, branches, exchangeRate, debts } = useApp();
   const { t } = useLanguage();
 
   // Helper to filter data by period
@@ -67,40 +72,36 @@ export function AdminDashboard() {
         start = today;
     }
 
-    const periodSales = sales.filter((sale) => {
-      const saleDate = new Date(sale.date);
-      return saleDate.getTime() >= start.getTime() && saleDate.getTime() <= end.getTime();
-    });
-
-    const periodExpenses = expenses.filter((e) => {
-      const expDate = new Date(e.date);
-      return expDate.getTime() >= start.getTime() && expDate.getTime() <= end.getTime();
-    });
-
-    return { periodSales, periodExpenses, start, end };
+    return { start, end };
   };
 
-  const { periodSales, periodExpenses, start, end } = getFilteredData();
+  const { start, end } = getFilteredData();
+  const startDay = dayKey(start);
+  const endDay = dayKey(end);
 
-  // Aggregated Kassa calculations across all branches
-  const aggCashSales = periodSales
-    .filter(s => s.paymentType === 'cash')
-    .reduce((sum, s) => sum + s.amount, 0);
+  // Per-day sums kept by the server: a few rows per day instead of every sale.
+  // Refetched when the period changes or new sales / payments arrive.
+  const [rollups, setRollups] = useState<any[]>([]);
+  useEffect(() => {
+    reportsService.daily({ start: startDay, end: endDay })
+      .then(setRollups)
+      .catch((error) => console.error("Failed to load daily totals", error));
+  }, [startDay, endDay, sales, debts]);
 
-  const aggCardTransferSales = periodSales
-    .filter(s => s.paymentType === 'card' || s.paymentType === 'transfer')
-    .reduce((sum, s) => sum + s.amount, 0);
+  // In USD: debt payments are kept in UZS
+  const sumRollups = (branchId: string | null, matches: (r: any) => boolean) =>
+    rollups
+      .filter((r) => (branchId === null || String(r.branchId) === String(branchId)) && matches(r))
+      .reduce((sum, r) => sum + (r.currency === "UZS" ? r.amount / exchangeRate : r.amount), 0);
 
-  // Filter debt payments across all branches
-  const { debts } = useApp();
-  const aggDebtPayments = debts.reduce((total, debt) => {
-    const payments = (debt.paymentHistory || []).filter(p => {
-      const dDate = new Date(p.date);
-      return dDate.getTime() >= start.getTime() && dDate.getTime() <= end.getTime();
-    });
-    return total + payments.reduce((sum, p) => sum + p.amount, 0);
-  }, 0);
+  const isCash = (r: any) => r.kind === "sale" && r.paymentType === "cash";
+  const isCardTransfer = (r: any) => r.kind === "sale" && (r.paymentType === "card" || r.paymentType === "transfer");
+  const isDebtPayment = (r: any) => r.kind === "debt_payment";
 
+  // Aggregated Kassa calculations across all branches
+  const aggCashSales = sumRollups(null, isCash);
+  const aggCardTransferSales = sumRollups(null, isCardTransfer);
+  const aggDebtPayments = sumRollups(null, isDebtPayment);
 
   const formatCurrency = (amount: number, currency: "USD" | "UZS" = "USD") => {
     if (currency === "UZS") {
@@ -215,26 +216,10 @@ export function AdminDashboard() {
           </h3>
           <div className="space-y-4">
             {branches.map((branch, index) => {
-              const branchSales = periodSales.filter(s => String(s.branchId) === String(branch.id));
-
               // Branch Kassa calculations
-              const bCash = branchSales
-                .filter(s => s.paymentType === 'cash')
-                .reduce((sum, s) => sum + s.amount, 0);
-
-              const bCard = branchSales
-                .filter(s => s.paymentType === 'card' || s.paymentType === 'transfer')
-                .reduce((sum, s) => sum + s.amount, 0);
-
-              const bDebtPayments = debts
-                .filter(d => String(d.branchId) === String(branch.id))
-                .reduce((total, debt) => {
-                  const payments = (debt.paymentHistory || []).filter(p => {
-                    const dDate = new Date(p.date);
-                    return dDate.getTime() >= start.getTime() && dDate.getTime() <= end.getTime();
-                  });
-                  return total + payments.reduce((sum, p) => sum + p.amount, 0);
-                }, 0);
+              const bCash = sumRollups(branch.id, isCash);
+              const bCard = sumRollups(branch.id, isCardTransfer);
+              const bDebtPayments = sumRollups(branch.id, isDebtPayment);
 
               const branchTotalKassa = (bCash + bCard + bDebtPayments) * exchangeRate;
 
@@ -24,6 +24,7 @@ import { useApp } from "../../context/AppContext";
 import { useLanguage } from "../../context/LanguageContext";
 import { Badge } from "../ui/badge";
 import { BottomNav } from "../shared/BottomNav";
+import { DebtAging } from "../shared/DebtAging";
 import { toast } from "sonner";
 
 export function AdminDebts() {
@@ -227,6 +228,11 @@ export function AdminDebts() {
           </Card>
         </div>
 
+        <DebtAging
+          branchId={filterBranch === "all" ? undefined : filterBranch}
+          debtPath="/admin/debt"
+        />
+
         {/* Search */}
         <div className="relative">
           <Search className="absolute left-3 top-1/2 -translate-y-1/2 h-5 w-5 text-muted-foreground" />
@@ -5,7 +5,7 @@ import { Card } from "../ui/card";
 import { Badge } from "../ui/badge";
 import { useApp, Sale, Expense, DebtPayment, StaffMember, Product } from "../../context/AppContext";
 import { useLanguage } from "../../context/LanguageContext";
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { cn } from "../ui/utils";
 import {
   PieChart,
@@ -16,6 +16,22 @@ import {
 } from "recharts";
 import { StaffProfitDistribution } from "../shared/StaffProfitDistribution";
 import { StatsDrillDownDialog } from "../shared/StatsDrillDownDialog";
+import { reportsService } from "../../../services/api";
+
+const getPeriodStart = (dateFilter: string) => {
+  const now = new Date();
+  const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
+  if (dateFilter === "week") {
+    const day = today.getDay(); // 0 (Sun) to 6 (Sat)
+    const weekStart = new Date(today);
+    weekStart.setDate(today.getDate() - day + (day === 0 ? -6 : 1));
+    return weekStart;
+  }
+  if (dateFilter === "month") {
+    return new Date(now.getFullYear(), now.getMonth(), 1);
+  }
+  return today;
+};
 
 export function BranchDetail() {
   const { branchId } = useParams();
@@ -26,6 +42,19 @@ export function BranchDetail() {
 
   const [sellerFilter, setSellerFilter] = useState<string>("all");
   const [nasiyaOnlyFilter, setNasiyaOnlyFilter] = useState<boolean>(false);
+  const [pnl, setPnl] = useState<any>(null);
+
+  // Get date filter from URL params
+  const dateFilter = (searchParams.get("filter") || "today") as "today" | "week" | "month";
+
+  // Period totals and the previous period, aggregated on the server;
+  // refetched when sales, expenses or debts change
+  useEffect(() => {
+    if (!branchId) return;
+    reportsService.branchPnl(branchId, { start: getPeriodStart(dateFilter).toISOString() })
+      .then(setPnl)
+      .catch((error) => console.error("Failed to load branch P&L", error));
+  }, [branchId, dateFilter, sales, expenses, debts]);
 
   const branch = branches.find((b) => b.id === branchId);
 
@@ -33,24 +62,9 @@ export function BranchDetail() {
     return <div>{t('messages.branchNotFound')}</div>;
   }
 
-  // Get date filter from URL params
-  const dateFilter = (searchParams.get("filter") || "today") as "today" | "week" | "month";
-
   // Filter sales, expenses, and debts by period and branch
   const getFilteredData = () => {
-    const now = new Date();
-    const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
-
-    let startDate = today;
-    if (dateFilter === "week") {
-      const day = today.getDay(); // 0 (Sun) to 6 (Sat)
-      const diff = today.getDate() - day + (day === 0 ? -6 : 1);
-      startDate = new Date(today);
-      startDate.setDate(diff);
-      startDate.setHours(0, 0, 0, 0);
-    } else if (dateFilter === "month") {
-      startDate = new Date(now.getFullYear(), now.getMonth(), 1);
-    }
+    const startDate = getPeriodStart(dateFilter);
 
     const branchSales = sales.filter(
       (s) => s.branchId === branchId && new Date(s.date) >= startDate
@@ -107,24 +121,31 @@ export function BranchDetail() {
     0,
   );
 
-  const totalAdminProfit = branchSales.reduce(
+  // Server totals once loaded; the loaded rows until then
+  const totalAdminProfit = pnl?.current.adminProfit ?? branchSales.reduce(
     (sum, s) => sum + (s.adminProfit || 0),
     0,
   );
 
-  const totalSellerProfit = branchSales.reduce(
+  const totalSellerProfit = pnl?.current.sellerProfit ?? branchSales.reduce(
     (sum, s) => sum + (s.sellerProfit || 0),
     0,
   );
 
-  const totalBranchExpenses = branchExpenses
+  const totalBranchExpenses = pnl?.current.branchExpenses ?? branchExpenses
     .filter(e => !e.category || e.category === "branch")
     .reduce((sum, e) => sum + e.amount, 0);
 
-  const totalStaffExpenses = branchExpenses
+  const totalStaffExpenses = pnl?.current.staffExpenses ?? branchExpenses
     .filter(e => e.category === "staff")
     .reduce((sum, e) => sum + e.amount, 0);
 
+  const previousPeriod = (value: string, className: string) => pnl && (
+    <div className={cn("mt-1 text-[9px] font-semibold", className)}>
+      {t('admin.previousPeriod')}: {value}
+    </div>
+  );
+
   // Group sales by order_id or (date + sellerId) for grouping multiple carpets sold to same client
   const groupedSales = branchSales.reduce((acc: any[], sale) => {
     const s = sale as any;
@@ -349,6 +370,7 @@ export function BranchDetail() {
                 <div className="text-xl font-bold text-white">
                   {formatCurrency(totalAdminProfit)}
                 </div>
+                {previousPeriod(formatCurrency(pnl?.previous.adminProfit), "text-indigo-100")}
               </Card>
             }
             items={branchSales.map(s => ({ ...s, type: "sale" as const })).filter(s => (s.adminProfit || 0) > 0) as any[]}
@@ -364,6 +386,7 @@ export function BranchDetail() {
                 <div className="text-xl font-bold text-white">
                   {formatCurrency(totalSellerProfit * exchangeRate, "UZS")}
                 </div>
+                {previousPeriod(formatCurrency(pnl?.previous.sellerProfit * exchangeRate, "UZS"), "text-emerald-100")}
               </Card>
             }
             items={branchSales.map(s => ({ ...s, type: "sale" as const })).filter(s => (s.sellerProfit || 0) > 0) as any[]}
@@ -379,6 +402,7 @@ export function BranchDetail() {
                 <div className="text-xl font-bold text-white">
                   {formatCurrency(totalBranchExpenses * exchangeRate, "UZS")}
                 </div>
+                {previousPeriod(formatCurrency(pnl?.previous.branchExpenses * exchangeRate, "UZS"), "text-orange-100")}
               </Card>
             }
             items={branchExpenses.filter(e => !e.category || e.category === "branch").map(e => ({ ...e, type: "expense" as const })) as any[]}
@@ -394,6 +418,7 @@ export function BranchDetail() {
                 <div className="text-xl font-bold text-white">
                   {formatCurrency(totalStaffExpenses * exchangeRate, "UZS")}
                 </div>
+                {previousPeriod(formatCurrency(pnl?.previous.staffExpenses * exchangeRate, "UZS"), "text-rose-100")}
               </Card>
             }
             items={branchExpenses.filter(e => e.category === "staff").map(e => ({ ...e, type: "expense" as const })) as any[]}
@@ -402,11 +427,8 @@ export function BranchDetail() {
         </div>
 
         <StaffProfitDistribution
-          staffMembers={staffMembers}
           branchId={branchId || ""}
-          totalSellerProfit={totalSellerProfit * exchangeRate}
-          totalBranchExpenses={totalBranchExpenses * exchangeRate}
-          branchExpenses={branchExpenses}
+          start={startDate}
         />
 
 
@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useState, useEffect } from 'react';
 import { ArrowLeft, DollarSign, AlertCircle } from 'lucide-react';
 import { useNavigate, useParams } from 'react-router-dom';
 import { Button } from '../ui/button';
@@ -9,6 +9,7 @@ import { Badge } from '../ui/badge';
 import { useApp } from '../../context/AppContext';
 import { useLanguage } from '../../context/LanguageContext';
 import { toast } from 'sonner';
+import { reportsService } from '../../../services/api';
 
 export function CashClosure() {
   const { branchId } = useParams();
@@ -17,11 +18,18 @@ export function CashClosure() {
   const { t } = useLanguage();
 
   const branch = branches.find((b) => b.id === branchId);
-  const branchSales = sales.filter((s) => s.branchId === branchId);
 
-  const expectedCash = branchSales
-    .filter((s) => s.paymentType === 'cash')
-    .reduce((sum, s) => sum + s.amount, 0);
+  // Open shift totals from the server: opening balance + cash sales + debt
+  // payments - expenses since the branch's last closure
+  const [shift, setShift] = useState<any>(null);
+  useEffect(() => {
+    if (!branchId) return;
+    reportsService.cashClosure(branchId)
+      .then(setShift)
+      .catch((error) => console.error('Failed to load cash closure', error));
+  }, [branchId, sales]);
+
+  const expectedCash = shift?.expectedCash || 0;
 
   const [receivedCash, setReceivedCash] = useState('');
   const [isClosed, setIsClosed] = useState(false);
@@ -32,12 +40,22 @@ export function CashClosure() {
 
   const difference = parseFloat(receivedCash || '0') - expectedCash;
 
-  const handleClose = () => {
+  const handleClose = async () => {
     if (!receivedCash) {
       toast.error(t('messages.enterCashReceived'));
       return;
     }
 
+    try {
+      // The server freezes the shift's totals; later reports read the snapshot
+      setShift(await reportsService.closeCashShift({
+        branchId: branchId!,
+        countedCash: parseFloat(receivedCash),
+      }));
+    } catch (error: any) {
+      toast.error(error.response?.data?.detail || t('messages.error'));
+      return;
+    }
     setIsClosed(true);
     toast.success(t('messages.cashClosureCompleted'));
 
@@ -11,6 +11,7 @@ import {
   Calendar,
   X,
   ChevronRight,
+  Download,
 } from "lucide-react";
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
@@ -24,6 +25,7 @@ import {
 } from "recharts";
 import { DatePickerWithRange } from "../ui/date-range-picker";
 import { DateRange } from "react-day-picker";
+import { reportsService } from "../../../services/api";
 
 type DateFilter = "today" | "week" | "month" | "custom";
 
@@ -34,6 +36,14 @@ export function Hisob() {
   const [dateFilter, setDateFilter] =
     useState<DateFilter>("today");
   const [dateRange, setDateRange] = useState<DateRange | undefined>();
+  const [warehouse, setWarehouse] = useState<any>(null);
+
+  // Stock valuation is aggregated on the server; refetch when stock changes
+  useEffect(() => {
+    reportsService.warehouse()
+      .then(setWarehouse)
+      .catch((error) => console.error("Failed to load warehouse report", error));
+  }, [products]);
 
   // Periodic refresh for live updates
   useEffect(() => {
@@ -98,69 +108,12 @@ export function Hisob() {
 
   const filteredSales = getFilteredSales();
 
-  // Conservative Profit Calculation Logic (Cost-First Recognition)
-  // Logic: Profit is only recognized AFTER the total purchase cost of the items in an order is covered by payments.
-
-  // 1. Group all data by Order
-  const getConservativeProfit = (targetSales = sales, targetDebts = debts) => {
-    // We need ALL sales and ALL debts to calculate cumulative flow, even if filtering for a small period
-    const orderData = new Map<string, {
-      totalCost: number;
-      potentialProfit: number;
-      payments: { amount: number; date: Date }[];
-    }>();
-
-    // Group Sales by Order to find Cost and Potential Profit
-    targetSales.forEach(sale => {
-      const orderId = sale.orderId || sale.id;
-      if (!orderData.has(orderId)) {
-        orderData.set(orderId, { totalCost: 0, potentialProfit: 0, payments: [] });
-      }
-      const data = orderData.get(orderId)!;
-
-      const product = products.find(p => p.id === sale.productId);
-      if (product) {
-        let cost = 0;
-        if (sale.type === "meter" || product.type === "meter") {
-          cost = (product.buyPrice || 0) * (sale.length || sale.quantity || 0);
-        } else {
-          cost = (product.buyPrice || 0) * (sale.quantity || 1);
-        }
-        data.totalCost += cost;
-        data.potentialProfit += sale.adminProfit || 0;
-      }
-
-      // If it's NOT a Nasiya sale, the payment happens immediately
-      if (!sale.isNasiya) {
-        data.payments.push({ amount: sale.amount, date: new Date(sale.date) });
-      }
-    });
-
-    // Add Debt Initial Payments and Payment History
-    targetDebts.forEach(debt => {
-      const orderId = debt.orderId;
-      if (!orderId || !orderData.has(orderId)) return;
-      const data = orderData.get(orderId)!;
-
-      // Initial Payment
-      if (debt.initialPayment > 0) {
-        data.payments.push({ amount: debt.initialPayment, date: new Date(debt.date) });
-      }
-
-      // Subsequent Payments
-      debt.paymentHistory?.forEach(p => {
-        data.payments.push({ amount: p.amount, date: new Date(p.date) });
-      });
-    });
-
-    // Calculate profit recognized within the filtered range
-    let totalRecognizedProfit = 0;
-
-    // Filter boundaries
+  // Boundaries of the selected period, in local time
+  const getPeriod = () => {
     const now = new Date();
     const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
-    let filterStart = new Date(0); // Default to beginning of time
-    let filterEnd = new Date(today.getTime() + 86400000); // Default to end of today
+    let filterStart: Date | undefined; // Default to beginning of time
+    let filterEnd: Date | undefined; // Default to now
 
     if (dateFilter === "week") {
       const day = today.getDay();
@@ -178,60 +131,26 @@ export function Hisob() {
     } else if (dateFilter === "today") {
       filterStart = today;
     }
-
-    orderData.forEach(data => {
-      // Sort payments by date to calculate cumulative flow
-      const sortedPayments = [...data.payments].sort((a, b) => a.date.getTime() - b.date.getTime());
-
-      let cumulativePaidPrior = 0;
-      let cumulativePaidAfter = 0;
-
-      sortedPayments.forEach(p => {
-        if (p.date < filterStart) {
-          cumulativePaidPrior += p.amount;
-        }
-        if (p.date <= filterEnd) {
-          cumulativePaidAfter += p.amount;
-        }
-      });
-
-      // Recognized Profit = max(0, totalPaid - totalCost), capped at potentialProfit
-      const recognizedPrior = Math.min(data.potentialProfit, Math.max(0, cumulativePaidPrior - data.totalCost));
-      const recognizedAfter = Math.min(data.potentialProfit, Math.max(0, cumulativePaidAfter - data.totalCost));
-
-      totalRecognizedProfit += (recognizedAfter - recognizedPrior);
-    });
-
-    return totalRecognizedProfit;
+    return { start: filterStart, end: filterEnd };
   };
 
-  const totalDirectorProfit = getConservativeProfit();
+  // Conservative (cost-first) profit: an order's profit only counts once its
+  // payments cover the purchase cost. Computed per order on the server from
+  // the whole sales and payment history; refetched when either changes.
+  const [recognized, setRecognized] = useState<any>(null);
+  useEffect(() => {
+    reportsService.recognizedProfit(getPeriod())
+      .then(setRecognized)
+      .catch((error) => console.error("Failed to load recognized profit", error));
+  }, [dateFilter, dateRange, sales, debts]);
+
+  const totalDirectorProfit = recognized?.recognizedProfit || 0;
 
   // 1. Total Stock Value (Buy Price) - Current value in warehouse
-  const totalStockValue = products.reduce((sum, p) => {
-    if (p.type === "meter") {
-      return sum + (p.buyPrice || 0) * (p.remainingLength || 0);
-    } else {
-      const qty = p.availableSizes
-        ? p.availableSizes.reduce((s: number, sz: any) => s + (sz.quantity || 0), 0)
-        : (p.quantity || 0);
-      return sum + (p.buyPrice || 0) * qty;
-    }
-  }, 0);
+  const totalStockValue = warehouse?.totals.stockValue || 0;
 
   // 2. Total Potential Profit (Markup if all sold)
-  const totalPotentialProfit = products.reduce((sum, p) => {
-    if (p.type === "meter") {
-      const margin = (p.sellPricePerMeter || 0) - (p.buyPrice || 0);
-      return sum + margin * (p.remainingLength || 0);
-    } else {
-      const margin = (p.sellPrice || 0) - (p.buyPrice || 0);
-      const qty = p.availableSizes
-        ? p.availableSizes.reduce((s: number, sz: any) => s + (sz.quantity || 0), 0)
-        : (p.quantity || 0);
-      return sum + margin * qty;
-    }
-  }, 0);
+  const totalPotentialProfit = warehouse?.totals.potentialProfit || 0;
 
   // 3. Sold Stock Cost (Buy Price of items sold in period)
   const soldStockCost = filteredSales.reduce((sum, sale) => {
@@ -248,28 +167,12 @@ export function Hisob() {
 
   // Profit breakdown by branch (using the same conservative logic)
   const branchProfits = branches.map((branch) => {
-    const branchSales = sales.filter(s => s.branchId === branch.id);
-    const branchDebts = debts.filter(d => d.branchId === branch.id);
-
-    // We pass filtered sets to calculate branch-specific recognized profit
-    const profit = getConservativeProfit(branchSales, branchDebts);
+    const profit = recognized?.branches.find((b: any) => b.branchId === branch.id)?.recognizedProfit || 0;
 
     // For specific UI cards, we still count sales in period
     const salesInPeriod = filteredSales.filter(s => s.branchId === branch.id);
 
-    // Calculate branch stock
-    const branchStockValue = products
-      .filter((p) => p.branchId === branch.id)
-      .reduce((sum, p) => {
-        if (p.type === "meter") {
-          return sum + (p.buyPrice || 0) * (p.remainingLength || 0);
-        } else {
-          const qty = p.availableSizes
-            ? p.availableSizes.reduce((s: number, sz: any) => s + (sz.quantity || 0), 0)
-            : (p.quantity || 0);
-          return sum + (p.buyPrice || 0) * qty;
-        }
-      }, 0);
+    const branchStockValue = warehouse?.branches.find((b: any) => b.branchId === branch.id)?.stockValue || 0;
 
     return {
       branchId: branch.id,
@@ -289,6 +192,20 @@ export function Hisob() {
     color: ["#3b82f6", "#22c55e", "#f59e0b"][index % 3], // blue, green, orange
   }));
 
+  // Spreadsheets of the selected period (stock is always current)
+  const exports = [
+    { kind: "sales", label: "admin.exportSales" },
+    { kind: "debts", label: "admin.exportDebts" },
+    { kind: "expenses", label: "admin.exportExpenses" },
+    { kind: "stock", label: "admin.exportStock" },
+  ] as const;
+
+  // The file is sent as an attachment, so the browser downloads it and stays on the page
+  const downloadExport = (kind: typeof exports[number]["kind"], format: "csv" | "xlsx") =>
+    reportsService.exportUrl(kind, { format, ...getPeriod() })
+      .then((url) => { window.location.href = url; })
+      .catch((error) => console.error("Failed to start export", error));
+
   const formatCurrency = (amount: number, currency: "USD" | "UZS" = "USD") => {
     if (currency === "UZS") {
       return new Intl.NumberFormat("uz-UZ", {
@@ -483,6 +400,28 @@ export function Hisob() {
           </div>
         </div>
 
+        {/* Spreadsheet export */}
+        <div>
+          <h3 className="text-sm font-bold text-muted-foreground mb-4 px-1 tracking-wider uppercase">
+            {t('admin.export')}
+          </h3>
+          <Card className="p-4 border border-border bg-card divide-y divide-border">
+            {exports.map(({ kind, label }) => (
+              <div key={kind} className="flex items-center justify-between py-2">
+                <span className="text-sm text-card-foreground">{t(label)}</span>
+                <div className="flex gap-2">
+                  {(["xlsx", "csv"] as const).map((format) => (
+                    <Button key={format} variant="outline" size="sm" onClick={() => downloadExport(kind, format)}>
+                      <Download className="h-4 w-4 mr-1" />
+                      {format.toUpperCase()}
+                    </Button>
+                  ))}
+                </div>
+              </div>
+            ))}
+          </Card>
+        </div>
+
       </div>
 
 
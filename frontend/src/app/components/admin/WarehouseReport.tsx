@@ -8,7 +8,7 @@ import { useLanguage } from "../../context/LanguageContext";
 import { Tabs, TabsList, TabsTrigger } from "../ui/tabs";
 import { Badge } from "../ui/badge";
 import { Progress } from "../ui/progress";
-import { getImageUrl } from "../../../services/api";
+import { getImageUrl, reportsService } from "../../../services/api";
 
 export default function WarehouseReport() {
     const navigate = useNavigate();
@@ -18,6 +18,31 @@ export default function WarehouseReport() {
     // States
     const [selectedBranchId, setSelectedBranchId] = useState<string>(branches[0]?.id || "");
     const [selectedCollection, setSelectedCollection] = useState<string | null>(null);
+    const [report, setReport] = useState<any>(null);
+    const [collectionVelocity, setCollectionVelocity] = useState<any[]>([]);
+    const [productVelocity, setProductVelocity] = useState<any[]>([]);
+
+    // Totals come from the server; refetch when stock changes (cheap 304 otherwise)
+    useEffect(() => {
+        reportsService.warehouse()
+            .then(setReport)
+            .catch((error) => console.error("Failed to load warehouse report", error));
+    }, [products]);
+
+    // Sales speed per collection of the branch, and per product once a collection is opened
+    useEffect(() => {
+        if (!selectedBranchId) return;
+        reportsService.salesVelocity({ groupBy: "collection", branchId: selectedBranchId })
+            .then(setCollectionVelocity)
+            .catch((error) => console.error("Failed to load sales velocity", error));
+    }, [selectedBranchId, products]);
+
+    useEffect(() => {
+        if (!selectedBranchId || !selectedCollection) return;
+        reportsService.salesVelocity({ groupBy: "product", branchId: selectedBranchId })
+            .then(setProductVelocity)
+            .catch((error) => console.error("Failed to load sales velocity", error));
+    }, [selectedBranchId, selectedCollection, products]);
 
     useEffect(() => {
         if (!selectedBranchId && branches.length > 0) {
@@ -66,82 +91,33 @@ export default function WarehouseReport() {
     // Calculate data for current view
     const branchProducts = products.filter((p) => p.branchId === selectedBranchId);
 
-    const branchStockValue = branchProducts.reduce((sum, p) => {
-        if (p.type === "meter") {
-            return sum + (p.buyPrice || 0) * (p.remainingLength || 0);
-        } else {
-            const qty = p.availableSizes
-                ? p.availableSizes.reduce((s: number, sz: any) => s + (sz.quantity || 0), 0)
-                : (p.quantity || 0);
-            return sum + (p.buyPrice || 0) * qty;
-        }
-    }, 0);
-
-    const collectionBreakdown = branchProducts.reduce((acc, p) => {
-        const collName = p.collection || t('seller.withoutCollection');
-        let stockValue = 0;
-        let potentialProfit = 0;
+    const branchReport = report?.branches.find((b: any) => b.branchId === selectedBranchId);
+    const branchStockValue = branchReport?.stockValue || 0;
+    const branchPotentialProfit = branchReport?.potentialProfit || 0;
 
-        if (p.type === "meter") {
-            const qty = p.remainingLength || 0;
-            stockValue = (p.buyPrice || 0) * qty;
-            const margin = (p.sellPricePerMeter || 0) - (p.buyPrice || 0);
-            potentialProfit = margin * qty;
-        } else {
-            const qty = p.availableSizes
-                ? p.availableSizes.reduce((s: number, sz: any) => s + (sz.quantity || 0), 0)
-                : (p.quantity || 0);
-            stockValue = (p.buyPrice || 0) * qty;
-            const margin = (p.sellPrice || 0) - (p.buyPrice || 0);
-            potentialProfit = margin * qty;
-        }
+    const collections = (branchReport?.collections || []).map((c: any) => ({
+        name: c.name || t('seller.withoutCollection'),
+        stockValue: c.stockValue,
+        potentialProfit: c.potentialProfit,
+        velocity: collectionVelocity.find((v) => (v.collection || null) === (c.name || null)),
+    }));
 
-        if (!acc[collName]) {
-            acc[collName] = { stockValue: 0, potentialProfit: 0 };
-        }
-        acc[collName].stockValue += stockValue;
-        acc[collName].potentialProfit += potentialProfit;
-        return acc;
-    }, {} as Record<string, { stockValue: number; potentialProfit: number }>);
+    const formatSold = (v: any) => [
+        v.units30 ? `${v.units30} ${t('product.unit')}` : null,
+        v.metres30 ? `${Number(v.metres30.toFixed(1))} ${t('common.meter_short')}` : null,
+    ].filter(Boolean).join(" · ") || "0";
 
-    const collections = Object.entries(collectionBreakdown)
-        .map(([name, stats]) => ({ name, ...stats }))
-        .sort((a, b) => b.stockValue - a.stockValue);
+    const coverDays = (v: any) => {
+        const days = v.coverDaysUnits ?? v.coverDaysMetres;
+        return days == null ? null : t('admin.coverDays').replace('{days}', String(Math.round(days)));
+    };
 
     // Products for specific collection
     const filteredProducts = selectedCollection
         ? branchProducts.filter(p => (p.collection || t('seller.withoutCollection')) === selectedCollection)
         : [];
 
-    const totalStockValue = branches.reduce((sum, branch) => {
-        const bp = products.filter(p => p.branchId === branch.id);
-        return sum + bp.reduce((s, p) => {
-            if (p.type === "meter") {
-                return s + (p.buyPrice || 0) * (p.remainingLength || 0);
-            } else {
-                const qty = p.availableSizes
-                    ? p.availableSizes.reduce((sz_sum: number, sz: any) => sz_sum + (sz.quantity || 0), 0)
-                    : (p.quantity || 0);
-                return s + (p.buyPrice || 0) * qty;
-            }
-        }, 0);
-    }, 0);
-
-    const branchPotentialProfit = branchProducts.reduce((sum, p) => {
-        let potentialProfit = 0;
-        if (p.type === "meter") {
-            const qty = p.remainingLength || 0;
-            const margin = (p.sellPricePerMeter || 0) - (p.buyPrice || 0);
-            potentialProfit = margin * qty;
-        } else {
-            const qty = p.availableSizes
-                ? p.availableSizes.reduce((s: number, sz: any) => s + (sz.quantity || 0), 0)
-                : (p.quantity || 0);
-            const margin = (p.sellPrice || 0) - (p.buyPrice || 0);
-            potentialProfit = margin * qty;
-        }
-        return sum + potentialProfit;
-    }, 0);
+    const totalStockValue = report?.totals.stockValue || 0;
 
     return (
         <div className="min-h-screen bg-background pb-28">
@@ -230,6 +206,17 @@ export default function WarehouseReport() {
                                                 <h3 className="text-lg font-bold text-card-foreground">
                                                     {col.name}
                                                 </h3>
+                                                {col.velocity && (
+                                                    <div className="text-[10px] text-muted-foreground mt-1 space-x-2">
+                                                        <span>{t('admin.sold30')}: {formatSold(col.velocity)}</span>
+                                                        {coverDays(col.velocity) && <span>{coverDays(col.velocity)}</span>}
+                                                        {col.velocity.deadStock > 0 && (
+                                                            <span className="text-red-600 dark:text-red-400 font-bold">
+                                                                {t('admin.deadStockCount').replace('{count}', String(col.velocity.deadStock))}
+                                                            </span>
+                                                        )}
+                                                    </div>
+                                                )}
                                             </div>
                                             <div className="text-right flex flex-col items-end">
                                                 <div className="text-lg font-black text-indigo-600 dark:text-indigo-400 leading-none">
@@ -249,6 +236,7 @@ export default function WarehouseReport() {
                     // PRODUCT LIST VIEW (Drill-down Style matched with Inventory.tsx)
                     <div className="grid grid-cols-2 gap-3 pb-8 animate-in fade-in slide-in-from-right-4 duration-300">
                         {filteredProducts.map((product) => {
+                            const velocity = productVelocity.find((v) => v.productId === product.id);
                             let stockPercentage = 0;
                             let currentStock = 0;
                             let maxStock = 1;
@@ -316,6 +304,19 @@ export default function WarehouseReport() {
                                                         style={{ width: `${stockPercentage}%` }}
                                                     />
                                                 </div>
+                                                {velocity && (
+                                                    <div className="flex items-center justify-between text-[10px]">
+                                                        <span className="text-muted-foreground">{t('admin.sold30')}:</span>
+                                                        <span className="font-bold text-foreground">{formatSold(velocity)}</span>
+                                                    </div>
+                                                )}
+                                                {velocity?.deadStock > 0 ? (
+                                                    <Badge variant="secondary" className="bg-red-50 text-red-700 dark:bg-red-900/30 dark:text-red-300 border-0 text-[9px] px-1.5 py-0 h-4">
+                                                        {t('admin.deadStock')}
+                                                    </Badge>
+                                                ) : velocity && coverDays(velocity) && (
+                                                    <div className="text-[9px] text-muted-foreground">{coverDays(velocity)}</div>
+                                                )}
                                             </div>
                                         </div>
 
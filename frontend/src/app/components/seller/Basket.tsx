@@ -52,7 +52,9 @@ export function Basket() {
   ) => {
     const quantity = parseFloat(newQuantity) || 0;
     if (quantity > 0) {
-      updateBasketItem(id, quantity, pricePerUnit);
+      updateBasketItem(id, quantity, pricePerUnit).catch((error: any) =>
+        toast.error(error.response?.data?.detail || t('messages.error')),
+      );
     }
   };
 
@@ -204,11 +206,15 @@ export function Basket() {
         <EditBasketItemModal
           item={editingItem}
           product={products.find((p) => p.id === editingItem.productId)!}
-          onUpdate={(updatedItem) => {
-            updateBasketItemFull(updatedItem);
-            toast.success(t('messages.itemUpdated'), {
-              duration: 1000,
-            });
+          onUpdate={async (updatedItem) => {
+            try {
+              await updateBasketItemFull(updatedItem);
+              toast.success(t('messages.itemUpdated'), {
+                duration: 1000,
+              });
+            } catch (error: any) {
+              toast.error(error.response?.data?.detail || t('messages.error'));
+            }
             setEditingItem(null);
           }}
           onClose={() => setEditingItem(null)}
@@ -21,7 +21,7 @@ interface LocationState {
 export function CreateDebt() {
   const navigate = useNavigate();
   const location = useLocation();
-  const { addDebt, user, clearBasket, completeOrder, exchangeRate } = useApp();
+  const { user, clearBasket, completeOrder, exchangeRate } = useApp();
   const { t } = useLanguage();
 
   const state = location.state as LocationState | null;
@@ -96,51 +96,47 @@ export function CreateDebt() {
     const remainingUZS = parseFormattedNumber(customRemainingAmount);
     // The user said "можно сохранять в базе данных в сумах" -> "can save in DB in Soms".
     // So backend expects Soms now.
-    // All amounts sent to completeOrder and for debt creation should be in UZS.
+    // The debt is stored in UZS; order payments are sent in USD below.
 
     if (remainingUZS <= 0) {
       toast.error(t('messages.debtMustBePositive'));
       return;
     }
 
-    // Complete order first to record sales and reduce stock
+    // Sales, stock and the debt are saved in one request. Payments are in USD,
+    // the debt itself is stored in UZS.
     const payments: Payment[] = [];
-    const paidAmountUZS = paidAmount * exchangeRate;
-    if (paidAmountUZS > 0) {
+    if (paidAmount > 0) {
       // For simplicity, we assume paid amount is cash if not specified.
       // In a real scenario, we might want to know if it was card/transfer.
-      payments.push({ type: "cash", amount: paidAmountUZS });
+      payments.push({ type: "cash", amount: paidAmount });
     }
 
     // Add debt payment type for the remaining amount
-    payments.push({ type: "debt", amount: remainingUZS });
+    payments.push({ type: "debt", amount: remainingUZS / exchangeRate });
 
-    // Call completeOrder which returns orderId
-    setIsSaving(true);
-    completeOrder(payments, totalAmount, isNasiya).then((orderId: string) => {
-      // Create debt linked to orderId with UZS amounts
-      const debt: Debt = {
-        id: `d${Date.now()}`,
-        debtorName: debtorName.trim(),
-        phoneNumber: phoneNumber.trim(),
-        orderDetails: orderDetails.trim(),
-        totalAmount: totalAmount * exchangeRate, // Convert to UZS
-        paidAmount: paidAmount * exchangeRate, // Convert to UZS
-        initialPayment: paidAmount * exchangeRate, // Convert to UZS
-        remainingAmount: remainingUZS, // Already in UZS
-        paymentDeadline: new Date(paymentDeadline).toISOString(),
-        exchangeRate: exchangeRate,
-        branchId: user.branchId || "",
-        sellerId: user.id,
-        sellerName: user.name,
-        date: new Date().toISOString(),
-        status: "pending",
-        orderItems: basketItems,
-        orderId: orderId, // Link to the order
-        paymentHistory: []
-      };
+    const debt: Debt = {
+      id: `d${Date.now()}`,
+      debtorName: debtorName.trim(),
+      phoneNumber: phoneNumber.trim(),
+      orderDetails: orderDetails.trim(),
+      totalAmount: totalAmount * exchangeRate, // Convert to UZS
+      paidAmount: paidAmount * exchangeRate, // Convert to UZS
+      initialPayment: paidAmount * exchangeRate, // Convert to UZS
+      remainingAmount: remainingUZS, // Already in UZS
+      paymentDeadline: new Date(paymentDeadline).toISOString(),
+      exchangeRate: exchangeRate,
+      branchId: user.branchId || "",
+      sellerId: user.id,
+      sellerName: user.name,
+      date: new Date().toISOString(),
+      status: "pending",
+      orderItems: basketItems,
+      paymentHistory: []
+    };
 
-      addDebt(debt);
+    setIsSaving(true);
+    completeOrder(payments, paidAmount + remainingUZS / exchangeRate, isNasiya, debt).then(() => {
       clearBasket();
       toast.success(t('messages.saveSuccess'));
       navigate("/seller/home");
@@ -14,6 +14,7 @@ import { Input } from "../ui/input";
 import { useApp } from "../../context/AppContext";
 import { useLanguage } from "../../context/LanguageContext";
 import { Badge } from "../ui/badge";
+import { DebtAging } from "../shared/DebtAging";
 
 export function Debts() {
   const navigate = useNavigate();
@@ -169,6 +170,8 @@ export function Debts() {
           </Card>
         </div>
 
+        <DebtAging debtPath="/seller/debt" />
+
         {/* Search */}
         <div className="relative">
           <Search className="absolute left-3 top-1/2 -translate-y-1/2 h-5 w-5 text-gray-400" />
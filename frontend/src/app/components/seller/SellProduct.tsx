@@ -160,7 +160,7 @@ export function SellProduct() {
     setSelectedProduct(product);
   };
 
-  const handleAddToBasketConfirm = (quantity: number) => {
+  const handleAddToBasketConfirm = async (quantity: number) => {
     if (!selectedProduct) return;
 
     // Construct the basket item correctly
@@ -173,8 +173,12 @@ export function SellProduct() {
         : (selectedProduct.sellPricePerMeter || 0) * quantity
     };
 
-    addToBasket(item);
-    toast.success(t('messages.addedToBasket'));
+    try {
+      await addToBasket(item);
+      toast.success(t('messages.addedToBasket'));
+    } catch (error: any) {
+      toast.error(error.response?.data?.detail || t('messages.error'));
+    }
     setSelectedProduct(null);
   };
 
@@ -458,11 +462,15 @@ export function SellProduct() {
       {selectedProduct && (
         <AddToBasketModal
           product={selectedProduct}
-          onAdd={(item) => {
-            addToBasket(item);
-            toast.success(t('messages.addedToBasket'), {
-              duration: 1000,
-            });
+          onAdd={async (item) => {
+            try {
+              await addToBasket(item);
+              toast.success(t('messages.addedToBasket'), {
+                duration: 1000,
+              });
+            } catch (error: any) {
+              toast.error(error.response?.data?.detail || t('messages.error'));
+            }
           }}
           onClose={() => setSelectedProduct(null)}
         />
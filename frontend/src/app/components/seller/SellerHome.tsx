@@ -78,6 +78,31 @@ export function SellerHome() {
 
   const userBranch = branches.find((b) => b.id === user?.branchId);
 
+  // [start, end] of the selected period (end open = up to now)
+  const getPeriodBounds = (): { start: Date; end?: Date } => {
+    const now = new Date();
+    const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
+    switch (filterType) {
+      case "week": {
+        const weekStart = new Date(today);
+        const day = today.getDay();
+        weekStart.setDate(today.getDate() - day + (day === 0 ? -6 : 1));
+        return { start: weekStart };
+      }
+      case "month":
+        return { start: new Date(now.getFullYear(), now.getMonth(), 1) };
+      case "custom": {
+        if (!dateRange?.from) return { start: new Date(0) };
+        const start = startOfDay(dateRange.from);
+        const end = dateRange.to ? new Date(dateRange.to) : new Date(start);
+        end.setHours(23, 59, 59, 999);
+        return { start, end };
+      }
+      default:
+        return { start: today };
+    }
+  };
+
   // Filter based on period and branch
   const getFilteredData = () => {
     const now = new Date();
@@ -360,11 +385,8 @@ export function SellerHome() {
                   <DialogTitle>{t('admin.profitDistribution')}</DialogTitle>
                 </DialogHeader>
                 <StaffProfitDistribution
-                  staffMembers={staffMembers}
                   branchId={userBranch?.id || ""}
-                  totalSellerProfit={totalBranchProfit * exchangeRate}
-                  totalBranchExpenses={totalPeriodExpenses * exchangeRate}
-                  branchExpenses={filteredExpenses}
+                  {...getPeriodBounds()}
                 />
               </DialogContent>
             </Dialog>
@@ -0,0 +1,157 @@
+import { useEffect, useRef, useState } from "react";
+import { useNavigate } from "react-router-dom";
+import { ChevronDown, ChevronUp } from "lucide-react";
+import { Card } from "../ui/card";
+import { Button } from "../ui/button";
+import { cn } from "../ui/utils";
+import { useApp } from "../../context/AppContext";
+import { useLanguage } from "../../context/LanguageContext";
+import { reportsService } from "../../../services/api";
+
+const BUCKETS = [
+    { key: "current", label: "debt.agingCurrent", color: "text-emerald-600 dark:text-emerald-400" },
+    { key: "days_1_30", label: "debt.aging1to30", color: "text-amber-600 dark:text-amber-400" },
+    { key: "days_31_60", label: "debt.aging31to60", color: "text-orange-600 dark:text-orange-400" },
+    { key: "days_60_plus", label: "debt.aging60plus", color: "text-red-600 dark:text-red-400" },
+] as const;
+
+interface DebtAgingProps {
+    branchId?: string; // all branches when omitted (admin)
+    debtPath: string; // detail route prefix, e.g. "/admin/debt"
+    className?: string;
+}
+
+export function DebtAging({ branchId, debtPath, className }: DebtAgingProps) {
+    const navigate = useNavigate();
+    const { debts } = useApp();
+    const { t } = useLanguage();
+    const [report, setReport] = useState<any>(null);
+    const [openBucket, setOpenBucket] = useState<string | null>(null);
+    const [bucketDebts, setBucketDebts] = useState<any[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | undefined>();
+    const requested = useRef<string | null>(null);
+
+    // Buckets, collections and weekly forecast are aggregated on the server;
+    // refetched when debts or payments change
+    useEffect(() => {
+        reportsService.debtAging({ branchId })
+            .then(setReport)
+            .catch((error) => console.error("Failed to load debt aging", error));
+    }, [branchId, debts]);
+
+    // The debts of a bucket are only fetched when it is opened, a page at a time
+    const loadPage = async (bucket: string, cursor?: string) => {
+        requested.current = bucket;
+        try {
+            const page = await reportsService.debtAgingPage({ bucket, branchId, cursor });
+            if (requested.current !== bucket) return; // another bucket was opened meanwhile
+            setBucketDebts((prev) => (cursor ? [...prev, ...page.debts] : page.debts));
+            setNextCursor(page.nextCursor);
+        } catch (error) {
+            console.error("Failed to load debts", error);
+        }
+    };
+
+    const toggleBucket = (bucket: string) => {
+        setBucketDebts([]);
+        setNextCursor(undefined);
+        if (openBucket === bucket) {
+            setOpenBucket(null);
+            requested.current = null;
+            return;
+        }
+        setOpenBucket(bucket);
+        loadPage(bucket);
+    };
+
+    useEffect(() => {
+        setOpenBucket(null);
+        setBucketDebts([]);
+        requested.current = null;
+    }, [branchId]);
+
+    if (!report || report.totals.openCount === 0) return null;
+
+    const formatCurrency = (amount: number) =>
+        new Intl.NumberFormat("uz-UZ", {
+            style: "currency",
+            currency: "UZS",
+            minimumFractionDigits: 0,
+            maximumFractionDigits: 0,
+        }).format(amount);
+
+    const formatDate = (value: string) =>
+        new Intl.DateTimeFormat("uz-UZ", { day: "2-digit", month: "short" }).format(new Date(value));
+
+    return (
+        <Card className={cn("p-4 border-border bg-card space-y-3", className)}>
+            <div className="flex items-center justify-between">
+                <div className="text-sm font-bold text-card-foreground">{t('debt.aging')}</div>
+                <div className="text-xs text-muted-foreground">{formatCurrency(report.totals.remaining)}</div>
+            </div>
+
+            <div className="divide-y divide-border">
+                {BUCKETS.map(({ key, label, color }) => {
+                    const amount = report.totals.buckets[key];
+                    const isOpen = openBucket === key;
+                    return (
+                        <div key={key} className="py-2">
+                            <button
+                                type="button"
+                                disabled={!amount}
+                                onClick={() => toggleBucket(key)}
+                                className="w-full flex items-center justify-between text-left disabled:opacity-50"
+                            >
+                                <span className="text-xs text-muted-foreground">{t(label)}</span>
+                                <span className={cn("flex items-center gap-1 text-sm font-semibold", color)}>
+                                    {formatCurrency(amount)}
+                                    {amount > 0 && (isOpen ? <ChevronUp className="h-4 w-4" /> : <ChevronDown className="h-4 w-4" />)}
+                                </span>
+                            </button>
+                            {isOpen && (
+                                <div className="mt-2 space-y-1">
+                                    {bucketDebts.map((debt) => (
+                                        <button
+                                            key={debt.id}
+                                            type="button"
+                                            onClick={() => navigate(`${debtPath}/${debt.id}`)}
+                                            className="w-full flex items-center justify-between rounded-lg bg-muted px-3 py-2 text-left"
+                                        >
+                                            <span className="text-xs text-card-foreground truncate">{debt.debtorName}</span>
+                                            <span className="text-xs text-muted-foreground whitespace-nowrap ml-2">
+                                                {formatCurrency(debt.remainingAmount)} · {formatDate(debt.paymentDeadline)}
+                                            </span>
+                                        </button>
+                                    ))}
+                                    {nextCursor && (
+                                        <Button variant="ghost" size="sm" className="w-full" onClick={() => loadPage(key, nextCursor)}>
+                                            {t('debt.showMore')}
+                                        </Button>
+                                    )}
+                                </div>
+                            )}
+                        </div>
+                    );
+                })}
+            </div>
+
+            <div className="pt-2 border-t border-border space-y-2">
+                <div className="flex items-center justify-between text-xs">
+                    <span className="text-muted-foreground">{t('debt.weeklyCollection')}</span>
+                    <span className="font-semibold text-card-foreground">{formatCurrency(report.totals.weeklyCollection)}</span>
+                </div>
+                <div className="text-xs text-muted-foreground">{t('debt.expectedByWeek')}</div>
+                <div className="grid grid-cols-4 gap-2">
+                    {report.weekStarts.slice(0, 4).map((week: string, index: number) => (
+                        <div key={week} className="rounded-lg bg-muted p-2 text-center">
+                            <div className="text-[9px] text-muted-foreground">{formatDate(week)}</div>
+                            <div className="text-[11px] font-semibold text-card-foreground">
+                                {formatCurrency(report.totals.expected[index])}
+                            </div>
+                        </div>
+                    ))}
+                </div>
+            </div>
+        </Card>
+    );
+}
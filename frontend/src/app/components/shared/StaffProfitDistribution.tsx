@@ -1,31 +1,39 @@
 
+import { useEffect, useState } from "react";
 import { Card } from "../ui/card";
-import { StaffMember, Expense, useApp } from "../../context/AppContext";
+import { useApp } from "../../context/AppContext";
+import { reportsService } from "../../../services/api";
 
 interface StaffProfitDistributionProps {
-    staffMembers: StaffMember[];
     branchId: string;
-    totalSellerProfit: number;
-    totalBranchExpenses: number;
-    branchExpenses: Expense[];
+    start: Date;
+    end?: Date;
     className?: string;
 }
 
 export function StaffProfitDistribution({
-    staffMembers,
     branchId,
-    totalSellerProfit,
-    totalBranchExpenses,
-    branchExpenses,
+    start,
+    end,
     className
 }: StaffProfitDistributionProps) {
-    const { exchangeRate } = useApp();
-    const activeStaff = staffMembers.filter(s => s.branchId === branchId && s.isActive);
+    const { exchangeRate, sales, expenses } = useApp();
+    const [report, setReport] = useState<any>(null);
 
-    if (activeStaff.length === 0) return null;
+    // Seller profit minus branch expenses, shared equally, minus each person's
+    // advances: aggregated on the server for the period, refetched on new sales/expenses
+    const startKey = start.toISOString();
+    const endKey = end?.toISOString();
+    useEffect(() => {
+        if (!branchId) return;
+        reportsService.staffProfit({ branchId, start: startKey, end: endKey })
+            .then(setReport)
+            .catch((error) => console.error("Failed to load staff profit", error));
+    }, [branchId, startKey, endKey, sales, expenses]);
 
-    const distributableProfit = totalSellerProfit - totalBranchExpenses;
-    const sharePerPerson = distributableProfit / activeStaff.length;
+    if (!report || report.staff.length === 0) return null;
+
+    const sharePerPerson = report.sharePerPerson * exchangeRate; // USD → UZS
 
     const formatCurrency = (amount: number, currency: "USD" | "UZS" = "UZS") => {
         if (currency === "UZS") {
@@ -50,14 +58,12 @@ export function StaffProfitDistribution({
                 XODIMLAR O'RТASIDA TAQSIMOT
             </h3>
             <div className="space-y-3">
-                {activeStaff.map(staff => {
-                    const individualExpenses = branchExpenses
-                        .filter(e => e.category === "staff" && e.staffId === staff.id)
-                        .reduce((sum, e) => sum + (e.amount * exchangeRate), 0); // Convert USD → UZS
-                    const netPayout = sharePerPerson - individualExpenses;
+                {report.staff.map((staff: any) => {
+                    const individualExpenses = staff.advances * exchangeRate;
+                    const netPayout = staff.netPayout * exchangeRate;
 
                     return (
-                        <div key={staff.id} className="flex items-center justify-between p-3 rounded-lg bg-white dark:bg-gray-900 shadow-sm border border-emerald-100/50 dark:border-emerald-900/30">
+                        <div key={staff.userId} className="flex items-center justify-between p-3 rounded-lg bg-white dark:bg-gray-900 shadow-sm border border-emerald-100/50 dark:border-emerald-900/30">
                             <div>
                                 <div className="font-bold text-sm dark:text-white">{staff.name}</div>
                                 <div className="text-[10px] text-gray-400 uppercase">
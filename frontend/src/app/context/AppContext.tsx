@@ -11,11 +11,15 @@ import {
   productService,
   branchService,
   salesService,
+  orderService,
+  reservationService,
   debtService,
   expenseService,
   collectionService,
   staffService,
-  settingsService
+  settingsService,
+  eventsService,
+  syncService
 } from "../../services/api";
 
 export type UserRole = "admin" | "seller";
@@ -202,19 +206,20 @@ interface AppContextType {
   staffMembers: StaffMember[];
   collections: Collection[];
   basket: BasketItem[];
-  addToBasket: (item: BasketItem) => void;
+  addToBasket: (item: BasketItem) => Promise<void>;
   removeFromBasket: (id: string) => void;
   updateBasketItem: (
     id: string,
     quantity: number,
     pricePerUnit: number,
-  ) => void;
-  updateBasketItemFull: (updatedItem: BasketItem) => void;
+  ) => Promise<void>;
+  updateBasketItemFull: (updatedItem: BasketItem) => Promise<void>;
   clearBasket: () => void;
   completeOrder: (
     payments: Payment[],
     sellerEnteredTotal: number,
     isNasiya?: boolean,
+    debt?: Debt,
   ) => Promise<string>;
   addSale: (sale: Sale) => void;
   addProduct: (product: Product) => void;
@@ -256,6 +261,22 @@ interface AppContextType {
   updateExchangeRate: (rate: number) => Promise<void>;
 }
 
+const RESERVATION_REFRESH_MS = 5 * 60 * 1000;
+
+// Rows changed since the last pull replace their old copies (new ones go first); tombstoned ids are dropped
+const mergeById = <T extends { id: string }>(prev: T[], changed: T[], deleted: string[] = []): T[] => {
+  const changedById = new Map(changed.map((row) => [row.id, row]));
+  const known = new Set(prev.map((row) => row.id));
+  const gone = new Set(deleted);
+  return [
+    ...changed.filter((row) => !known.has(row.id) && !gone.has(row.id)),
+    ...prev.filter((row) => !gone.has(row.id)).map((row) => changedById.get(row.id) ?? row),
+  ];
+};
+
+const newBasketId = () =>
+  `b${Date.now()}${Math.random().toString(36).slice(2, 8)}`;
+
 const AppContext = createContext<AppContextType | undefined>(
   undefined,
 );
@@ -364,6 +385,61 @@ export function AppProvider({
     refreshSettings
   ]);
 
+  // Watermark of the last /api/sync pull; until the first one, a resync is a full pull
+  const syncWatermarkRef = React.useRef<string | undefined>(undefined);
+
+  const resync = useCallback(async () => {
+    try {
+      const data = await syncService.pull(syncWatermarkRef.current);
+      const apply = <T extends { id: string }>(setter: React.Dispatch<React.SetStateAction<T[]>>, rows: T[], deleted?: string[]) =>
+        setter((prev) => (data.full ? rows : mergeById(prev, rows, deleted)));
+      apply(setProducts, data.products, data.deleted.products);
+      apply(setSales, data.sales, data.deleted.sales);
+      apply(setDebts, data.debts, data.deleted.debts);
+      apply(setExpenses, data.expenses, data.deleted.expenses);
+      apply(setCollections, data.collections, data.deleted.collections);
+      if (data.exchangeRate != null) setExchangeRate(data.exchangeRate);
+      syncWatermarkRef.current = data.watermark;
+    } catch (e) {
+      console.error("Resync failed", e);
+    }
+  }, []);
+
+  // Live change feed: patch local state from other devices' writes instead of refetching tables
+  useEffect(() => {
+    if (!user) return;
+    return eventsService.subscribe({
+      'product.stock_changed': (e) => setProducts((prev) =>
+        e.deleted
+          ? prev.filter((p) => p.id !== e.id)
+          : prev.map((p) => p.id === e.id
+            ? { ...p, quantity: e.quantity, remainingLength: e.remaining_length, availableSizes: e.available_sizes }
+            : p)
+      ),
+      'product.updated': async (e) => {
+        const updated = await productService.getOne(e.id);
+        setProducts((prev) => prev.map((p) => (p.id === e.id ? updated : p)));
+      },
+      'product.deleted': (e) => setProducts((prev) => prev.filter((p) => p.id !== e.id)),
+      'sale.created': (sale: Sale) => setSales((prev) =>
+        prev.some((s) => s.id === sale.id) ? prev : [sale, ...prev]
+      ),
+      'debt.paid': (e) => setDebts((prev) => prev.map((d) => d.id === e.id
+        ? {
+          ...d,
+          paidAmount: e.paid_amount,
+          remainingAmount: e.remaining_amount,
+          status: e.status,
+          paymentHistory: (d.paymentHistory || []).some((p) => p.id === e.payment_id)
+            ? d.paymentHistory
+            : [...(d.paymentHistory || []), { id: e.payment_id, amount: e.amount, date: e.payment_date, sellerId: e.recorded_by, sellerName: "Noma'lum" }],
+        }
+        : d)),
+      'settings.updated': (e) => setExchangeRate(e.exchange_rate),
+      'reset': () => resync(),
+    });
+  }, [user?.id, resync]);
+
   const fetchCollectionsForBranch = async (branchId: string) => {
     try {
       const data = await collectionService.getAll(branchId);
@@ -691,20 +767,32 @@ export function AppProvider({
   };
 
   const [basket, setBasket] = useState<BasketItem[]>([]);
+  // Reservations are held per basket; a new id after checkout or clearing
+  const [basketId, setBasketId] = useState(newBasketId);
 
-  const addToBasket = (item: BasketItem) => {
+  // Adding or changing a line reserves its stock first. If other baskets
+  // hold it (409) the error is thrown and the basket is left unchanged.
+  const addToBasket = async (item: BasketItem) => {
+    await reservationService.reserve(basketId, item);
     setBasket((prev) => [...prev, item]);
   };
 
   const removeFromBasket = (id: string) => {
     setBasket((prev) => prev.filter((item) => item.id !== id));
+    reservationService.release(basketId, id).catch((error) =>
+      console.error("Failed to release reservation", error),
+    );
   };
 
-  const updateBasketItem = (
+  const updateBasketItem = async (
     id: string,
     quantity: number,
     pricePerUnit: number,
   ) => {
+    const current = basket.find((item) => item.id === id);
+    if (current && current.quantity !== quantity) {
+      await reservationService.reserve(basketId, { ...current, quantity });
+    }
     setBasket((prev) =>
       prev.map((item) =>
         item.id === id
@@ -719,7 +807,8 @@ export function AppProvider({
     );
   };
 
-  const updateBasketItemFull = (updatedItem: BasketItem) => {
+  const updateBasketItemFull = async (updatedItem: BasketItem) => {
+    await reservationService.reserve(basketId, updatedItem);
     setBasket((prev) =>
       prev.map((item) =>
         item.id === updatedItem.id ? updatedItem : item,
@@ -729,67 +818,46 @@ export function AppProvider({
 
   const clearBasket = () => {
     setBasket([]);
+    if (basket.length > 0) {
+      reservationService.releaseBasket(basketId).catch((error) =>
+        console.error("Failed to release basket", error),
+      );
+    }
+    setBasketId(newBasketId());
   };
 
+  // Reservations expire after 15 minutes unless the open basket keeps them alive
+  const hasBasketItems = basket.length > 0;
+  useEffect(() => {
+    if (!hasBasketItems) return;
+    const interval = setInterval(() => {
+      reservationService.refresh(basketId).catch((error) =>
+        console.error("Failed to refresh reservations", error),
+      );
+    }, RESERVATION_REFRESH_MS);
+    return () => clearInterval(interval);
+  }, [basketId, hasBasketItems]);
+
   const completeOrder = async (
     payments: Payment[],
     sellerEnteredTotal: number,
-    isNasiya: boolean = false
+    isNasiya: boolean = false,
+    debt?: Debt,
   ): Promise<string> => {
     if (!user) return "";
 
     const orderId = `o${Date.now()}`;
-    const calculatedTotal = basket.reduce(
-      (sum, item) => sum + item.total,
-      0,
-    );
-
-    // Calculate total profit: seller entered total - database calculated total
-    // Note: calculatedTotal here is the BASE price (either Oddiy or Nasiya)
-    const totalProfit = sellerEnteredTotal - calculatedTotal;
 
-    // Determine payment distribution
-    let remainingCash = payments.find(p => p.type === "cash")?.amount || 0;
-    let remainingCard = payments.find(p => p.type === "card")?.amount || 0;
-    let remainingTransfer = payments.find(p => p.type === "transfer")?.amount || 0;
-    let remainingDebt = payments.find(p => p.type === "debt")?.amount || 0;
-
-    const salesPromisesGroups = basket.map((item) => {
+    // The server splits the payments (USD) over the items and records one sale
+    // per item and payment type, in a single transaction with the stock
+    // deduction and the debt. The agreed total is the sum of the payments.
+    const items = basket.flatMap((item) => {
       const product = products.find((p) => p.id === item.productId);
-      if (!product) return [Promise.resolve()];
-
-      // Calculate base price for this item
-      let itemBaseTotal = item.total;
-
-      // Calculate this item's proportion of total calculated price
-      const itemProportion = itemBaseTotal / calculatedTotal;
-
-      // Distribute seller markup proportionally
-      const itemProfit = totalProfit * itemProportion;
-
-      // Calculate this item's total with markup
-      const itemTotalWithMarkup = itemBaseTotal + itemProfit;
-
-      // Determine payment distribution for this specific item
-      const itemPayments: { type: PaymentType; amount: number }[] = [];
-      let itemAmountToDistribute = itemTotalWithMarkup;
-
-      const consume = (type: PaymentType, amount: number) => {
-        if (itemAmountToDistribute <= 0 || amount <= 0) return amount;
-        const taken = Math.min(itemAmountToDistribute, amount);
-        itemPayments.push({ type, amount: taken });
-        itemAmountToDistribute -= taken;
-        return amount - taken;
-      };
-
-      remainingCash = consume("cash", remainingCash);
-      remainingCard = consume("card", remainingCard);
-      remainingTransfer = consume("transfer", remainingTransfer);
-      remainingDebt = consume("debt", remainingDebt);
+      if (!product) return [];
 
       // Map dimensions and area
       let width = item.width ? parseFloat(item.width) : undefined;
-      let height_val = item.height
+      const height_val = item.height
         ? parseFloat(item.height)
         : item.type === "meter"
           ? item.quantity
@@ -809,45 +877,32 @@ export function AppProvider({
           width * height_val * (item.type === "unit" ? item.quantity : 1);
       }
 
-      // Create one sale record for each payment chunk
-      return itemPayments.map((p, pIndex) => {
-        const proportion = p.amount / itemTotalWithMarkup;
-        const sale: any = {
-          productId: item.productId,
-          productName: item.productName,
-          quantity: item.quantity * proportion,
-          amount: p.amount,
-          paymentType: p.type,
-          branchId: user.branchId || "",
-          sellerId: user.id,
-          date: new Date().toISOString(),
-          orderId: orderId,
-          profit: itemProfit * proportion,
-          type: item.type,
-          width,
-          length: height_val ? height_val * proportion : undefined,
-          area: total_area ? total_area * proportion : undefined,
-          isNasiya: isNasiya,
-          size: item.size,
-        };
+      return [{
+        productId: item.productId,
+        quantity: item.quantity,
+        size: item.size,
+        width,
+        length: height_val,
+        area: total_area,
+      }];
+    });
 
-        // Handle unit quantity rounding to avoid fractional stock if possible
-        if (item.type === "unit") {
-          if (item.quantity === 1) {
-            sale.quantity = pIndex === 0 ? 1 : 0;
-          } else {
-            // For multiple units, we could round but proportional is safer for price accuracy
-            // The backend should ideally handle fractional quantities for inventory if needed
-          }
-        }
+    const paid = payments.reduce((sum, p) => sum + p.amount, 0);
+    if (Math.abs(paid - sellerEnteredTotal) > 0.01) {
+      console.warn(`Payments (${paid}) differ from the entered total (${sellerEnteredTotal})`);
+    }
 
-        return addSale(sale);
-      });
+    const result = await orderService.checkout({
+      orderId,
+      basketId,
+      items,
+      payments: payments.filter((p) => p.amount > 0),
+      isNasiya,
+      debt: debt ? { ...debt, orderId } : undefined,
     });
-
-    await Promise.all(salesPromisesGroups.flat());
-    // Refresh all data once after complete order to sync stock and sales
-    await fetchData();
+    // Stock changes arrive through the change feed (product.stock_changed)
+    setSales((prev) => mergeById(prev, result.sales));
+    if (result.debt) setDebts((prev) => mergeById(prev, [result.debt]));
     clearBasket();
     return orderId;
   };
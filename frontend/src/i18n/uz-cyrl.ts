@@ -237,6 +237,16 @@ export const uzCyrl = {
         branchProfit: "Филиал фойдаси",
         branchExpenses: "Филиал харажатлари",
         staffExpenses: "Сотувчилар харажати",
+        previousPeriod: "Олдинги давр",
+        sold30: "30 кунда сотилди",
+        coverDays: "{days} кунга етади",
+        deadStock: "Ҳаракатсиз",
+        deadStockCount: "{count} та ҳаракатсиз",
+        export: "Экспорт",
+        exportSales: "Савдолар",
+        exportDebts: "Қарзлар",
+        exportExpenses: "Харажатлар",
+        exportStock: "Омбор қолдиғи",
         productStats: "МАҲСУЛОТЛАР СТАТИСТИКАСИ",
         topMetered: "Метравли (Топ м²)",
         byArea: "МАЙДОН БЎЙИЧА",
@@ -317,6 +327,14 @@ export const uzCyrl = {
         payment: "Тўлов",
         nasiyaSale: "НАСИЯ САВДО",
         cardAndTransfer: "Карта / Ўтказма",
+        aging: "Қарзлар муддати бўйича",
+        agingCurrent: "Муддати келмаган",
+        aging1to30: "1–30 кун ўтган",
+        aging31to60: "31–60 кун ўтган",
+        aging60plus: "60 кундан ортиқ",
+        weeklyCollection: "Ҳафталик ундирилган (ўртача)",
+        expectedByWeek: "Ҳафталар бўйича кутилаётган тушум",
+        showMore: "Яна кўрсатиш",
     },
 
     expense: {
@@ -244,6 +244,16 @@ export const uzLatn = {
         branchProfit: "Filial foydasi",
         branchExpenses: "Filial xarajatlari",
         staffExpenses: "Sotuvchilar xarajati",
+        previousPeriod: "Oldingi davr",
+        sold30: "30 kunda sotildi",
+        coverDays: "{days} kunga yetadi",
+        deadStock: "Harakatsiz",
+        deadStockCount: "{count} ta harakatsiz",
+        export: "Eksport",
+        exportSales: "Savdolar",
+        exportDebts: "Qarzlar",
+        exportExpenses: "Xarajatlar",
+        exportStock: "Ombor qoldig'i",
         productStats: "MAHSULOTLAR STATISTIKASI",
         topMetered: "Metrajli (Top m²)",
         byArea: "MAYDON BO'YICHA",
@@ -320,6 +330,14 @@ export const uzLatn = {
         payment: "To'lov",
         nasiyaSale: "NASIYA SAVDO",
         cardAndTransfer: "Karta / O'tkazma",
+        aging: "Qarzlar muddati bo'yicha",
+        agingCurrent: "Muddati kelmagan",
+        aging1to30: "1–30 kun o'tgan",
+        aging31to60: "31–60 kun o'tgan",
+        aging60plus: "60 kundan ortiq",
+        weeklyCollection: "Haftalik undirilgan (o'rtacha)",
+        expectedByWeek: "Haftalar bo'yicha kutilayotgan tushum",
+        showMore: "Yana ko'rsatish",
     },
 
     expense: {
@@ -68,6 +68,29 @@ api.interceptors.response.use(
 );
 
 // --- Helpers ---
+
+const newIdempotencyKey = (): string =>
+  typeof crypto !== 'undefined' && 'randomUUID' in crypto
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+// POST a write that must not be recorded twice. The same Idempotency-Key is sent
+// on every attempt, so when a response is lost and the request is retried the
+// server returns the stored result instead of recording the write again.
+const postIdempotent = async (url: string, payload: any, attempts = 3) => {
+  const headers = { 'Idempotency-Key': newIdempotencyKey() };
+  for (let attempt = 1; ; attempt++) {
+    try {
+      return await api.post(url, payload, { headers });
+    } catch (error) {
+      const status = (error as AxiosError).response?.status;
+      // No response (network), still in progress (409) or gateway errors: retry
+      const retryable = status === undefined || status === 409 || status === 502 || status === 503 || status === 504;
+      if (!retryable || attempt >= attempts) throw error;
+      await new Promise((resolve) => setTimeout(resolve, 500 * attempt));
+    }
+  }
+};
 export const getImageUrl = (photoPath: string | undefined): string => {
   if (!photoPath) return '';
   if (photoPath.startsWith('http') || photoPath.startsWith('data:')) return photoPath;
@@ -86,6 +109,29 @@ export const getImageUrl = (photoPath: string | undefined): string => {
   return `${baseUrl}${path}`;
 };
 
+// --- Pagination ---
+
+const PAGE_SIZE = 200;
+
+// Walks a keyset-paginated list endpoint, yielding one mapped page at a time.
+// The server returns the next page's cursor in the X-Next-Cursor header.
+async function* iteratePages(path: string, mapper: (data: any) => any, params?: any) {
+  let cursor: string | undefined;
+  do {
+    const response = await api.get(path, {
+      params: { ...params, page_size: PAGE_SIZE, ...(cursor ? { cursor } : {}) }
+    });
+    yield response.data.map(mapper);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+}
+
+const collectPages = async (pages: AsyncGenerator<any[]>) => {
+  const items: any[] = [];
+  for await (const page of pages) items.push(...page);
+  return items;
+};
+
 // --- Mappers ---
 
 const fromUser = (data: any): any => ({
@@ -238,6 +284,17 @@ const fromDebt = (data: any): any => ({
   }))
 });
 
+const fromExpense = (e: any): any => ({
+  id: e.id,
+  amount: e.amount,
+  description: e.description,
+  category: e.category,
+  branchId: e.branch_id,
+  sellerId: e.seller_id,
+  staffId: e.staff_id,
+  date: e.created_at,
+});
+
 const toDebt = (data: any): any => ({
   debtor_name: data.debtorName,
   phone_number: data.phoneNumber,
@@ -261,6 +318,11 @@ export const authService = {
     });
     return response.data;
   },
+  // Short-lived token for a URL the browser opens itself (downloads); never put the session token in a URL
+  urlToken: async (scope: 'export' | 'events') => {
+    const response = await api.post('auth/url-token', null, { params: { scope } });
+    return response.data.token as string;
+  },
   getMe: async () => {
     const response = await api.get('auth/me');
     return fromUser(response.data);
@@ -292,10 +354,40 @@ export const branchService = {
 export const productService = {
   getAll: async (filters?: any) => {
     console.log("Fetching products with filters:", filters);
-    const response = await api.get('products/', { params: filters });
-    console.log(`Fetched ${response.data.length} products`);
+    const products = await collectPages(iteratePages('products/', fromProduct, filters));
+    console.log(`Fetched ${products.length} products`);
+    return products;
+  },
+  iterPages: (filters?: any) => iteratePages('products/', fromProduct, filters),
+  // Server-side lookup by partial code / collection, best match first
+  search: async (q: string, params?: { category?: string; branchId?: string; page?: number; pageSize?: number }) => {
+    const response = await api.get('products/search', {
+      params: {
+        q,
+        category: params?.category,
+        branch_id: params?.branchId,
+        page: params?.page,
+        page_size: params?.pageSize,
+      }
+    });
     return response.data.map(fromProduct);
   },
+  // Dry run: which roll each metraj cut would be taken from (same allocator as checkout)
+  planRolls: async (cuts: { productId: string; width: number; length: number }[]) => {
+    const response = await api.post('products/rolls/plan', {
+      cuts: cuts.map(c => ({ product_id: c.productId, width: c.width, length: c.length }))
+    });
+    return response.data.map((p: any) => ({
+      productId: p.product_id,
+      width: p.width,
+      length: p.length,
+      rollId: p.roll_id,
+      rollSize: p.roll_size,
+      lengthBefore: p.length_before,
+      lengthAfter: p.length_after,
+      waste: p.waste,
+    }));
+  },
   getOne: async (id: string) => {
     const response = await api.get(`products/${id}`);
     return fromProduct(response.data);
@@ -349,28 +441,85 @@ export const productService = {
 export const salesService = {
   create: async (data: any) => {
     const payload = toSale(data);
-    const response = await api.post('sales/', payload);
+    const response = await postIdempotent('sales/', payload);
     return fromSale(response.data);
   },
-  getAll: async (filters?: any) => {
-    const response = await api.get('sales/', { params: filters });
-    return response.data.map(fromSale);
+  getAll: async (filters?: any) => collectPages(iteratePages('sales/', fromSale, filters)),
+  iterPages: (filters?: any) => iteratePages('sales/', fromSale, filters)
+};
+
+export const orderService = {
+  // Whole basket in one request: stock, sales and the optional debt are saved together or not at all
+  checkout: async (data: { orderId: string; basketId?: string; items: any[]; payments: { type: string; amount: number }[]; isNasiya?: boolean; debt?: any }) => {
+    const response = await postIdempotent('orders/', {
+      order_id: data.orderId,
+      basket_id: data.basketId,
+      items: data.items.map((item) => ({
+        product_id: item.productId,
+        quantity: item.quantity,
+        size: item.size,
+        width: item.width,
+        length: item.length,
+        area: item.area,
+      })),
+      payments: data.payments.map((p) => ({ payment_type: p.type, amount: p.amount })),
+      is_nasiya: data.isNasiya || false,
+      debt: data.debt ? toDebt(data.debt) : undefined,
+    });
+    return {
+      orderId: response.data.order_id,
+      sales: response.data.sales.map(fromSale),
+      debt: response.data.debt ? fromDebt(response.data.debt) : null,
+    };
   }
 };
 
-export const debtService = {
-  getAll: async () => {
-    const response = await api.get('debts/');
-    return response.data.map(fromDebt);
+// Basket lines hold their stock for a while, so other sellers can't sell it meanwhile
+export const reservationService = {
+  reserve: async (basketId: string, item: any) => {
+    const response = await api.put(`reservations/${basketId}/${item.id}`, {
+      product_id: item.productId,
+      quantity: item.quantity,
+      size: item.size,
+      width: item.width ? parseFloat(item.width) : undefined,
+      length: item.type === 'meter' ? item.quantity : undefined,
+    });
+    return response.data;
+  },
+  release: async (basketId: string, lineId: string) => {
+    await api.delete(`reservations/${basketId}/${lineId}`);
+  },
+  releaseBasket: async (basketId: string) => {
+    await api.delete(`reservations/${basketId}`);
+  },
+  refresh: async (basketId: string) => {
+    const response = await api.post(`reservations/${basketId}/refresh`);
+    return response.data;
   },
+  availability: async (productIds: string[]) => {
+    const response = await api.get('reservations/availability', {
+      params: { product_id: productIds },
+      paramsSerializer: { indexes: null },
+    });
+    return response.data.map((a: any) => ({
+      productId: a.product_id,
+      onHand: a.on_hand,
+      reserved: a.reserved,
+      available: a.available,
+    }));
+  }
+};
+
+export const debtService = {
+  getAll: async () => collectPages(iteratePages('debts/', fromDebt)),
   create: async (data: any) => {
     const payload = toDebt(data);
-    const response = await api.post('debts/', payload);
+    const response = await postIdempotent('debts/', payload);
     return fromDebt(response.data);
   },
   addPayment: async (debtId: string, data: any) => {
     // Payment payload: amount, note?
-    const response = await api.post(`debts/${debtId}/payments`, data);
+    const response = await postIdempotent(`debts/${debtId}/payments`, data);
     return response.data;
   },
   delete: async (debtId: string) => {
@@ -379,19 +528,7 @@ export const debtService = {
 }
 
 export const expenseService = {
-  getAll: async () => {
-    const response = await api.get('expenses/');
-    return response.data.map((e: any) => ({
-      id: e.id,
-      amount: e.amount,
-      description: e.description,
-      category: e.category,
-      branchId: e.branch_id,
-      sellerId: e.seller_id,
-      staffId: e.staff_id,
-      date: e.created_at,
-    }));
-  },
+  getAll: async () => collectPages(iteratePages('expenses/', fromExpense)),
   create: async (data: any) => {
     const payload = {
       amount: data.amount,
@@ -400,17 +537,8 @@ export const expenseService = {
       branch_id: data.branchId,
       staff_id: data.staffId,
     };
-    const response = await api.post('expenses/', payload);
-    return {
-      id: response.data.id,
-      amount: response.data.amount,
-      description: response.data.description,
-      category: response.data.category,
-      branchId: response.data.branch_id,
-      sellerId: response.data.seller_id,
-      staffId: response.data.staff_id,
-      date: response.data.created_at,
-    };
+    const response = await postIdempotent('expenses/', payload);
+    return fromExpense(response.data);
   },
   delete: async (id: string) => {
     await api.delete(`expenses/${id}`);
@@ -477,6 +605,332 @@ export const settingsService = {
   }
 };
 
+export const syncService = {
+  // Pass the watermark from the previous pull; omit it for a full snapshot.
+  pull: async (since?: string) => {
+    const response = await api.get('sync/', { params: since ? { since } : {} });
+    const data = response.data;
+    return {
+      watermark: data.watermark,
+      full: data.full,
+      products: data.products.map(fromProduct),
+      sales: data.sales.map(fromSale),
+      debts: data.debts.map(fromDebt),
+      expenses: data.expenses.map(fromExpense),
+      collections: data.collections.map(fromCollection),
+      exchangeRate: data.settings?.exchange_rate,
+      deleted: data.deleted,
+    };
+  }
+};
+
+const fromValuation = (data: any): any => ({
+  productCount: data.product_count,
+  quantity: data.quantity,
+  metres: data.metres,
+  stockValue: data.cost_value,
+  sellValue: data.sell_value,
+  potentialProfit: data.potential_profit,
+});
+
+const fromDebtAging = (data: any): any => ({
+  openCount: data.open_count,
+  overdueCount: data.overdue_count,
+  remaining: data.remaining,
+  buckets: data.buckets,
+  paymentCount: data.payment_count,
+  collected: data.collected,
+  weeklyCollection: data.weekly_collection,
+  expected: data.expected,
+});
+
+const fromPnlFigures = (data: any): any => ({
+  saleCount: data.sale_count,
+  revenue: data.revenue,
+  costOfGoods: data.cost_of_goods,
+  grossProfit: data.gross_profit,
+  adminProfit: data.admin_profit,
+  sellerProfit: data.seller_profit,
+  nasiyaSales: data.nasiya_sales,
+  branchExpenses: data.branch_expenses,
+  staffExpenses: data.staff_expenses,
+  expenses: data.expenses,
+  netProfit: data.net_profit,
+  debtIssued: data.debt_issued,
+  debtCollected: data.debt_collected,
+});
+
+const fromCashClosure = (data: any): any => ({
+  id: data.id,
+  branchId: data.branch_id,
+  start: data.start,
+  end: data.end,
+  closed: data.closed,
+  openingBalance: data.opening_balance,
+  cashSales: data.cash_sales,
+  cardSales: data.card_sales,
+  transferSales: data.transfer_sales,
+  debtPayments: data.debt_payments,
+  cashExpenses: data.cash_expenses,
+  saleCount: data.sale_count,
+  expectedCash: data.expected_cash,
+  countedCash: data.counted_cash,
+  difference: data.difference,
+  carriedOver: data.carried_over,
+});
+
+export const reportsService = {
+  // Stock value and potential profit (USD) per branch and collection, aggregated on the server
+  warehouse: async () => {
+    const response = await api.get('reports/warehouse');
+    const data = response.data;
+    return {
+      exchangeRate: data.exchange_rate,
+      totals: fromValuation(data.totals),
+      branches: data.branches.map((b: any) => ({
+        ...fromValuation(b),
+        branchId: b.branch_id,
+        branchName: b.branch_name,
+        collections: b.collections.map((c: any) => ({ ...fromValuation(c), name: c.collection })),
+      })),
+    };
+  },
+  // Daily sums of sales, expenses and debt payments for local days start..end
+  daily: async (params: { start: string; end: string; branchId?: string; sellerId?: string }) => {
+    const response = await api.get('reports/daily', {
+      params: { start: params.start, end: params.end, branch_id: params.branchId, seller_id: params.sellerId },
+    });
+    return response.data.map((r: any) => ({
+      day: r.day,
+      branchId: r.branch_id,
+      sellerId: r.seller_id,
+      kind: r.kind,
+      paymentType: r.payment_type,
+      currency: r.currency,
+      count: r.count,
+      quantity: r.quantity,
+      metres: r.metres,
+      amount: r.amount,
+      profit: r.profit,
+      adminProfit: r.admin_profit,
+      sellerProfit: r.seller_profit,
+    }));
+  },
+  // Kassa totals of a branch's open shift (or the snapshot of a closed one starting at `start`)
+  cashClosure: async (branchId: string, start?: string) => {
+    const response = await api.get('reports/cash-closure', { params: { branch_id: branchId, start } });
+    return fromCashClosure(response.data);
+  },
+  closeCashShift: async (data: { branchId: string; countedCash: number; carriedOver?: number; note?: string }) => {
+    const response = await postIdempotent('reports/cash-closure', {
+      branch_id: data.branchId,
+      counted_cash: data.countedCash,
+      carried_over: data.carriedOver || 0,
+      note: data.note,
+    });
+    return fromCashClosure(response.data);
+  },
+  // Download link of a sales / debts / expenses / stock spreadsheet. The file is
+  // streamed by the server, so it is opened as a plain link (with a one-minute
+  // export token in the URL) rather than read into memory through axios.
+  exportUrl: async (kind: 'sales' | 'debts' | 'expenses' | 'stock', params: { format: 'csv' | 'xlsx'; start?: Date; end?: Date; branchId?: string }) => {
+    const query = new URLSearchParams({ format: params.format, token: await authService.urlToken('export') });
+    if (params.start) query.append('start', params.start.toISOString());
+    if (params.end) query.append('end', params.end.toISOString());
+    if (params.branchId) query.append('branch_id', params.branchId);
+    return `${API_URL}reports/export/${kind}?${query.toString()}`;
+  },
+  // Units / metres sold over 7, 30 and 90 days, days of cover and dead stock
+  salesVelocity: async (params: { groupBy: 'product' | 'collection' | 'size' | 'branch'; branchId?: string; deadOnly?: boolean }) => {
+    const response = await api.get('reports/sales-velocity', {
+      params: { group_by: params.groupBy, branch_id: params.branchId, dead_only: params.deadOnly },
+    });
+    return response.data.rows.map((r: any) => ({
+      key: r.key,
+      productId: r.product_id,
+      branchId: r.branch_id,
+      code: r.code,
+      collection: r.collection,
+      size: r.size,
+      productCount: r.product_count,
+      units7: r.units_7,
+      units30: r.units_30,
+      units90: r.units_90,
+      metres7: r.metres_7,
+      metres30: r.metres_30,
+      metres90: r.metres_90,
+      stockUnits: r.stock_units,
+      stockMetres: r.stock_metres,
+      coverDaysUnits: r.cover_days_units,
+      coverDaysMetres: r.cover_days_metres,
+      deadStock: r.dead_stock,
+    }));
+  },
+  // Open debts per branch and seller by days past deadline, with collections and weekly forecast (UZS)
+  debtAging: async (params?: { branchId?: string; weeks?: number; windowDays?: number }) => {
+    const response = await api.get('reports/debt-aging', {
+      params: { branch_id: params?.branchId, weeks: params?.weeks, window_days: params?.windowDays },
+    });
+    const data = response.data;
+    return {
+      currency: data.currency,
+      asOf: data.as_of,
+      windowDays: data.window_days,
+      weekStarts: data.week_starts,
+      totals: fromDebtAging(data.totals),
+      rows: data.rows.map((r: any) => ({
+        ...fromDebtAging(r),
+        branchId: r.branch_id,
+        sellerId: r.seller_id,
+        sellerName: r.seller_name,
+      })),
+    };
+  },
+  // One page of the open debts in an aging bucket
+  debtAgingPage: async (params: { bucket: string; branchId?: string; sellerId?: string; cursor?: string }) => {
+    const response = await api.get('reports/debt-aging/debts', {
+      params: {
+        bucket: params.bucket,
+        branch_id: params.branchId,
+        seller_id: params.sellerId,
+        cursor: params.cursor,
+        page_size: 20,
+      },
+    });
+    return {
+      debts: response.data.map(fromDebt),
+      nextCursor: response.headers['x-next-cursor'] as string | undefined,
+    };
+  },
+  // Branch P&L for a period and the period of the same length before it
+  branchPnl: async (branchId: string, params: { start: string; end?: string; currency?: 'USD' | 'UZS' }) => {
+    const response = await api.get(`reports/branches/${branchId}/pnl`, { params });
+    const data = response.data;
+    return {
+      currency: data.currency,
+      start: data.start,
+      end: data.end,
+      previousStart: data.previous_start,
+      previousEnd: data.previous_end,
+      current: fromPnlFigures(data.current),
+      previous: fromPnlFigures(data.previous),
+      debt: {
+        openCount: data.debt.open_count,
+        outstanding: data.debt.outstanding,
+        overdueCount: data.debt.overdue_count,
+        overdue: data.debt.overdue,
+      },
+    };
+  },
+  // Seller profit, expenses and each staff member's payout (USD) for a branch and period
+  staffProfit: async (params: { branchId: string; start: string; end?: string }) => {
+    const response = await api.get('reports/staff-profit', {
+      params: { branch_id: params.branchId, start: params.start, end: params.end },
+    });
+    const data = response.data;
+    return {
+      sellerProfit: data.seller_profit,
+      adminProfit: data.admin_profit,
+      branchExpenses: data.branch_expenses,
+      staffExpenses: data.staff_expenses,
+      distributable: data.distributable,
+      sharePerPerson: data.share_per_person,
+      staff: data.staff.map((s: any) => ({
+        userId: s.user_id,
+        name: s.name,
+        salesCount: s.sales_count,
+        sellerProfit: s.seller_profit,
+        adminProfit: s.admin_profit,
+        share: s.share,
+        advances: s.advances,
+        netPayout: s.net_payout,
+      })),
+    };
+  },
+  // Cost-first recognized profit (USD) for money received in [start, end), per branch
+  recognizedProfit: async (params: { start?: Date; end?: Date; branchId?: string } = {}) => {
+    const response = await api.get('reports/recognized-profit', {
+      params: {
+        start: params.start?.toISOString(),
+        end: params.end?.toISOString(),
+        branch_id: params.branchId,
+      },
+    });
+    const data = response.data;
+    return {
+      recognizedProfit: data.recognized_profit,
+      orderCount: data.order_count,
+      branches: data.branches.map((b: any) => ({
+        branchId: b.branch_id,
+        branchName: b.branch_name,
+        recognizedProfit: b.recognized_profit,
+        orderCount: b.order_count,
+      })),
+    };
+  }
+};
+
+// Payloads that carry a whole row are mapped like the matching list endpoint
+const eventMappers: Record<string, (data: any) => any> = {
+  'sale.created': fromSale,
+};
+
+const EVENTS_RECONNECT_MS = 3000;
+
+export const eventsService = {
+  // Opens the live change feed with a short-lived events token. The token only
+  // opens the stream, so on an error the feed reconnects itself with a fresh
+  // one and resumes from the last received event id; 'reset' means state
+  // should be resynced (syncService.pull).
+  subscribe: (handlers: Record<string, (data: any) => void>) => {
+    let source: EventSource | null = null;
+    let lastEventId: string | undefined;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+    const reconnect = () => {
+      if (!closed) retry = setTimeout(() => open(lastEventId), EVENTS_RECONNECT_MS);
+    };
+    const open = async (resumeFrom?: string) => {
+      let token: string;
+      try {
+        token = await authService.urlToken('events');
+      } catch {
+        reconnect();
+        return;
+      }
+      if (closed) return;
+      const query = new URLSearchParams({ token });
+      if (resumeFrom) query.append('last_event_id', resumeFrom);
+      const current = new EventSource(`${API_URL}events/?${query.toString()}`);
+      source = current;
+      Object.entries(handlers).forEach(([type, handler]) => {
+        current.addEventListener(type, (event) => {
+          const message = event as MessageEvent;
+          if (message.lastEventId) lastEventId = message.lastEventId;
+          const data = JSON.parse(message.data);
+          handler(eventMappers[type] ? eventMappers[type](data) : data);
+        });
+      });
+      // A reset ends the stream: reconnect from now, or the same reset is replayed
+      current.addEventListener('reset', () => {
+        current.close();
+        lastEventId = undefined;
+        open();
+      });
+      current.onerror = () => {
+        current.close();
+        reconnect();
+      };
+    };
+    open();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      source?.close();
+    };
+  }
+};
+
 export const telegramService = {
   auth: async (initData: string) => {
     const response = await api.post(`telegram/auth?init_data=${encodeURIComponent(initData)}`);